@@ -8,6 +8,7 @@ import com.google.ar.core.Camera
 import com.google.ar.core.Frame
 import com.bayesmech.camalytics.network.ARStreamClient
 import com.bayesmech.camalytics.network.BandwidthMonitor
+import com.bayesmech.camalytics.network.FlowControl
 import com.bayesmech.camalytics.network.QualityLevel
 import com.bayesmech.camalytics.network.StreamConfig
 import com.bayesmech.camalytics.recording.RecordingManager
@@ -44,9 +45,14 @@ class ARDataCapture(
         imageHeight: Int
     ) = withContext(Dispatchers.IO) {
         try {
+            // Server flow control caps what we send, except while recording
+            // (the same frame goes to the recording, which should stay complete)
+            val flow = if (recordingManager.isRecording()) null else client.getFlowControl()
+
             // Throttle based on target FPS
             val now = System.nanoTime()
-            val minInterval = (1_000_000_000 / currentQuality.targetFps).toLong()
+            val targetFps = minOf(currentQuality.targetFps, flow?.maxFps ?: Int.MAX_VALUE).coerceAtLeast(1)
+            val minInterval = (1_000_000_000 / targetFps).toLong()
             if (now - lastSentTimestamp < minInterval) {
                 return@withContext  // Skip this frame
             }
@@ -66,7 +72,8 @@ class ARDataCapture(
                 cameraFrameBitmap,
                 depthImage,     // Pass pre-acquired depth
                 imageWidth,     // Pass pre-captured dimensions
-                imageHeight
+                imageHeight,
+                flow
             )
 
             // Write to recording if active
@@ -107,7 +114,8 @@ class ARDataCapture(
         cameraFrameBitmap: Bitmap?,
         depthImage: Image?,      // Pre-acquired depth
         imageWidth: Int,         // Pre-captured dimensions
-        imageHeight: Int
+        imageHeight: Int,
+        flow: FlowControl?       // Server limits, null if none apply
     ): ArStream.ARFrame {
         val builder = ArStream.ARFrame.newBuilder()
             .setTimestampNs(frame.timestamp)
@@ -125,17 +133,17 @@ class ARDataCapture(
         )
 
         // Conditionally include RGB frame
-        if (currentQuality.sendRgb && config.sendRgbFrames && cameraFrameBitmap != null) {
+        if (currentQuality.sendRgb && config.sendRgbFrames && (flow?.sendRgb != false) && cameraFrameBitmap != null) {
             builder.rgbFrame = CameraDataExtractor.extractRgbFrame(
                 cameraFrameBitmap,
-                currentQuality.jpegQuality,
+                minOf(currentQuality.jpegQuality, flow?.jpegQuality ?: 100),
                 currentQuality.rgbWidth,
                 currentQuality.rgbHeight
             )
         }
 
         // Add depth frame if enabled and available
-        if (currentQuality.sendDepth && config.sendDepthFrames) {
+        if (currentQuality.sendDepth && config.sendDepthFrames && (flow?.sendDepth != false)) {
             if (depthImage != null) {
                 val depthFrame = CameraDataExtractor.processDepthImage(depthImage, currentQuality.depthScale.toInt())
                 if (depthFrame != null) {
@@ -6,6 +6,8 @@ import android.util.Log
 import ar_stream.ArStream
 import okhttp3.*
 import okio.ByteString
+import org.json.JSONException
+import org.json.JSONObject
 import java.util.ArrayDeque
 import java.util.concurrent.atomic.AtomicBoolean
 import java.util.concurrent.TimeUnit
@@ -40,6 +42,10 @@ class ARStreamClient(
     private val frameQueue = ArrayDeque<ArStream.ARFrame>(config.maxQueueSize)
     private val isConnected = AtomicBoolean(false)
 
+    // Latest flow-control recommendation from the server (null until one arrives)
+    @Volatile
+    private var flowControl: FlowControl? = null
+
     // Connection status tracking
     @Volatile
     private var connectionStatus = ConnectionStatus(
@@ -93,6 +99,7 @@ class ARStreamClient(
                 override fun onOpen(webSocket: WebSocket, response: Response) {
                     isConnected.set(true)
                     isReconnecting = false
+                    flowControl = null  // Wait for this server's recommendation
                     retryCount = 0  // Reset retry count on successful connection
                     
                     Log.i(TAG, "✓ WebSocket connected to $serverUrl")
@@ -115,6 +122,9 @@ class ARStreamClient(
 
                 override fun onMessage(webSocket: WebSocket, text: String) {
                     Log.d(TAG, "← Received text message: $text")
+                    if (text.startsWith("{")) {
+                        handleControlMessage(text)
+                    }
                 }
 
                 override fun onMessage(webSocket: WebSocket, bytes: ByteString) {
@@ -203,6 +213,33 @@ class ARStreamClient(
         }
     }
 
+    private fun handleControlMessage(text: String) {
+        try {
+            val json = JSONObject(text)
+            if (json.optString("type") == "flow_control") {
+                val update = FlowControl(
+                    maxFps = json.optInt("max_fps", config.maxFps),
+                    jpegQuality = json.optInt("jpeg_quality", config.rgbJpegQuality),
+                    sendRgb = json.optBoolean("send_rgb", true),
+                    sendDepth = json.optBoolean("send_depth", true)
+                )
+                if (update != flowControl) {
+                    Log.i(TAG, "Server flow control: $update")
+                }
+                flowControl = update
+            }
+        } catch (e: JSONException) {
+            Log.w(TAG, "Ignoring malformed control message: ${e.message}")
+        }
+    }
+
+    /**
+     * Latest limits recommended by the server, or null if there are none yet
+     * or StreamConfig.honorServerFlowControl is off.
+     */
+    fun getFlowControl(): FlowControl? =
+        if (config.honorServerFlowControl) flowControl else null
+
     private fun scheduleReconnect() {
         if (!autoReconnectEnabled || isReconnecting) {
             return
@@ -291,6 +328,7 @@ class ARStreamClient(
             "retry_count" to retryCount,
             "is_retrying" to isReconnecting,
             "last_error" to (connectionStatus.lastError ?: "None"),
+            "flow_control" to (flowControl?.toString() ?: "None"),
             "server_url" to serverUrl
         )
     }
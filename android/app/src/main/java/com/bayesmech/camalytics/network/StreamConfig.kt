@@ -18,7 +18,19 @@ data class StreamConfig(
     // Adaptive streaming
     val enableAdaptiveQuality: Boolean = true,
     val minFps: Int = 10,
-    val maxFps: Int = 30
+    val maxFps: Int = 30,
+
+    // Server flow control: apply the limits the server sends on /ar-stream
+    val honorServerFlowControl: Boolean = true
+)
+
+// Limits recommended by the server ({"type": "flow_control", ...} text messages).
+// They are applied on top of the local QualityLevel and never raise it.
+data class FlowControl(
+    val maxFps: Int,
+    val jpegQuality: Int,
+    val sendRgb: Boolean,
+    val sendDepth: Boolean
 )
 
 enum class QualityLevel(
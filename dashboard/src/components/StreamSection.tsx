@@ -1,5 +1,6 @@
 import { useDashboard } from '../context/DashboardContext'
 import StreamViewer from './StreamViewer'
+import { LiveVideoPlayer } from '../services/videoPlayer'
 import SegmentationToggle from './SegmentationToggle'
 import CameraMatrices from './CameraMatrices'
 import MotionChart from './MotionChart'
@@ -57,7 +58,9 @@ const StreamSection = () => {
           title="RGB Stream"
           badge="RGB"
           imageData={latestFrame?.rgb_frame}
+          imageUrl={latestFrame?.rgb_url}
           imageFormat="jpeg"
+          videoClientId={LiveVideoPlayer.isSupported() ? selectedClientId : null}
           placeholderIcon={'\u{1F3A5}'}
           placeholderText="Waiting for RGB frames..."
         />
@@ -66,6 +69,7 @@ const StreamSection = () => {
           title="Segmentation"
           badge="SEG"
           imageData={latestFrame?.segmentation_frame}
+          imageUrl={latestFrame?.segmentation_url}
           imageFormat="png"
           placeholderIcon={'\u{1F3AD}'}
           placeholderText="Waiting for segmentation..."
@@ -82,6 +86,7 @@ const StreamSection = () => {
           title="Depth Map"
           badge="DEPTH"
           imageData={latestFrame?.depth_frame}
+          imageUrl={latestFrame?.depth_url}
           imageFormat="jpeg"
           placeholderIcon={'\u{1F30A}'}
           placeholderText="Waiting for depth frames..."
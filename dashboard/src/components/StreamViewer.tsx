@@ -1,24 +1,52 @@
-import React from 'react'
+import React, { useEffect, useRef, useState } from 'react'
+import { dashboardWs } from '../services/websocket'
+import { LiveVideoPlayer } from '../services/videoPlayer'
 
 interface StreamViewerProps {
   title: string
   badge: string
   imageData?: string
+  imageUrl?: string
   imageFormat: 'jpeg' | 'png'
   placeholderIcon: string
   placeholderText: string
   headerExtra?: React.ReactNode
+  // Client whose video segments to play, for a video subscription; images are shown until the first keyframe
+  videoClientId?: string | null
 }
 
 const StreamViewer: React.FC<StreamViewerProps> = ({
   title,
   badge,
   imageData,
+  imageUrl,
   imageFormat,
   placeholderIcon,
   placeholderText,
   headerExtra,
+  videoClientId,
 }) => {
+  const src = imageUrl ?? (imageData ? `data:image/${imageFormat};base64,${imageData}` : undefined)
+  const videoRef = useRef<HTMLVideoElement>(null)
+  const [playing, setPlaying] = useState(false)
+
+  useEffect(() => {
+    const video = videoRef.current
+    if (!videoClientId || !video) return
+    const player = new LiveVideoPlayer(video)
+    // Segments go straight to the player: React may skip renders, a video stream may not skip segments
+    const removeListener = dashboardWs.addMessageListener((message) => {
+      if (message.type === 'frame_update' && message.client_id === videoClientId && message.rgb_segment) {
+        if (player.append(message.rgb_segment)) setPlaying(true)
+      }
+    })
+    return () => {
+      removeListener()
+      player.destroy()
+      setPlaying(false)
+    }
+  }, [videoClientId])
+
   return (
     <div className="stream-card">
       <div className="stream-header">
@@ -39,9 +67,17 @@ const StreamViewer: React.FC<StreamViewerProps> = ({
           position: 'relative',
         }}
       >
-        {imageData ? (
+        {videoClientId && (
+          <video
+            ref={videoRef}
+            muted
+            playsInline
+            style={{ width: '100%', height: '100%', objectFit: 'contain', display: playing ? 'block' : 'none' }}
+          />
+        )}
+        {playing ? null : src ? (
           <img
-            src={`data:image/${imageFormat};base64,${imageData}`}
+            src={src}
             alt={title}
             style={{ width: '100%', height: '100%', objectFit: 'contain' }}
           />
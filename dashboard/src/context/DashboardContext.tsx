@@ -7,6 +7,7 @@ import type {
   SegmentationUpdateMessage,
 } from '../types'
 import { dashboardWs } from '../services/websocket'
+import { LiveVideoPlayer } from '../services/videoPlayer'
 import { fetchClients, enableSegmentation, disableSegmentation } from '../services/api'
 
 interface DashboardState {
@@ -115,7 +116,8 @@ export const DashboardProvider: React.FC<{ children: React.ReactNode }> = ({ chi
   // --- Select client ---
   const selectClient = useCallback((clientId: string) => {
     setSelectedClientId(clientId)
-    dashboardWs.subscribe(clientId)
+    // H.264 for the RGB stream where the browser can play it (the server falls back to JPEG without PyAV)
+    dashboardWs.subscribe(clientId, { adaptive: true, mode: LiveVideoPlayer.isSupported() ? 'video' : 'jpeg' })
 
     // Reset frame tracking
     setFrameCount(0)
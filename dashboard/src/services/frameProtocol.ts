@@ -0,0 +1,159 @@
+import type { CameraData, FrameUpdateMessage, MotionData } from '../types'
+
+/**
+ * Parser for binary frame updates (dashboard protocol 2).
+ *
+ * Mirrors server/dashboard_protocol.py: a 28-byte little-endian header, the
+ * client id padded to 4 bytes, float32 camera matrices and motion, then the
+ * encoded images. Images are exposed as Blob URLs instead of base64 strings;
+ * video segments (format 3) as views into the message.
+ */
+
+export const PROTOCOL_BINARY = 2
+
+const MAGIC = 'CAMF'
+const HEADER_SIZE = 28
+const IMAGE_HEADER_SIZE = 8
+
+const FLAG_POSE = 1
+const FLAG_VIEW = 2
+const FLAG_PROJECTION = 4
+const FLAG_INTRINSIC = 8
+const FLAG_MOTION = 16
+const FLAG_RESOLUTION = 32
+const FLAG_CAMERA = 64
+
+const MATRICES: [keyof CameraData, number, number][] = [
+  ['pose_matrix', FLAG_POSE, 16],
+  ['view_matrix', FLAG_VIEW, 16],
+  ['projection_matrix', FLAG_PROJECTION, 16],
+  ['intrinsic_matrix', FLAG_INTRINSIC, 9],
+]
+
+// Same order and sizes as MOTION_LAYOUT in server/buffer/frame_record.py
+const MOTION_LAYOUT: [keyof MotionData, number][] = [
+  ['linear_acceleration', 3],
+  ['linear_velocity_pose', 3],
+  ['linear_velocity_accel', 3],
+  ['angular_velocity', 3],
+  ['gravity', 3],
+  ['orientation', 4],
+]
+const MOTION_SIZE = 19
+const AXES = ['x', 'y', 'z', 'w']
+
+const LAYER_KEYS: Record<number, 'rgb_url' | 'segmentation_url' | 'depth_url'> = {
+  1: 'rgb_url',
+  2: 'segmentation_url',
+  3: 'depth_url',
+}
+const MIME_TYPES: Record<number, string> = { 1: 'image/jpeg', 2: 'image/png' }
+const FORMAT_MP4 = 3
+
+const textDecoder = new TextDecoder()
+
+function readFloats(view: DataView, offset: number, count: number): number[] {
+  const values = new Array<number>(count)
+  for (let i = 0; i < count; i++) {
+    values[i] = view.getFloat32(offset + i * 4, true)
+  }
+  return values
+}
+
+/**
+ * Decodes one binary frame update.  Returns null if the buffer is not one.
+ * The caller owns the returned Blob URLs and must revoke them.
+ */
+export function parseFrameUpdate(buffer: ArrayBuffer): FrameUpdateMessage | null {
+  if (buffer.byteLength < HEADER_SIZE) return null
+  const view = new DataView(buffer)
+  if (textDecoder.decode(new Uint8Array(buffer, 0, 4)) !== MAGIC || view.getUint8(4) !== PROTOCOL_BINARY) {
+    return null
+  }
+
+  const flags = view.getUint8(5)
+  const trackingState = view.getUint8(6)
+  const imageCount = view.getUint8(7)
+  const idLength = view.getUint16(24, true)
+
+  const msg: FrameUpdateMessage = {
+    type: 'frame_update',
+    client_id: textDecoder.decode(new Uint8Array(buffer, HEADER_SIZE, idLength)),
+    frame_number: view.getUint32(8, true),
+    timestamp: Number(view.getBigInt64(12, true)),
+  }
+  let offset = HEADER_SIZE + ((idLength + 3) & ~3)
+
+  if (flags & FLAG_RESOLUTION) {
+    msg.resolution = { width: view.getUint16(20, true), height: view.getUint16(22, true) }
+  }
+
+  const camera: CameraData = {}
+  for (const [key, flag, count] of MATRICES) {
+    if (flags & flag) {
+      camera[key] = readFloats(view, offset, count)
+      offset += count * 4
+    }
+  }
+  if (flags & FLAG_CAMERA) {
+    msg.camera = camera
+    msg.tracking_state = trackingState
+  }
+
+  if (flags & FLAG_MOTION) {
+    const mask = view.getUint32(offset, true)
+    const values = readFloats(view, offset + 4, MOTION_SIZE)
+    offset += 4 + MOTION_SIZE * 4
+    const motion: Record<string, Record<string, number>> = {}
+    let start = 0
+    MOTION_LAYOUT.forEach(([field, size], index) => {
+      if (mask & (1 << index)) {
+        const vector: Record<string, number> = {}
+        for (let i = 0; i < size; i++) vector[AXES[i]] = values[start + i]
+        motion[field] = vector
+      }
+      start += size
+    })
+    msg.motion = motion as MotionData
+  }
+
+  for (let i = 0; i < imageCount; i++) {
+    const layer = view.getUint8(offset)
+    const format = view.getUint8(offset + 1)
+    const length = view.getUint32(offset + 4, true)
+    offset += IMAGE_HEADER_SIZE
+    const key = LAYER_KEYS[layer]
+    if (format === FORMAT_MP4) {
+      if (key === 'rgb_url') msg.rgb_segment = new Uint8Array(buffer, offset, length)
+    } else if (key) {
+      const blob = new Blob([new Uint8Array(buffer, offset, length)], { type: MIME_TYPES[format] })
+      msg[key] = URL.createObjectURL(blob)
+    }
+    offset += length
+  }
+
+  return msg
+}
+
+/**
+ * Whether a video segment can start playback: the server puts the init
+ * segment (ftyp + moov) in front of every segment that starts with a keyframe.
+ */
+export function isKeyframeSegment(segment: Uint8Array): boolean {
+  return segment.length >= 8 && textDecoder.decode(segment.subarray(4, 8)) === 'ftyp'
+}
+
+/**
+ * RFC 6381 codec string (e.g. avc1.42c01f) read from the avcC box of an init
+ * segment, for MediaSource.addSourceBuffer.
+ */
+export function videoCodec(segment: Uint8Array): string {
+  for (let i = 4; i + 8 <= segment.length; i++) {
+    // 'avcC', then configurationVersion, profile, profile compatibility, level
+    if (segment[i] === 0x61 && segment[i + 1] === 0x76 && segment[i + 2] === 0x63 && segment[i + 3] === 0x43) {
+      const hex = (b: number) => b.toString(16).padStart(2, '0')
+      return `avc1.${hex(segment[i + 5])}${hex(segment[i + 6])}${hex(segment[i + 7])}`
+    }
+  }
+  return 'avc1.42e01e'
+}
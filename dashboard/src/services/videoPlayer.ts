@@ -0,0 +1,103 @@
+import { isKeyframeSegment, videoCodec } from './frameProtocol'
+
+// Drop what lies this far behind the playhead
+const MAX_BUFFERED_S = 10
+// Jump to the live edge when playback falls this far behind
+const MAX_LATENCY_S = 0.5
+
+/**
+ * Plays the segments of a video subscription in a <video> element through
+ * MediaSource.  Playback starts at the first keyframe segment (which carries
+ * the init segment); segments are appended in 'sequence' mode, so a stream
+ * restarted by the server (new width, dropped segment) just continues.
+ */
+export class LiveVideoPlayer {
+  private mediaSource = new MediaSource()
+  private sourceBuffer: SourceBuffer | null = null
+  private queue: Uint8Array[] = []
+  private started = false
+  private readonly url: string
+  private readonly video: HTMLVideoElement
+
+  constructor(video: HTMLVideoElement) {
+    this.video = video
+    this.url = URL.createObjectURL(this.mediaSource)
+    this.mediaSource.addEventListener('sourceopen', () => this.flush())
+    video.muted = true
+    video.src = this.url
+  }
+
+  static isSupported(): boolean {
+    return typeof MediaSource !== 'undefined' && MediaSource.isTypeSupported('video/mp4; codecs="avc1.42e01e"')
+  }
+
+  /**
+   * Queues a segment.  Returns false while waiting for the first keyframe.
+   */
+  append(segment: Uint8Array): boolean {
+    if (!this.started) {
+      if (!isKeyframeSegment(segment)) return false
+      this.started = true
+    }
+    this.queue.push(segment)
+    this.flush()
+    return true
+  }
+
+  destroy(): void {
+    this.queue = []
+    if (this.mediaSource.readyState === 'open') {
+      try {
+        this.mediaSource.endOfStream()
+      } catch {
+        // Already ending
+      }
+    }
+    this.video.removeAttribute('src')
+    this.video.load()
+    URL.revokeObjectURL(this.url)
+  }
+
+  private flush(): void {
+    if (this.mediaSource.readyState !== 'open' || this.queue.length === 0) return
+    if (!this.sourceBuffer) {
+      this.sourceBuffer = this.mediaSource.addSourceBuffer(`video/mp4; codecs="${videoCodec(this.queue[0])}"`)
+      this.sourceBuffer.mode = 'sequence'
+      this.sourceBuffer.addEventListener('updateend', () => this.flush())
+    }
+    const buffer = this.sourceBuffer
+    if (buffer.updating) return
+
+    const now = this.video.currentTime
+    if (buffer.buffered.length && now - buffer.buffered.start(0) > MAX_BUFFERED_S) {
+      buffer.remove(0, now - 1)
+      return
+    }
+
+    const segments = this.queue
+    this.queue = []
+    const data = new Uint8Array(segments.reduce((size, segment) => size + segment.length, 0))
+    let offset = 0
+    for (const segment of segments) {
+      data.set(segment, offset)
+      offset += segment.length
+    }
+    try {
+      buffer.appendBuffer(data)
+    } catch {
+      // Buffer full or in error: start over at the next keyframe
+      this.started = false
+      return
+    }
+
+    if (buffer.buffered.length) {
+      const end = buffer.buffered.end(buffer.buffered.length - 1)
+      if (end - now > MAX_LATENCY_S) this.video.currentTime = Math.max(0, end - 0.05)
+    }
+    if (this.video.paused) {
+      this.video.play().catch(() => {
+        // Autoplay refused; the next segment retries
+      })
+    }
+  }
+}
@@ -1,8 +1,11 @@
-import type { DashboardMessage, ConnectionStatus } from '../types'
+import type { DashboardMessage, ConnectionStatus, FrameUpdateMessage, PingMessage, SubscriptionOptions } from '../types'
+import { parseFrameUpdate, PROTOCOL_BINARY } from './frameProtocol'
 
 type MessageListener = (message: DashboardMessage) => void
 type StatusListener = (status: ConnectionStatus) => void
 
+const IMAGE_URL_KEYS = ['rgb_url', 'segmentation_url', 'depth_url'] as const
+
 class DashboardWebSocketService {
   private ws: WebSocket | null = null
   private messageListeners: Set<MessageListener> = new Set()
@@ -10,10 +13,17 @@ class DashboardWebSocketService {
   private reconnectTimer: ReturnType<typeof setTimeout> | null = null
   private intentionalClose = false
   private _status: ConnectionStatus = 'Disconnected'
+  // Blob URLs per client and layer: [previous, current].  The previous one may
+  // still be on screen until React renders the current one, so it is revoked
+  // only when a newer frame arrives.
+  private imageUrls: Map<string, string[]> = new Map()
+  // Current subscription, re-sent after a reconnect
+  private subscription: ({ client_ids: string[] } & SubscriptionOptions) | null = null
 
   private get url(): string {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
-    return `${protocol}//${window.location.host}/ws/dashboard`
+    // Protocol 2: frame updates arrive as binary messages with raw image bytes
+    return `${protocol}//${window.location.host}/ws/dashboard?protocol=${PROTOCOL_BINARY}`
   }
 
   private setStatus(status: ConnectionStatus): void {
@@ -33,14 +43,31 @@ class DashboardWebSocketService {
     this.setStatus('Connecting')
 
     const ws = new WebSocket(this.url)
+    ws.binaryType = 'arraybuffer'
 
     ws.onopen = () => {
       this.setStatus('Connected')
+      if (this.subscription) {
+        this.send({ action: 'subscribe', ...this.subscription })
+      }
     }
 
     ws.onmessage = (event: MessageEvent) => {
+      if (event.data instanceof ArrayBuffer) {
+        const frame = parseFrameUpdate(event.data)
+        if (frame) {
+          this.trackImageUrls(frame)
+          this.messageListeners.forEach((cb) => cb(frame))
+        }
+        return
+      }
       try {
-        const message: DashboardMessage = JSON.parse(event.data)
+        const message: DashboardMessage | PingMessage = JSON.parse(event.data)
+        if (message.type === 'ping') {
+          // Heartbeat: the server closes dashboards that stop answering
+          this.send({ action: 'pong', t: message.t })
+          return
+        }
         this.messageListeners.forEach((cb) => cb(message))
       } catch {
         // Ignore non-JSON messages
@@ -79,14 +106,26 @@ class DashboardWebSocketService {
       this.ws = null
     }
 
+    this.revokeImageUrls()
     this.setStatus('Disconnected')
   }
 
   /**
-   * Sends a subscribe message to receive frames for the given client.
+   * Subscribes to frames of the given client only (replacing any previous
+   * subscription).  Omitting layers subscribes to all of them; by default the
+   * server adapts frame rate and quality to how fast this connection drains.
+   */
+  subscribe(clientId: string, options: SubscriptionOptions = { adaptive: true }): void {
+    this.subscription = { client_ids: [clientId], ...options }
+    this.send({ action: 'subscribe', ...this.subscription })
+  }
+
+  /**
+   * Stops receiving frames for all clients.
    */
-  subscribe(clientId: string): void {
-    this.send({ action: 'subscribe', client_id: clientId })
+  unsubscribe(): void {
+    this.subscription = null
+    this.send({ action: 'unsubscribe' })
   }
 
   /**
@@ -121,6 +160,25 @@ class DashboardWebSocketService {
     }
   }
 
+  private trackImageUrls(frame: FrameUpdateMessage): void {
+    for (const key of IMAGE_URL_KEYS) {
+      const url = frame[key]
+      if (!url) continue
+      const slot = `${frame.client_id}/${key}`
+      const urls = this.imageUrls.get(slot) ?? []
+      urls.push(url)
+      while (urls.length > 2) {
+        URL.revokeObjectURL(urls.shift()!)
+      }
+      this.imageUrls.set(slot, urls)
+    }
+  }
+
+  private revokeImageUrls(): void {
+    this.imageUrls.forEach((urls) => urls.forEach((url) => URL.revokeObjectURL(url)))
+    this.imageUrls.clear()
+  }
+
   private scheduleReconnect(): void {
     if (this.reconnectTimer !== null) return
     this.reconnectTimer = setTimeout(() => {
@@ -46,23 +46,48 @@ export interface FrameUpdateMessage {
   rgb_frame?: string
   segmentation_frame?: string
   depth_frame?: string
+  // Blob URLs of the images when the frame arrived over the binary protocol
+  rgb_url?: string
+  segmentation_url?: string
+  depth_url?: string
+  // Fragmented MP4 segment of the rgb layer, for video subscriptions
+  rgb_segment?: Uint8Array
   camera?: CameraData
   resolution?: Resolution
   tracking_state?: number
   motion?: MotionData
 }
 
+export interface StageTiming {
+  count: number
+  avg_ms: number
+  recent_ms: number
+}
+
+export interface PipelineStageStats {
+  policy: 'drop_oldest' | 'latest_only' | 'block'
+  queued: number
+  max_queued: number
+  processed: number
+  dropped: number
+}
+
 export interface ClientInfo {
   client_id: string
   frame_count: number
+  motion_samples?: number
   current_fps: number
   buffer_size: number
+  buffer_bytes?: number
   max_buffer_size: number
   depth_percentage: number
   frames_with_depth: number
   frames_without_depth: number
   seg_requests_sent: number
   seg_outputs_received: number
+  stage_timings?: Record<string, StageTiming>
+  pipeline?: Record<string, PipelineStageStats>
+  worker?: number
 }
 
 export interface ClientsUpdateMessage {
@@ -82,6 +107,27 @@ export type DashboardMessage =
   | ClientsUpdateMessage
   | SegmentationUpdateMessage
 
+/** Sent by the server after a quiet period; answered with a pong to keep the connection alive. */
+export interface PingMessage {
+  type: 'ping'
+  t: number
+}
+
+// === Dashboard subscriptions ===
+
+export type DashboardLayer = 'rgb' | 'depth' | 'segmentation' | 'motion'
+
+export interface SubscriptionOptions {
+  layers?: DashboardLayer[]
+  max_fps?: number
+  max_width?: number
+  jpeg_quality?: number
+  // Lower frame rate, width and quality while this connection lags
+  adaptive?: boolean
+  // 'video': rgb as H.264 segments for a MediaSource instead of one JPEG per frame
+  mode?: 'jpeg' | 'video'
+}
+
 // === Chart data ===
 
 export interface ChartPoint {
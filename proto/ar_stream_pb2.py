@@ -13,13 +13,27 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61r_stream.proto\x12\tar_stream\"\x93\x02\n\x07\x41RFrame\x12\x14\n\x0ctimestamp_ns\x18\x01 \x01(\x03\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12\x11\n\tdevice_id\x18\x08 \x01(\t\x12%\n\x06\x63\x61mera\x18\x03 \x01(\x0b\x32\x15.ar_stream.CameraData\x12(\n\trgb_frame\x18\x04 \x01(\x0b\x32\x15.ar_stream.ImageFrame\x12*\n\x0b\x64\x65pth_frame\x18\x05 \x01(\x0b\x32\x15.ar_stream.DepthFrame\x12%\n\x06motion\x18\x06 \x01(\x0b\x32\x15.ar_stream.MotionData\x12%\n\x06\x61rcore\x18\x07 \x01(\x0b\x32\x15.ar_stream.ARCoreData\"\x8e\x02\n\nCameraData\x12\x1c\n\x10intrinsic_matrix\x18\x01 \x03(\x02\x42\x02\x10\x01\x12\x1d\n\x11projection_matrix\x18\x02 \x03(\x02\x42\x02\x10\x01\x12\x17\n\x0bview_matrix\x18\x03 \x03(\x02\x42\x02\x10\x01\x12\x17\n\x0bpose_matrix\x18\x04 \x03(\x02\x42\x02\x10\x01\x12\x13\n\x0bimage_width\x18\x05 \x01(\r\x12\x14\n\x0cimage_height\x18\x06 \x01(\r\x12\x1a\n\x12\x66ov_horizontal_deg\x18\x07 \x01(\x02\x12\x18\n\x10\x66ov_vertical_deg\x18\x08 \x01(\x02\x12\x30\n\x0etracking_state\x18\t \x01(\x0e\x32\x18.ar_stream.TrackingState\"r\n\nImageFrame\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12&\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x16.ar_stream.ImageFormat\x12\r\n\x05width\x18\x03 \x01(\r\x12\x0e\n\x06height\x18\x04 \x01(\r\x12\x0f\n\x07quality\x18\x05 \x01(\r\"\x9f\x01\n\nDepthFrame\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05width\x18\x02 \x01(\r\x12\x0e\n\x06height\x18\x03 \x01(\r\x12&\n\x06\x66ormat\x18\x04 \x01(\x0e\x32\x16.ar_stream.DepthFormat\x12\x13\n\x0bmin_depth_m\x18\x05 \x01(\x02\x12\x13\n\x0bmax_depth_m\x18\x06 \x01(\x02\x12\x12\n\nconfidence\x18\x07 \x01(\x0c\"\xc7\x02\n\nMotionData\x12$\n\x0b\x64\x65vice_pose\x18\x01 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x30\n\x14linear_velocity_pose\x18\x02 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x31\n\x15linear_velocity_accel\x18\t \x01(\x0b\x32\x12.ar_stream.Vector3\x12,\n\x10\x61ngular_velocity\x18\x03 \x01(\x0b\x32\x12.ar_stream.Vector3\x12/\n\x13linear_acceleration\x18\x04 \x01(\x0b\x32\x12.ar_stream.Vector3\x12#\n\x07gravity\x18\x05 \x01(\x0b\x32\x12.ar_stream.Vector3\x12*\n\x0borientation\x18\x06 \x01(\x0b\x32\x15.ar_stream.Quaternion\"\xb0\x01\n\nARCoreData\x12 \n\x06planes\x18\x01 \x03(\x0b\x32\x10.ar_stream.Plane\x12*\n\x0bpoint_cloud\x18\x02 \x01(\x0b\x32\x15.ar_stream.PointCloud\x12\x30\n\x0elight_estimate\x18\x03 \x01(\x0b\x32\x18.ar_stream.LightEstimate\x12\"\n\x07\x61nchors\x18\x04 \x03(\x0b\x32\x11.ar_stream.Anchor\"U\n\x04Pose\x12$\n\x08position\x18\x01 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\'\n\x08rotation\x18\x02 \x01(\x0b\x32\x15.ar_stream.Quaternion\"*\n\x07Vector3\x12\t\n\x01x\x18\x01 \x01(\x02\x12\t\n\x01y\x18\x02 \x01(\x02\x12\t\n\x01z\x18\x03 \x01(\x02\"8\n\nQuaternion\x12\t\n\x01x\x18\x01 \x01(\x02\x12\t\n\x01y\x18\x02 \x01(\x02\x12\t\n\x01z\x18\x03 \x01(\x02\x12\t\n\x01w\x18\x04 \x01(\x02\"\xa6\x01\n\x05Plane\x12\n\n\x02id\x18\x01 \x01(\x0c\x12$\n\x0b\x63\x65nter_pose\x18\x02 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x10\n\x08\x65xtent_x\x18\x03 \x01(\x02\x12\x10\n\x08\x65xtent_z\x18\x04 \x01(\x02\x12\"\n\x04type\x18\x05 \x01(\x0e\x32\x14.ar_stream.PlaneType\x12#\n\x07polygon\x18\x06 \x03(\x0b\x32\x12.ar_stream.Vector3\"5\n\nPointCloud\x12\x12\n\x06points\x18\x01 \x03(\x02\x42\x02\x10\x01\x12\x13\n\x0bpoint_count\x18\x02 \x01(\r\"\x94\x01\n\rLightEstimate\x12\x30\n\x14main_light_direction\x18\x01 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x30\n\x14main_light_intensity\x18\x02 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x1f\n\x13spherical_harmonics\x18\x03 \x03(\x02\x42\x02\x10\x01\"e\n\x06\x41nchor\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\x1d\n\x04pose\x18\x02 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x30\n\x0etracking_state\x18\x03 \x01(\x0e\x32\x18.ar_stream.TrackingState\"a\n\x10SegmentationMask\x12\x11\n\tobject_id\x18\x01 \x01(\r\x12\x11\n\tmask_data\x18\x02 \x01(\x0c\x12\x12\n\nconfidence\x18\x03 \x01(\x02\x12\x13\n\x0bpixel_count\x18\x04 \x01(\r\"\xaa\x01\n\x12SegmentationOutput\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x04\x12*\n\x05masks\x18\x04 \x03(\x0b\x32\x1b.ar_stream.SegmentationMask\x12\x13\n\x0bprompt_type\x18\x05 \x01(\t\x12\x13\n\x0bnum_objects\x18\x06 \x01(\r\"\x81\x01\n\x13SegmentationRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12*\n\x0bimage_frame\x18\x03 \x01(\x0b\x32\x15.ar_stream.ImageFrame\x12\x14\n\x0ctimestamp_ms\x18\x04 \x01(\x04*X\n\rTrackingState\x12\x1a\n\x16TRACKING_STATE_UNKNOWN\x10\x00\x12\x10\n\x0cNOT_TRACKING\x10\x01\x12\x0b\n\x07LIMITED\x10\x02\x12\x0c\n\x08TRACKING\x10\x03*i\n\x0bImageFormat\x12\x18\n\x14IMAGE_FORMAT_UNKNOWN\x10\x00\x12\x0b\n\x07RGB_888\x10\x01\x12\r\n\tRGBA_8888\x10\x02\x12\x0b\n\x07YUV_420\x10\x03\x12\x08\n\x04JPEG\x10\x04\x12\r\n\tGRAYSCALE\x10\x05*S\n\x0b\x44\x65pthFormat\x12\x18\n\x14\x44\x45PTH_FORMAT_UNKNOWN\x10\x00\x12\x16\n\x12UINT16_MILLIMETERS\x10\x01\x12\x12\n\x0e\x46LOAT32_METERS\x10\x02*o\n\tPlaneType\x12\x16\n\x12PLANE_TYPE_UNKNOWN\x10\x00\x12\x1c\n\x18HORIZONTAL_UPWARD_FACING\x10\x01\x12\x1e\n\x1aHORIZONTAL_DOWNWARD_FACING\x10\x02\x12\x0c\n\x08VERTICAL\x10\x03\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61r_stream.proto\x12\tar_stream\"\x93\x02\n\x07\x41RFrame\x12\x14\n\x0ctimestamp_ns\x18\x01 \x01(\x03\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12\x11\n\tdevice_id\x18\x08 \x01(\t\x12%\n\x06\x63\x61mera\x18\x03 \x01(\x0b\x32\x15.ar_stream.CameraData\x12(\n\trgb_frame\x18\x04 \x01(\x0b\x32\x15.ar_stream.ImageFrame\x12*\n\x0b\x64\x65pth_frame\x18\x05 \x01(\x0b\x32\x15.ar_stream.DepthFrame\x12%\n\x06motion\x18\x06 \x01(\x0b\x32\x15.ar_stream.MotionData\x12%\n\x06\x61rcore\x18\x07 \x01(\x0b\x32\x15.ar_stream.ARCoreData\"o\n\x0c\x41RFrameBatch\x12\x11\n\tdevice_id\x18\x01 \x01(\t\x12\"\n\x06\x66rames\x18\x02 \x03(\x0b\x32\x12.ar_stream.ARFrame\x12(\n\x06motion\x18\x03 \x01(\x0b\x32\x18.ar_stream.MotionSamples\"\xdb\x01\n\rMotionSamples\x12\x18\n\x0ctimestamp_ns\x18\x01 \x03(\x03\x42\x02\x10\x01\x12\x1f\n\x13linear_acceleration\x18\x02 \x03(\x02\x42\x02\x10\x01\x12 \n\x14linear_velocity_pose\x18\x03 \x03(\x02\x42\x02\x10\x01\x12!\n\x15linear_velocity_accel\x18\x04 \x03(\x02\x42\x02\x10\x01\x12\x1c\n\x10\x61ngular_velocity\x18\x05 \x03(\x02\x42\x02\x10\x01\x12\x13\n\x07gravity\x18\x06 \x03(\x02\x42\x02\x10\x01\x12\x17\n\x0borientation\x18\x07 \x03(\x02\x42\x02\x10\x01\"\x8e\x02\n\nCameraData\x12\x1c\n\x10intrinsic_matrix\x18\x01 \x03(\x02\x42\x02\x10\x01\x12\x1d\n\x11projection_matrix\x18\x02 \x03(\x02\x42\x02\x10\x01\x12\x17\n\x0bview_matrix\x18\x03 \x03(\x02\x42\x02\x10\x01\x12\x17\n\x0bpose_matrix\x18\x04 \x03(\x02\x42\x02\x10\x01\x12\x13\n\x0bimage_width\x18\x05 \x01(\r\x12\x14\n\x0cimage_height\x18\x06 \x01(\r\x12\x1a\n\x12\x66ov_horizontal_deg\x18\x07 \x01(\x02\x12\x18\n\x10\x66ov_vertical_deg\x18\x08 \x01(\x02\x12\x30\n\x0etracking_state\x18\t \x01(\x0e\x32\x18.ar_stream.TrackingState\"r\n\nImageFrame\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12&\n\x06\x66ormat\x18\x02 \x01(\x0e\x32\x16.ar_stream.ImageFormat\x12\r\n\x05width\x18\x03 \x01(\r\x12\x0e\n\x06height\x18\x04 \x01(\r\x12\x0f\n\x07quality\x18\x05 \x01(\r\"\x9f\x01\n\nDepthFrame\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05width\x18\x02 \x01(\r\x12\x0e\n\x06height\x18\x03 \x01(\r\x12&\n\x06\x66ormat\x18\x04 \x01(\x0e\x32\x16.ar_stream.DepthFormat\x12\x13\n\x0bmin_depth_m\x18\x05 \x01(\x02\x12\x13\n\x0bmax_depth_m\x18\x06 \x01(\x02\x12\x12\n\nconfidence\x18\x07 \x01(\x0c\"\xc7\x02\n\nMotionData\x12$\n\x0b\x64\x65vice_pose\x18\x01 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x30\n\x14linear_velocity_pose\x18\x02 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x31\n\x15linear_velocity_accel\x18\t \x01(\x0b\x32\x12.ar_stream.Vector3\x12,\n\x10\x61ngular_velocity\x18\x03 \x01(\x0b\x32\x12.ar_stream.Vector3\x12/\n\x13linear_acceleration\x18\x04 \x01(\x0b\x32\x12.ar_stream.Vector3\x12#\n\x07gravity\x18\x05 \x01(\x0b\x32\x12.ar_stream.Vector3\x12*\n\x0borientation\x18\x06 \x01(\x0b\x32\x15.ar_stream.Quaternion\"\xb0\x01\n\nARCoreData\x12 \n\x06planes\x18\x01 \x03(\x0b\x32\x10.ar_stream.Plane\x12*\n\x0bpoint_cloud\x18\x02 \x01(\x0b\x32\x15.ar_stream.PointCloud\x12\x30\n\x0elight_estimate\x18\x03 \x01(\x0b\x32\x18.ar_stream.LightEstimate\x12\"\n\x07\x61nchors\x18\x04 \x03(\x0b\x32\x11.ar_stream.Anchor\"U\n\x04Pose\x12$\n\x08position\x18\x01 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\'\n\x08rotation\x18\x02 \x01(\x0b\x32\x15.ar_stream.Quaternion\"*\n\x07Vector3\x12\t\n\x01x\x18\x01 \x01(\x02\x12\t\n\x01y\x18\x02 \x01(\x02\x12\t\n\x01z\x18\x03 \x01(\x02\"8\n\nQuaternion\x12\t\n\x01x\x18\x01 \x01(\x02\x12\t\n\x01y\x18\x02 \x01(\x02\x12\t\n\x01z\x18\x03 \x01(\x02\x12\t\n\x01w\x18\x04 \x01(\x02\"\xa6\x01\n\x05Plane\x12\n\n\x02id\x18\x01 \x01(\x0c\x12$\n\x0b\x63\x65nter_pose\x18\x02 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x10\n\x08\x65xtent_x\x18\x03 \x01(\x02\x12\x10\n\x08\x65xtent_z\x18\x04 \x01(\x02\x12\"\n\x04type\x18\x05 \x01(\x0e\x32\x14.ar_stream.PlaneType\x12#\n\x07polygon\x18\x06 \x03(\x0b\x32\x12.ar_stream.Vector3\"5\n\nPointCloud\x12\x12\n\x06points\x18\x01 \x03(\x02\x42\x02\x10\x01\x12\x13\n\x0bpoint_count\x18\x02 \x01(\r\"\x94\x01\n\rLightEstimate\x12\x30\n\x14main_light_direction\x18\x01 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x30\n\x14main_light_intensity\x18\x02 \x01(\x0b\x32\x12.ar_stream.Vector3\x12\x1f\n\x13spherical_harmonics\x18\x03 \x03(\x02\x42\x02\x10\x01\"e\n\x06\x41nchor\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\x1d\n\x04pose\x18\x02 \x01(\x0b\x32\x0f.ar_stream.Pose\x12\x30\n\x0etracking_state\x18\x03 \x01(\x0e\x32\x18.ar_stream.TrackingState\"a\n\x10SegmentationMask\x12\x11\n\tobject_id\x18\x01 \x01(\r\x12\x11\n\tmask_data\x18\x02 \x01(\x0c\x12\x12\n\nconfidence\x18\x03 \x01(\x02\x12\x13\n\x0bpixel_count\x18\x04 \x01(\r\"\x93\x02\n\x12SegmentationOutput\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12\x14\n\x0ctimestamp_ms\x18\x03 \x01(\x04\x12*\n\x05masks\x18\x04 \x03(\x0b\x32\x1b.ar_stream.SegmentationMask\x12\x13\n\x0bprompt_type\x18\x05 \x01(\t\x12\x13\n\x0bnum_objects\x18\x06 \x01(\r\x12\x1c\n\x14request_timestamp_ms\x18\x07 \x01(\x04\x12\x13\n\x0breceived_ms\x18\x08 \x01(\x04\x12\x1a\n\x12inference_start_ms\x18\t \x01(\x04\x12\x18\n\x10inference_end_ms\x18\n \x01(\x04\"\x81\x01\n\x13SegmentationRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x14\n\x0c\x66rame_number\x18\x02 \x01(\r\x12*\n\x0bimage_frame\x18\x03 \x01(\x0b\x32\x15.ar_stream.ImageFrame\x12\x14\n\x0ctimestamp_ms\x18\x04 \x01(\x04\"\xf3\x01\n\x13SegmentationControl\x12\x12\n\nrequest_id\x18\x01 \x01(\r\x12\x35\n\x06\x61\x63tion\x18\x02 \x01(\x0e\x32%.ar_stream.SegmentationControl.Action\x12\x12\n\nsession_id\x18\x03 \x01(\t\x12\x0c\n\x04text\x18\x04 \x01(\t\x12\x0e\n\x06points\x18\x05 \x03(\x02\x12\x0e\n\x06labels\x18\x06 \x03(\x05\"O\n\x06\x41\x63tion\x12\x12\n\x0e\x41\x43TION_UNKNOWN\x10\x00\x12\x11\n\rSTART_SESSION\x10\x01\x12\n\n\x06PROMPT\x10\x02\x12\x12\n\x0e\x44\x45LETE_SESSION\x10\x03\"v\n\x18SegmentationControlReply\x12\x12\n\nrequest_id\x18\x01 \x01(\r\x12\x0e\n\x06status\x18\x02 \x01(\r\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x12\x12\n\nsession_id\x18\x04 \x01(\t\x12\x13\n\x0bnum_objects\x18\x05 \x01(\r\"M\n\x12SegmentationCredit\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63redits\x18\x02 \x01(\r\x12\x12\n\nlatency_ms\x18\x03 \x01(\x02\"\x9d\x02\n\x14SegmentationEnvelope\x12/\n\x05\x66rame\x18\x01 \x01(\x0b\x32\x1e.ar_stream.SegmentationRequestH\x00\x12/\n\x06output\x18\x02 \x01(\x0b\x32\x1d.ar_stream.SegmentationOutputH\x00\x12\x31\n\x07\x63ontrol\x18\x03 \x01(\x0b\x32\x1e.ar_stream.SegmentationControlH\x00\x12\x34\n\x05reply\x18\x04 \x01(\x0b\x32#.ar_stream.SegmentationControlReplyH\x00\x12/\n\x06\x63redit\x18\x05 \x01(\x0b\x32\x1d.ar_stream.SegmentationCreditH\x00\x42\t\n\x07payload*X\n\rTrackingState\x12\x1a\n\x16TRACKING_STATE_UNKNOWN\x10\x00\x12\x10\n\x0cNOT_TRACKING\x10\x01\x12\x0b\n\x07LIMITED\x10\x02\x12\x0c\n\x08TRACKING\x10\x03*i\n\x0bImageFormat\x12\x18\n\x14IMAGE_FORMAT_UNKNOWN\x10\x00\x12\x0b\n\x07RGB_888\x10\x01\x12\r\n\tRGBA_8888\x10\x02\x12\x0b\n\x07YUV_420\x10\x03\x12\x08\n\x04JPEG\x10\x04\x12\r\n\tGRAYSCALE\x10\x05*S\n\x0b\x44\x65pthFormat\x12\x18\n\x14\x44\x45PTH_FORMAT_UNKNOWN\x10\x00\x12\x16\n\x12UINT16_MILLIMETERS\x10\x01\x12\x12\n\x0e\x46LOAT32_METERS\x10\x02*o\n\tPlaneType\x12\x16\n\x12PLANE_TYPE_UNKNOWN\x10\x00\x12\x1c\n\x18HORIZONTAL_UPWARD_FACING\x10\x01\x12\x1e\n\x1aHORIZONTAL_DOWNWARD_FACING\x10\x02\x12\x0c\n\x08VERTICAL\x10\x03\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'ar_stream_pb2', globals())
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
+  _MOTIONSAMPLES.fields_by_name['timestamp_ns']._options = None
+  _MOTIONSAMPLES.fields_by_name['timestamp_ns']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['linear_acceleration']._options = None
+  _MOTIONSAMPLES.fields_by_name['linear_acceleration']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['linear_velocity_pose']._options = None
+  _MOTIONSAMPLES.fields_by_name['linear_velocity_pose']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['linear_velocity_accel']._options = None
+  _MOTIONSAMPLES.fields_by_name['linear_velocity_accel']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['angular_velocity']._options = None
+  _MOTIONSAMPLES.fields_by_name['angular_velocity']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['gravity']._options = None
+  _MOTIONSAMPLES.fields_by_name['gravity']._serialized_options = b'\020\001'
+  _MOTIONSAMPLES.fields_by_name['orientation']._options = None
+  _MOTIONSAMPLES.fields_by_name['orientation']._serialized_options = b'\020\001'
   _CAMERADATA.fields_by_name['intrinsic_matrix']._options = None
   _CAMERADATA.fields_by_name['intrinsic_matrix']._serialized_options = b'\020\001'
   _CAMERADATA.fields_by_name['projection_matrix']._options = None
@@ -32,44 +46,58 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _POINTCLOUD.fields_by_name['points']._serialized_options = b'\020\001'
   _LIGHTESTIMATE.fields_by_name['spherical_harmonics']._options = None
   _LIGHTESTIMATE.fields_by_name['spherical_harmonics']._serialized_options = b'\020\001'
-  _TRACKINGSTATE._serialized_start=2439
-  _TRACKINGSTATE._serialized_end=2527
-  _IMAGEFORMAT._serialized_start=2529
-  _IMAGEFORMAT._serialized_end=2634
-  _DEPTHFORMAT._serialized_start=2636
-  _DEPTHFORMAT._serialized_end=2719
-  _PLANETYPE._serialized_start=2721
-  _PLANETYPE._serialized_end=2832
+  _TRACKINGSTATE._serialized_start=3612
+  _TRACKINGSTATE._serialized_end=3700
+  _IMAGEFORMAT._serialized_start=3702
+  _IMAGEFORMAT._serialized_end=3807
+  _DEPTHFORMAT._serialized_start=3809
+  _DEPTHFORMAT._serialized_end=3892
+  _PLANETYPE._serialized_start=3894
+  _PLANETYPE._serialized_end=4005
   _ARFRAME._serialized_start=31
   _ARFRAME._serialized_end=306
-  _CAMERADATA._serialized_start=309
-  _CAMERADATA._serialized_end=579
-  _IMAGEFRAME._serialized_start=581
-  _IMAGEFRAME._serialized_end=695
-  _DEPTHFRAME._serialized_start=698
-  _DEPTHFRAME._serialized_end=857
-  _MOTIONDATA._serialized_start=860
-  _MOTIONDATA._serialized_end=1187
-  _ARCOREDATA._serialized_start=1190
-  _ARCOREDATA._serialized_end=1366
-  _POSE._serialized_start=1368
-  _POSE._serialized_end=1453
-  _VECTOR3._serialized_start=1455
-  _VECTOR3._serialized_end=1497
-  _QUATERNION._serialized_start=1499
-  _QUATERNION._serialized_end=1555
-  _PLANE._serialized_start=1558
-  _PLANE._serialized_end=1724
-  _POINTCLOUD._serialized_start=1726
-  _POINTCLOUD._serialized_end=1779
-  _LIGHTESTIMATE._serialized_start=1782
-  _LIGHTESTIMATE._serialized_end=1930
-  _ANCHOR._serialized_start=1932
-  _ANCHOR._serialized_end=2033
-  _SEGMENTATIONMASK._serialized_start=2035
-  _SEGMENTATIONMASK._serialized_end=2132
-  _SEGMENTATIONOUTPUT._serialized_start=2135
-  _SEGMENTATIONOUTPUT._serialized_end=2305
-  _SEGMENTATIONREQUEST._serialized_start=2308
-  _SEGMENTATIONREQUEST._serialized_end=2437
+  _ARFRAMEBATCH._serialized_start=308
+  _ARFRAMEBATCH._serialized_end=419
+  _MOTIONSAMPLES._serialized_start=422
+  _MOTIONSAMPLES._serialized_end=641
+  _CAMERADATA._serialized_start=644
+  _CAMERADATA._serialized_end=914
+  _IMAGEFRAME._serialized_start=916
+  _IMAGEFRAME._serialized_end=1030
+  _DEPTHFRAME._serialized_start=1033
+  _DEPTHFRAME._serialized_end=1192
+  _MOTIONDATA._serialized_start=1195
+  _MOTIONDATA._serialized_end=1522
+  _ARCOREDATA._serialized_start=1525
+  _ARCOREDATA._serialized_end=1701
+  _POSE._serialized_start=1703
+  _POSE._serialized_end=1788
+  _VECTOR3._serialized_start=1790
+  _VECTOR3._serialized_end=1832
+  _QUATERNION._serialized_start=1834
+  _QUATERNION._serialized_end=1890
+  _PLANE._serialized_start=1893
+  _PLANE._serialized_end=2059
+  _POINTCLOUD._serialized_start=2061
+  _POINTCLOUD._serialized_end=2114
+  _LIGHTESTIMATE._serialized_start=2117
+  _LIGHTESTIMATE._serialized_end=2265
+  _ANCHOR._serialized_start=2267
+  _ANCHOR._serialized_end=2368
+  _SEGMENTATIONMASK._serialized_start=2370
+  _SEGMENTATIONMASK._serialized_end=2467
+  _SEGMENTATIONOUTPUT._serialized_start=2470
+  _SEGMENTATIONOUTPUT._serialized_end=2745
+  _SEGMENTATIONREQUEST._serialized_start=2748
+  _SEGMENTATIONREQUEST._serialized_end=2877
+  _SEGMENTATIONCONTROL._serialized_start=2880
+  _SEGMENTATIONCONTROL._serialized_end=3123
+  _SEGMENTATIONCONTROL_ACTION._serialized_start=3044
+  _SEGMENTATIONCONTROL_ACTION._serialized_end=3123
+  _SEGMENTATIONCONTROLREPLY._serialized_start=3125
+  _SEGMENTATIONCONTROLREPLY._serialized_end=3243
+  _SEGMENTATIONCREDIT._serialized_start=3245
+  _SEGMENTATIONCREDIT._serialized_end=3322
+  _SEGMENTATIONENVELOPE._serialized_start=3325
+  _SEGMENTATIONENVELOPE._serialized_end=3610
 # @@protoc_insertion_point(module_scope)
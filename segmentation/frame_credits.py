@@ -0,0 +1,94 @@
+"""
+Credit-based flow control for frames on /segment/channel.
+The client sends a session's frame only while it holds a credit; credits are
+granted as frames are consumed, up to a per-session window that grows while
+propagation stays under the latency target and halves when it does not. Fast
+hardware gets a steady stream of fresh frames, a loaded GPU gets one frame per
+inference instead of a backlog of stale ones.
+"""
+
+from typing import Optional
+
+
+# Overridable in the `flow_control` section of segmentation_config.yaml
+CREDIT_DEFAULTS = {
+    'initial_window': 2,        # Frames a session may have outstanding before latency is measured
+    'max_window': 8,
+    'target_latency_ms': 500,   # Grow the window while propagation is faster than this, halve it when slower
+    'idle_interval_s': 1.0,     # While nothing is tracked, one frame per interval keeps the buffer fresh for prompts
+    'latency_smoothing': 0.3,   # Weight of the newest propagation in the latency average
+}
+
+
+def load_credit_settings(config: dict) -> dict:
+    """Merge the `flow_control` section of segmentation_config.yaml over CREDIT_DEFAULTS"""
+    return {**CREDIT_DEFAULTS, **(config.get('flow_control') or {})}
+
+
+class SessionCredits:
+    """
+    Frame credits of one session.
+
+    The window bounds frames granted but not yet received plus frames received
+    while a propagation was running; the latter are only given back once it ends.
+    """
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.window = int(settings['initial_window'])
+        self.outstanding = 0                     # Granted, not yet received
+        self.queued = 0                          # Received during a propagation
+        self.latency_ms: Optional[float] = None  # Smoothed propagation time
+        self.last_grant = float('-inf')          # time.monotonic() of the last grant
+        self.timer = None                        # Pending delayed grant (asyncio.TimerHandle)
+
+    def reset(self):
+        """Forget credits in flight (the client reconnected and starts over)"""
+        self.outstanding = 0
+        self.queued = 0
+
+    def on_frame(self):
+        """A frame arrived (with or without a credit: a client may probe)"""
+        self.outstanding = max(0, self.outstanding - 1)
+
+    def on_queued(self):
+        """The frame arrived while a propagation was running"""
+        self.queued += 1
+
+    def on_inference(self, seconds: Optional[float]):
+        """A propagation ended; seconds is None if it had nothing to track"""
+        self.queued = 0
+        if seconds is None:
+            return
+        latency_ms = seconds * 1000
+        alpha = self.settings['latency_smoothing']
+        self.latency_ms = latency_ms if self.latency_ms is None else (
+            alpha * latency_ms + (1 - alpha) * self.latency_ms)
+        if self.latency_ms <= self.settings['target_latency_ms']:
+            self.window = min(int(self.settings['max_window']), self.window + 1)
+        else:
+            self.window = max(1, self.window // 2)
+
+    def idle_wait(self, tracking: bool, now: float) -> float:
+        """Seconds until a session that tracks nothing may be granted its next frame"""
+        if tracking:
+            return 0.0
+        return max(0.0, self.last_grant + self.settings['idle_interval_s'] - now)
+
+    def grant(self, tracking: bool, now: float) -> int:
+        """Credits to hand out now (already counted as outstanding)"""
+        window = self.window if tracking else 1
+        credits = window - self.outstanding - self.queued
+        if credits <= 0 or self.idle_wait(tracking, now) > 0:
+            return 0
+        self.outstanding += credits
+        self.last_grant = now
+        return credits
+
+    def to_dict(self) -> dict:
+        return {
+            'window': self.window,
+            'outstanding': self.outstanding,
+            'queued': self.queued,
+            'latency_ms': None if self.latency_ms is None else round(self.latency_ms, 1),
+        }
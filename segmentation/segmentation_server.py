@@ -2,7 +2,8 @@
 Standalone Segmentation Server
 Handles video segmentation independently from the main AR streaming server
 Uses binary protobuf over WebSocket for all video data communication
-HTTP API for session control and prompts
+HTTP API for session control and prompts, or a single multiplexed WebSocket
+(/segment/channel) carrying frames, results and session control of all sessions
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
@@ -11,6 +12,7 @@ import asyncio
 import logging
 import numpy as np
 import time
+from collections import OrderedDict
 from typing import Dict
 from pathlib import Path
 import sys
@@ -21,7 +23,8 @@ import cv2
 sys.path.append(str(Path(__file__).parent.parent))
 from proto import ar_stream_pb2
 
-from segmentation_service import segmentation_service, encode_mask_to_base64
+from segmentation_service import CONFIG, segmentation_service, encode_mask_to_base64
+from frame_credits import SessionCredits, load_credit_settings
 
 # Setup logging
 logging.basicConfig(
@@ -40,9 +43,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class Channel:
+    """A multiplexed /segment/channel connection, shared by the sessions started or streamed on it"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.send_lock = asyncio.Lock()  # Results and control replies are sent from separate tasks
+
+    async def send(self, envelope: ar_stream_pb2.SegmentationEnvelope):
+        async with self.send_lock:
+            await self.websocket.send_bytes(envelope.SerializeToString())
+
+
 # Session management
-sessions: Dict[str, dict] = {}  # session_id -> {ws: WebSocket, last_activity: float}
+# session_id -> {ws: WebSocket of /segment/stream, or channel: Channel; last_activity: float}
+sessions: Dict[str, dict] = {}
 session_locks: Dict[str, asyncio.Lock] = {}
+# Frame credits of the sessions on a channel
+credit_settings = load_credit_settings(CONFIG)
+session_credits: Dict[str, SessionCredits] = {}
+# Recent requests per session, for the timings echoed in SegmentationOutput:
+# session_id -> frame_number -> (request timestamp_ms, received at in ms)
+MAX_TRACKED_REQUESTS = 64
+request_arrivals: Dict[str, 'OrderedDict[int, tuple]'] = {}
+
+
+def note_request(session_id: str, request: ar_stream_pb2.SegmentationRequest):
+    arrivals = request_arrivals.setdefault(session_id, OrderedDict())
+    arrivals[request.frame_number] = (request.timestamp_ms, int(time.time() * 1000))
+    while len(arrivals) > MAX_TRACKED_REQUESTS:
+        arrivals.popitem(last=False)
+
+
+async def close_session_socket(session_data: dict):
+    """Close a session's own WebSocket (a channel stays open for its other sessions)"""
+    if session_data.get('ws') is None:
+        return
+    try:
+        await session_data['ws'].close()
+    except:
+        pass
 
 
 async def cleanup_inactive_sessions():
@@ -63,13 +103,11 @@ async def cleanup_inactive_sessions():
             await segmentation_service.cleanup_session(session_id)
             if session_id in sessions:
                 # Close WebSocket if still open
-                try:
-                    await sessions[session_id]['ws'].close()
-                except:
-                    pass
+                await close_session_socket(sessions[session_id])
                 del sessions[session_id]
             if session_id in session_locks:
                 del session_locks[session_id]
+            drop_credits(session_id)
 
 
 @app.on_event("startup")
@@ -194,14 +232,12 @@ async def delete_session(session_id: str):
 
         if session_id in sessions:
             # Close WebSocket if still open
-            try:
-                await sessions[session_id]['ws'].close()
-            except:
-                pass
+            await close_session_socket(sessions[session_id])
             del sessions[session_id]
 
         if session_id in session_locks:
             del session_locks[session_id]
+        drop_credits(session_id)
 
         logger.info(f"Deleted session: {session_id}")
 
@@ -218,6 +254,7 @@ async def get_status():
     status = segmentation_service.get_status()
     status['active_sessions'] = len(sessions)
     status['session_ids'] = list(sessions.keys())
+    status['credits'] = {session_id: credits.to_dict() for session_id, credits in session_credits.items()}
     return status
 
 
@@ -265,50 +302,7 @@ async def stream_websocket(websocket: WebSocket, session_id: str = None):
             try:
                 request = ar_stream_pb2.SegmentationRequest()
                 request.ParseFromString(data)
-
-                # Validate
-                if not request.HasField('image_frame'):
-                    logger.warning(f"Received request without image_frame from {session_id}")
-                    continue
-
-                # Extract RGB frame from ImageFrame
-                image_frame = request.image_frame
-
-                if image_frame.format == ar_stream_pb2.JPEG:
-                    # Decode JPEG
-                    import cv2
-                    jpg_data = np.frombuffer(image_frame.data, dtype=np.uint8)
-                    rgb_frame = cv2.imdecode(jpg_data, cv2.IMREAD_COLOR)
-                    rgb_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_BGR2RGB)
-
-                elif image_frame.format == ar_stream_pb2.RGB_888:
-                    # Raw RGB
-                    rgb_data = np.frombuffer(image_frame.data, dtype=np.uint8)
-                    rgb_frame = rgb_data.reshape(
-                        (image_frame.height, image_frame.width, 3)
-                    )
-
-                else:
-                    logger.warning(f"Unsupported image format: {image_frame.format}")
-                    continue
-
-                # Validate dimensions
-                if image_frame.width > 0 and image_frame.height > 0:
-                    expected_h, expected_w = rgb_frame.shape[:2]
-                    if expected_w != image_frame.width or expected_h != image_frame.height:
-                        logger.warning(
-                            f"Dimension mismatch: proto says {image_frame.width}x{image_frame.height}, "
-                            f"got {expected_w}x{expected_h}"
-                        )
-
-                # Add frame to segmentation service (async, non-blocking)
-                asyncio.create_task(
-                    segmentation_service.add_frame(
-                        session_id,
-                        rgb_frame,
-                        request.frame_number
-                    )
-                )
+                add_request_frame(session_id, request)
 
             except Exception as e:
                 logger.error(f"Error parsing SegmentationRequest: {e}")
@@ -325,6 +319,263 @@ async def stream_websocket(websocket: WebSocket, session_id: str = None):
         # Note: Don't delete session from service yet - allow reconnection
 
 
+def decode_request_frame(session_id: str, request: ar_stream_pb2.SegmentationRequest):
+    """The RGB frame of a SegmentationRequest; None if it has none we can read"""
+    # Validate
+    if not request.HasField('image_frame'):
+        logger.warning(f"Received request without image_frame from {session_id}")
+        return None
+
+    # Extract RGB frame from ImageFrame
+    image_frame = request.image_frame
+
+    if image_frame.format == ar_stream_pb2.JPEG:
+        # Decode JPEG
+        jpg_data = np.frombuffer(image_frame.data, dtype=np.uint8)
+        rgb_frame = cv2.imdecode(jpg_data, cv2.IMREAD_COLOR)
+        rgb_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_BGR2RGB)
+
+    elif image_frame.format == ar_stream_pb2.RGB_888:
+        # Raw RGB
+        rgb_data = np.frombuffer(image_frame.data, dtype=np.uint8)
+        rgb_frame = rgb_data.reshape(
+            (image_frame.height, image_frame.width, 3)
+        )
+
+    else:
+        logger.warning(f"Unsupported image format: {image_frame.format}")
+        return None
+
+    # Validate dimensions
+    if image_frame.width > 0 and image_frame.height > 0:
+        expected_h, expected_w = rgb_frame.shape[:2]
+        if expected_w != image_frame.width or expected_h != image_frame.height:
+            logger.warning(
+                f"Dimension mismatch: proto says {image_frame.width}x{image_frame.height}, "
+                f"got {expected_w}x{expected_h}"
+            )
+    return rgb_frame
+
+
+def add_request_frame(session_id: str, request: ar_stream_pb2.SegmentationRequest):
+    """Decode a SegmentationRequest and hand its frame to the segmentation service"""
+    note_request(session_id, request)
+    rgb_frame = decode_request_frame(session_id, request)
+    if rgb_frame is None:
+        return
+
+    # Add frame to segmentation service (async, non-blocking)
+    asyncio.create_task(
+        segmentation_service.add_frame(
+            session_id,
+            rgb_frame,
+            request.frame_number
+        )
+    )
+
+
+# Multiplexed WebSocket for all sessions
+
+@app.websocket("/segment/channel")
+async def channel_websocket(websocket: WebSocket):
+    """
+    WebSocket endpoint multiplexing every session of a client
+
+    Both directions carry SegmentationEnvelope (binary protobuf):
+        client sends: frame (SegmentationRequest), control (SegmentationControl)
+        server sends: output (SegmentationOutput), reply (SegmentationControlReply),
+                      credit (SegmentationCredit)
+
+    Frames and outputs are routed by session_id; each control message is
+    answered by a reply with its request_id. A session streamed or started on
+    the channel sends its results here, also after the client reconnects.
+
+    Frames are flow controlled: the server sends credit (SegmentationCredit)
+    messages and the client sends a session's frames only while it holds credit.
+    """
+    await websocket.accept()
+    channel = Channel(websocket)
+    logger.info("Channel connected")
+
+    try:
+        while True:
+            data = await websocket.receive_bytes()
+
+            try:
+                envelope = ar_stream_pb2.SegmentationEnvelope()
+                envelope.ParseFromString(data)
+                payload = envelope.WhichOneof('payload')
+
+                if payload == 'frame':
+                    session_id = envelope.frame.session_id
+                    if session_id not in segmentation_service.sessions:
+                        # Expired or lost in a restart: tell the client to start a new one
+                        await channel.send(control_reply(0, 404, f"Session {session_id} not found",
+                                                         session_id=session_id))
+                        continue
+                    attach_session(session_id, channel)
+                    asyncio.create_task(add_channel_frame(session_id, envelope.frame))
+
+                elif payload == 'control':
+                    # Prompts take a while: never hold up the frames behind them
+                    asyncio.create_task(handle_control(channel, envelope.control))
+
+                else:
+                    logger.warning(f"Unexpected channel message: {payload}")
+
+            except Exception as e:
+                logger.error(f"Error parsing SegmentationEnvelope: {e}")
+                continue
+
+    except WebSocketDisconnect:
+        logger.info("Channel disconnected")
+    except Exception as e:
+        logger.error(f"Channel error: {e}")
+    finally:
+        # Like /segment/stream, keep the sessions themselves for a reconnecting client
+        for session_id in [sid for sid, data in sessions.items() if data.get('channel') is channel]:
+            del sessions[session_id]
+
+
+def attach_session(session_id: str, channel: Channel):
+    """Route a session's results to a channel"""
+    if session_id not in segmentation_service.sessions:
+        return
+    session_data = sessions.get(session_id)
+    if session_data is None or session_data.get('channel') is not channel:
+        session_data = sessions[session_id] = {'ws': None, 'channel': channel}
+        # Credits granted on an earlier channel are gone with it
+        credits = session_credits.setdefault(session_id, SessionCredits(credit_settings))
+        credits.reset()
+    session_data['last_activity'] = time.time()
+
+
+async def add_channel_frame(session_id: str, request: ar_stream_pb2.SegmentationRequest):
+    """Hand a channel frame to the segmentation service and give its credit back"""
+    note_request(session_id, request)
+    credits = session_credits.get(session_id)
+    if credits is not None:
+        credits.on_frame()
+
+    rgb_frame = decode_request_frame(session_id, request)
+    if rgb_frame is not None:
+        await segmentation_service.add_frame(session_id, rgb_frame, request.frame_number)
+
+    session = segmentation_service.sessions.get(session_id)
+    if credits is not None and session is not None and session.is_segmenting:
+        # Returned when the propagation ends, so a busy GPU is not sent a backlog
+        credits.on_queued()
+    else:
+        await grant_credits(session_id)
+
+
+async def grant_credits(session_id: str):
+    """Top up a channel session's frame credits (later, if it tracks nothing and was granted recently)"""
+    credits = session_credits.get(session_id)
+    session_data = sessions.get(session_id)
+    session = segmentation_service.sessions.get(session_id)
+    if credits is None or session is None or session_data is None or session_data.get('channel') is None:
+        return
+
+    tracking = bool(session.tracked_objects or session.latest_masks)
+    now = time.monotonic()
+    wait_s = credits.idle_wait(tracking, now)
+    if wait_s > 0:
+        if credits.timer is None:
+            credits.timer = asyncio.get_running_loop().call_later(wait_s, _grant_credits_later, session_id)
+        return
+
+    granted = credits.grant(tracking, now)
+    if not granted:
+        return
+    envelope = ar_stream_pb2.SegmentationEnvelope()
+    envelope.credit.session_id = session_id
+    envelope.credit.credits = granted
+    envelope.credit.latency_ms = credits.latency_ms or 0.0
+    try:
+        await session_data['channel'].send(envelope)
+    except Exception as e:
+        logger.warning(f"Failed to send credits to {session_id}: {e}")
+
+
+def _grant_credits_later(session_id: str):
+    credits = session_credits.get(session_id)
+    if credits is not None:
+        credits.timer = None
+    asyncio.create_task(grant_credits(session_id))
+
+
+def drop_credits(session_id: str):
+    request_arrivals.pop(session_id, None)
+    credits = session_credits.pop(session_id, None)
+    if credits is not None and credits.timer is not None:
+        credits.timer.cancel()
+
+
+def on_inference_done(session_id: str, seconds):
+    """Adapt a session's credit window to the propagation time and return its queued credits"""
+    credits = session_credits.get(session_id)
+    if credits is None:
+        return
+    credits.on_inference(seconds)
+    asyncio.create_task(grant_credits(session_id))
+
+
+def control_reply(request_id: int, status: int = 200, error: str = '', **fields) -> ar_stream_pb2.SegmentationEnvelope:
+    envelope = ar_stream_pb2.SegmentationEnvelope()
+    reply = envelope.reply
+    reply.request_id = request_id
+    reply.status = status
+    reply.error = error
+    for name, value in fields.items():
+        setattr(reply, name, value)
+    return envelope
+
+
+async def handle_control(channel: Channel, control: ar_stream_pb2.SegmentationControl):
+    """Run a session start, prompt or delete from a channel and send the reply"""
+    Control = ar_stream_pb2.SegmentationControl
+    session_id = None  # A session to grant credits to once replied: new, or tracking since the prompt
+    try:
+        if control.action == Control.START_SESSION:
+            result = await start_session()
+            session_id = result['session_id']
+            attach_session(session_id, channel)
+            reply = control_reply(control.request_id, session_id=session_id)
+
+        elif control.action == Control.PROMPT:
+            attach_session(control.session_id, channel)
+            points = list(control.points)
+            result = await add_prompt(control.session_id, {
+                "text": control.text or None,
+                "points": [points[i:i + 2] for i in range(0, len(points), 2)] or None,
+                "labels": list(control.labels) or None,
+            })
+            reply = control_reply(control.request_id, num_objects=result['num_objects'])
+            session_id = control.session_id
+
+        elif control.action == Control.DELETE_SESSION:
+            await delete_session(control.session_id)
+            reply = control_reply(control.request_id)
+
+        else:
+            reply = control_reply(control.request_id, 400, f"Unknown action: {control.action}")
+
+    except HTTPException as e:
+        reply = control_reply(control.request_id, e.status_code, str(e.detail), session_id=control.session_id)
+    except Exception as e:
+        logger.error(f"Error handling control {control.action}: {e}", exc_info=True)
+        reply = control_reply(control.request_id, 500, str(e))
+
+    try:
+        await channel.send(reply)
+    except Exception as e:
+        logger.warning(f"Failed to send control reply: {e}")
+        return
+    if session_id is not None:
+        await grant_credits(session_id)
+
+
 async def broadcast_segmentation_result(
     session_id: str,
     masks: Dict[str, np.ndarray],
@@ -342,16 +593,26 @@ async def broadcast_segmentation_result(
     """
     if session_id not in sessions:
         return
+    # Called as soon as the inference is done, before the masks are encoded
+    inference_end_ms = int(time.time() * 1000)
 
     try:
-        # Build SegmentationOutput protobuf
-        output = ar_stream_pb2.SegmentationOutput()
+        # Build SegmentationOutput protobuf (in an envelope if the session is on a channel)
+        envelope = ar_stream_pb2.SegmentationEnvelope()
+        output = envelope.output
         output.session_id = session_id
         output.frame_number = frame_number
-        output.timestamp_ms = int(time.time() * 1000)
         output.prompt_type = prompt_type
         output.num_objects = len(masks)
 
+        # Timings of the request the masks belong to
+        arrival = request_arrivals.get(session_id, {}).get(frame_number) if frame_number else None
+        session = segmentation_service.sessions.get(session_id)
+        if arrival is not None and session is not None:
+            output.request_timestamp_ms, output.received_ms = arrival
+            output.inference_start_ms = session.inference_started_ms
+            output.inference_end_ms = inference_end_ms
+
         # Add masks
         for obj_id_str, mask_array in masks.items():
             mask_msg = output.masks.add()
@@ -368,8 +629,14 @@ async def broadcast_segmentation_result(
                 mask_msg.pixel_count = int(np.sum(mask_array > 0.5))
                 mask_msg.confidence = float(np.mean(mask_array))
 
+        output.timestamp_ms = int(time.time() * 1000)
+
         # Send binary protobuf
-        await sessions[session_id]['ws'].send_bytes(output.SerializeToString())
+        session_data = sessions[session_id]
+        if session_data.get('channel') is not None:
+            await session_data['channel'].send(envelope)
+        else:
+            await session_data['ws'].send_bytes(output.SerializeToString())
 
     except Exception as e:
         logger.warning(f"Failed to broadcast result to {session_id}: {e}")
@@ -386,6 +653,7 @@ segmentation_service.set_result_callback(
         )
     )
 )
+segmentation_service.set_inference_callback(on_inference_done)
 
 
 if __name__ == "__main__":
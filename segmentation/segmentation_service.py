@@ -17,6 +17,7 @@ from collections import deque
 import base64
 import tempfile
 import shutil
+import time
 import yaml
 from pathlib import Path
 
@@ -50,6 +51,7 @@ class StreamingSession:
         self.segmentation_interval = CONFIG['streaming']['segmentation_interval']
         self.latest_masks = {}  # obj_id -> mask (stores latest segmentation result)
         self.is_segmenting = False  # Lock to prevent overlapping tasks
+        self.inference_started_ms = 0  # Wall clock (ms) when the running / last propagation started
         self.auto_segmentation_initialized = False  # Track if auto-segmentation has been triggered
 
     async def add_frame(self, rgb_frame: np.ndarray, frame_number: int):
@@ -125,11 +127,16 @@ class SegmentationService:
             os.environ['PYTORCH_CUDA_ALLOC_CONF'] = CONFIG['memory']['pytorch_cuda_alloc_conf']
 
         self.on_segmentation_result = None  # Callback for broadcast
+        self.on_inference_done = None  # Callback after each propagation: (client_id, seconds or None)
 
     def set_result_callback(self, callback):
         """Set callback function for segmentation results"""
         self.on_segmentation_result = callback
 
+    def set_inference_callback(self, callback):
+        """Set callback function called when a propagation ends (seconds is None if it did not run)"""
+        self.on_inference_done = callback
+
     async def initialize(self):
         """Load segmentation model based on configuration"""
         global video_predictor
@@ -551,13 +558,16 @@ class SegmentationService:
         session = self.sessions[client_id]
         
         # Lock is already set in add_frame, but we manage the release here
-        
+        started = None
+
         try:
             # Determine if we have tracking info
             if not session.latest_masks and not session.tracked_objects:
                 print(f"  [DEBUG] propagate_segmentation: No masks or tracked objects. Aborting.")
                 return  # Nothing to track
 
+            started = time.perf_counter()
+            session.inference_started_ms = int(time.time() * 1000)
             # Create temporary directory with buffered frames
             temp_dir = session.create_temp_video_dir()
             print(f"  [DEBUG] propagate_segmentation: Created temp dir {temp_dir} with {len(session.frame_buffer)} frames")
@@ -576,6 +586,8 @@ class SegmentationService:
         finally:
             # Release lock
             session.is_segmenting = False
+            if self.on_inference_done:
+                self.on_inference_done(client_id, None if started is None else time.perf_counter() - started)
 
     async def _propagate_sam2(self, session, temp_dir):
         """SAM2 mask propagation"""
@@ -677,7 +689,8 @@ class SegmentationService:
                  await self.on_segmentation_result(
                      client_id=session.client_id,
                      masks=session.latest_masks,
-                     prompt="auto_propagation"
+                     prompt="auto_propagation",
+                     frame_num=session.last_segmentation_frame
                  )
 
 
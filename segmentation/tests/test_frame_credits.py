@@ -0,0 +1,83 @@
+"""
+Unit tests for frame credits (no segmentation server needed)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from frame_credits import CREDIT_DEFAULTS, SessionCredits, load_credit_settings
+
+
+def make_credits(**overrides) -> SessionCredits:
+    return SessionCredits({**CREDIT_DEFAULTS, **overrides})
+
+
+def test_load_credit_settings_merges_section():
+    settings = load_credit_settings({'flow_control': {'max_window': 4}})
+    assert settings['max_window'] == 4
+    assert settings['initial_window'] == CREDIT_DEFAULTS['initial_window']
+    assert load_credit_settings({}) == CREDIT_DEFAULTS
+
+
+def test_grant_fills_the_window_once():
+    credits = make_credits(initial_window=3)
+    assert credits.grant(tracking=True, now=0.0) == 3
+    assert credits.outstanding == 3
+    assert credits.grant(tracking=True, now=0.0) == 0
+
+
+def test_frames_and_propagations_give_credits_back():
+    credits = make_credits(initial_window=2)
+    credits.grant(tracking=True, now=0.0)
+    credits.on_frame()
+    assert credits.grant(tracking=True, now=0.0) == 1
+
+    # A frame received during a propagation holds its credit until the propagation ends
+    credits.on_frame()
+    credits.on_queued()
+    assert credits.grant(tracking=True, now=0.0) == 0
+    credits.on_inference(None)
+    assert credits.grant(tracking=True, now=0.0) == 1
+
+
+def test_window_grows_additively_while_fast():
+    credits = make_credits(initial_window=2, max_window=4, target_latency_ms=500)
+    for expected in (3, 4, 4):
+        credits.on_inference(0.1)
+        assert credits.window == expected
+
+
+def test_window_halves_when_slow():
+    credits = make_credits(initial_window=8, max_window=8, target_latency_ms=500, latency_smoothing=1.0)
+    for expected in (4, 2, 1, 1):
+        credits.on_inference(0.9)
+        assert credits.window == expected
+
+
+def test_latency_is_smoothed():
+    credits = make_credits(latency_smoothing=0.5, target_latency_ms=500)
+    credits.on_inference(0.2)
+    assert credits.latency_ms == 200
+    credits.on_inference(1.0)
+    assert credits.latency_ms == 600
+    assert credits.to_dict()['latency_ms'] == 600.0
+
+
+def test_idle_session_gets_one_credit_per_interval():
+    credits = make_credits(initial_window=4, idle_interval_s=1.0)
+    assert credits.grant(tracking=False, now=10.0) == 1
+    credits.on_frame()
+    assert abs(credits.idle_wait(tracking=False, now=10.4) - 0.6) < 1e-9
+    assert credits.grant(tracking=False, now=10.4) == 0
+    assert credits.grant(tracking=False, now=11.0) == 1
+    assert credits.idle_wait(tracking=True, now=11.0) == 0.0
+
+
+def test_reset_forgets_credits_in_flight():
+    credits = make_credits(initial_window=2)
+    credits.grant(tracking=True, now=0.0)
+    credits.on_queued()
+    credits.reset()
+    assert (credits.outstanding, credits.queued) == (0, 0)
+    assert credits.grant(tracking=True, now=0.0) == 2
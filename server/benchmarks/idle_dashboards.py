@@ -0,0 +1,63 @@
+"""
+Event-loop wakeups caused by idle dashboards.
+Starts the server in-process, connects N dashboards that subscribe to a phone
+that is not there, and counts event-loop iterations (BaseEventLoop._run_once)
+over a few seconds. Uvicorn's own timers account for a constant rate; an idle
+dashboard should add nothing on top of it.
+
+Usage (from server/):
+    python benchmarks/idle_dashboards.py [N ...]    # default: 0 10 50
+"""
+
+import json
+import sys
+import threading
+import time
+from asyncio import base_events
+from pathlib import Path
+
+import uvicorn
+from websockets.sync.client import connect
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = 8777
+MEASURE_S = 5.0
+
+iterations = 0
+_run_once = base_events.BaseEventLoop._run_once
+
+
+def _counting_run_once(self):
+    global iterations
+    iterations += 1
+    return _run_once(self)
+
+
+def main():
+    base_events.BaseEventLoop._run_once = _counting_run_once
+    import main as server_main
+
+    server = uvicorn.Server(uvicorn.Config(server_main.app, host='127.0.0.1', port=PORT,
+                                           log_level='warning', loop='asyncio', ws_ping_interval=None))
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(1.5)
+
+    for n in [int(arg) for arg in sys.argv[1:]] or [0, 10, 50]:
+        dashboards = [connect(f'ws://127.0.0.1:{PORT}/ws/dashboard') for _ in range(n)]
+        for dashboard in dashboards:
+            dashboard.send(json.dumps({'action': 'subscribe', 'client_ids': ['nobody']}))
+        time.sleep(1.0)
+        start = iterations
+        time.sleep(MEASURE_S)
+        print(f"{n:3d} idle dashboards: {(iterations - start) / MEASURE_S:7.1f} loop iterations/s")
+        for dashboard in dashboards:
+            dashboard.close()
+        time.sleep(0.5)
+
+    server.should_exit = True
+    time.sleep(0.5)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
+from .frame_record import FrameRecord, MotionSamples
 from .frame_buffer import FrameBuffer
 from .client_manager import ClientManager
 
-__all__ = ['FrameBuffer', 'ClientManager']
+__all__ = ['FrameRecord', 'MotionSamples', 'FrameBuffer', 'ClientManager']
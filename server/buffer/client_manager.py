@@ -24,6 +24,7 @@ class ClientManager:
                 'connection_info': connection_info,  # IP:port for logging
                 'seg_requests_sent': 0,  # Counter for segmentation requests sent
                 'seg_outputs_received': 0,  # Counter for segmentation outputs received
+                'stage_timings': {},  # stage -> {'count', 'total_s', 'recent_s'}
             }
 
     def remove_client(self, client_id: str):
@@ -77,3 +78,32 @@ class ClientManager:
                     'seg_outputs_received': self.clients[client_id]['seg_outputs_received']
                 }
             return {'seg_requests_sent': 0, 'seg_outputs_received': 0}
+
+    def record_stage_time(self, client_id: str, stage: str, seconds: float):
+        """Record how long a pipeline stage took for one frame"""
+        with self.lock:
+            if client_id not in self.clients:
+                return
+            timings = self.clients[client_id]['stage_timings']
+            entry = timings.get(stage)
+            if entry is None:
+                timings[stage] = {'count': 1, 'total_s': seconds, 'recent_s': seconds}
+            else:
+                entry['count'] += 1
+                entry['total_s'] += seconds
+                # Exponential moving average so recent load changes show up quickly
+                entry['recent_s'] += (seconds - entry['recent_s']) * 0.1
+
+    def get_stage_timings(self, client_id: str) -> dict:
+        """Get per-stage timings for a client in milliseconds"""
+        with self.lock:
+            if client_id not in self.clients:
+                return {}
+            return {
+                stage: {
+                    'count': entry['count'],
+                    'avg_ms': round(entry['total_s'] / entry['count'] * 1000, 2),
+                    'recent_ms': round(entry['recent_s'] * 1000, 2),
+                }
+                for stage, entry in self.clients[client_id]['stage_timings'].items()
+            }
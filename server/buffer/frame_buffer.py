@@ -1,19 +1,31 @@
 from collections import deque
 from threading import Lock
+from typing import Iterable, Optional
 import time
 import logging
+import numpy as np
+from .frame_record import FrameRecord, MotionSamples, MOTION_SIZE
 
 logger = logging.getLogger(__name__)
 
 class FrameBuffer:
     """Thread-safe circular buffer for incoming frames"""
 
-    def __init__(self, max_size: int = 60, client_id: str = "default"):
+    def __init__(self, max_size: int = 60, client_id: str = "default", motion_capacity: int = 2000):
         self.max_size = max_size
         self.client_id = client_id
         self.buffer = deque(maxlen=max_size)
         self.lock = Lock()
 
+        # Ring buffer for high-rate motion samples (~10 s at 200 Hz)
+        self.motion_capacity = motion_capacity
+        self._motion_ts = np.zeros(motion_capacity, dtype=np.int64)
+        self._motion_values = np.zeros((motion_capacity, MOTION_SIZE), dtype=np.float32)
+        self._motion_masks = np.zeros(motion_capacity, dtype=np.uint8)
+        self._motion_end = 0     # Next write position
+        self._motion_count = 0
+        self.motion_samples_received = 0
+
         # Metadata
         self.frames_received = 0
         self.frames_processed = 0
@@ -21,17 +33,68 @@ class FrameBuffer:
         self.frames_without_depth = 0
         self.start_time = time.time()
 
-    def add_frame(self, frame_data: dict):
+    def add_frame(self, frame_data: FrameRecord):
         """Add frame to buffer (FIFO, drops oldest if full)"""
+        self.add_frames((frame_data,))
+
+    def add_frames(self, frames: Iterable[FrameRecord]):
+        """Add several frames in order under a single lock acquisition"""
+        with self.lock:
+            for frame_data in frames:
+                # Only the newest frame keeps its decoded arrays; older frames
+                # fall back to their compressed payloads and re-decode on demand
+                if self.buffer:
+                    self.buffer[-1].release()
+                self.buffer.append(frame_data)
+                self.frames_received += 1
+
+                # Track depth availability (does not decode the depth payload)
+                if frame_data.has_depth:
+                    self.frames_with_depth += 1
+                else:
+                    self.frames_without_depth += 1
+
+    def add_motion_samples(self, samples: MotionSamples):
+        """Append a run of motion samples to the ring buffer (drops oldest if full)"""
+        count = len(samples)
+        if count == 0:
+            return
+        timestamps, values = samples.timestamps_ns, samples.values
+        if count > self.motion_capacity:
+            timestamps, values = timestamps[-self.motion_capacity:], values[-self.motion_capacity:]
         with self.lock:
-            self.buffer.append(frame_data)
-            self.frames_received += 1
-            
-            # Track depth availability
-            if 'depth_map' in frame_data and frame_data['depth_map'] is not None:
-                self.frames_with_depth += 1
-            else:
-                self.frames_without_depth += 1
+            n = len(timestamps)
+            # Two slice copies at most: up to the end of the ring, then the wrap
+            first = min(n, self.motion_capacity - self._motion_end)
+            end = self._motion_end
+            self._motion_ts[end:end + first] = timestamps[:first]
+            self._motion_values[end:end + first] = values[:first]
+            self._motion_masks[end:end + first] = samples.mask
+            rest = n - first
+            if rest:
+                self._motion_ts[:rest] = timestamps[first:]
+                self._motion_values[:rest] = values[first:]
+                self._motion_masks[:rest] = samples.mask
+            self._motion_end = (end + n) % self.motion_capacity
+            self._motion_count = min(self.motion_capacity, self._motion_count + n)
+            self.motion_samples_received += count
+
+    def get_motion_samples(self, since_ns: Optional[int] = None):
+        """
+        Get buffered motion samples in time order.
+
+        Returns:
+            (timestamps_ns (N,), values (N, MOTION_SIZE), masks (N,)) copies
+        """
+        with self.lock:
+            order = (np.arange(self._motion_count) + self._motion_end - self._motion_count) % self.motion_capacity
+            timestamps = self._motion_ts[order]
+            values = self._motion_values[order]
+            masks = self._motion_masks[order]
+        if since_ns is not None:
+            start = int(np.searchsorted(timestamps, since_ns, side='right'))
+            timestamps, values, masks = timestamps[start:], values[start:], masks[start:]
+        return timestamps, values, masks
 
     def get_latest_frame(self):
         """Get most recent frame"""
@@ -47,7 +110,7 @@ class FrameBuffer:
         """Get specific frame by sequence number"""
         with self.lock:
             for frame in reversed(self.buffer):
-                if frame.get('frame_number') == frame_num:
+                if frame.frame_number == frame_num:
                     return frame
             return None
 
@@ -61,11 +124,16 @@ class FrameBuffer:
         total_frames = self.frames_with_depth + self.frames_without_depth
         depth_percentage = (self.frames_with_depth / total_frames * 100) if total_frames > 0 else 0
         
+        with self.lock:
+            buffer_bytes = sum(frame.nbytes for frame in self.buffer)
+
         return {
             'client_id': self.client_id,
             'buffer_size': len(self.buffer),
+            'buffer_bytes': buffer_bytes,
             'max_size': self.max_size,
             'frames_received': self.frames_received,
+            'motion_samples_received': self.motion_samples_received,
             'frames_processed': self.frames_processed,
             'frames_with_depth': self.frames_with_depth,
             'frames_without_depth': self.frames_without_depth,
@@ -0,0 +1,361 @@
+"""
+Compact per-frame record.
+Holds the metadata of one ARFrame in typed slots and keeps the compressed image
+bytes received from the phone, decoding them on first access.
+"""
+
+import io
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Add proto directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from proto import ar_stream_pb2
+
+logger = logging.getLogger(__name__)
+
+
+# Motion vectors packed into one float32 array: (name, offset, size)
+MOTION_LAYOUT = (
+    ('linear_acceleration', 0, 3),
+    ('linear_velocity_pose', 3, 3),
+    ('linear_velocity_accel', 6, 3),
+    ('angular_velocity', 9, 3),
+    ('gravity', 12, 3),
+    ('orientation', 15, 4),
+)
+MOTION_SIZE = 19
+_AXES = ('x', 'y', 'z', 'w')
+
+# Bits for the lazily decoded payloads
+_DECODE_BITS = {'rgb_image': 1, 'depth_map': 2, 'depth_confidence': 4, 'luma': 8, 'depth_meters': 16}
+
+# Guards the memoized arrays and their bits: a decode thread may publish a
+# payload while the event loop releases the frame. Shared by all frames (a
+# per-frame lock would not survive pickling to a decode process) and only
+# held to read or swap references, never while decoding.
+_memo_lock = threading.Lock()
+
+# Bytes per pixel of the raw ImageFrame formats
+_RAW_CHANNELS = {ar_stream_pb2.RGB_888: 3, ar_stream_pb2.RGBA_8888: 4, ar_stream_pb2.GRAYSCALE: 1}
+
+
+def _raw_view(data: bytes, image_format: int, width: int, height: int) -> np.ndarray:
+    """Zero-copy (read-only) array over a raw ImageFrame payload"""
+    if image_format == ar_stream_pb2.YUV_420:
+        # Planar I420: full-resolution Y, then quarter-resolution U and V
+        shape = (height * 3 // 2, width)
+    else:
+        channels = _RAW_CHANNELS[image_format]
+        shape = (height, width) if channels == 1 else (height, width, channels)
+    expected = int(np.prod(shape))
+    if len(data) < expected:
+        raise ValueError(f"Image payload too short: {len(data)} bytes for {width}x{height} format {image_format}")
+    return np.frombuffer(data, dtype=np.uint8, count=expected).reshape(shape)
+
+
+def decode_rgb(data: bytes, image_format: int, width: int, height: int) -> np.ndarray:
+    """
+    Decode an ImageFrame payload into an (H, W, 3) uint8 array.
+
+    RGB_888 and RGBA_8888 come back as read-only views over the payload;
+    YUV_420 and GRAYSCALE are converted.
+    """
+    if image_format == ar_stream_pb2.JPEG:
+        return np.array(Image.open(io.BytesIO(data)))
+    if image_format in (ar_stream_pb2.RGB_888, ar_stream_pb2.RGBA_8888):
+        return _raw_view(data, image_format, width, height)[..., :3]
+    if image_format == ar_stream_pb2.YUV_420:
+        return cv2.cvtColor(_raw_view(data, image_format, width, height), cv2.COLOR_YUV2RGB_I420)
+    if image_format == ar_stream_pb2.GRAYSCALE:
+        return cv2.cvtColor(_raw_view(data, image_format, width, height), cv2.COLOR_GRAY2RGB)
+    raise ValueError(f"Unknown RGB format: {image_format}")
+
+
+def decode_luma(data: bytes, image_format: int, width: int, height: int) -> np.ndarray:
+    """
+    Decode the luma / grayscale plane of an ImageFrame payload as (H, W) uint8.
+
+    For YUV_420 and GRAYSCALE this is a read-only view over the payload.
+    """
+    if image_format == ar_stream_pb2.YUV_420:
+        return _raw_view(data, image_format, width, height)[:height]
+    if image_format == ar_stream_pb2.GRAYSCALE:
+        return _raw_view(data, image_format, width, height)
+    if image_format == ar_stream_pb2.JPEG:
+        return np.array(Image.open(io.BytesIO(data)).convert('L'))
+    if image_format in (ar_stream_pb2.RGB_888, ar_stream_pb2.RGBA_8888):
+        code = cv2.COLOR_RGB2GRAY if image_format == ar_stream_pb2.RGB_888 else cv2.COLOR_RGBA2GRAY
+        return cv2.cvtColor(_raw_view(data, image_format, width, height), code)
+    raise ValueError(f"Unknown RGB format: {image_format}")
+
+
+def decode_depth(data: bytes, width: int, height: int, depth_format: int) -> np.ndarray:
+    """
+    Read-only zero-copy (H, W) view over a DepthFrame payload.
+
+    FLOAT32_METERS gives float32 metres; anything else is uint16 millimetres.
+    """
+    dtype = np.float32 if depth_format == ar_stream_pb2.FLOAT32_METERS else np.uint16
+    count = width * height
+    if len(data) < count * np.dtype(dtype).itemsize:
+        raise ValueError(f"Depth payload too short: {len(data)} bytes for {width}x{height} {np.dtype(dtype).name}")
+    return np.frombuffer(data, dtype=dtype, count=count).reshape(height, width)
+
+
+class FrameRecord:
+    """
+    One received AR frame.
+
+    Camera matrices are small float32 arrays and motion vectors live in a single
+    float32 array (see MOTION_LAYOUT) with a bitmask of the fields the phone sent.
+    RGB, depth and confidence stay as the bytes received from the phone until
+    rgb_image / luma / depth_map / depth_meters / depth_confidence is first
+    read; decoded arrays are memoized.
+    """
+
+    __slots__ = (
+        'client_id', 'device_id', 'timestamp_ns', 'frame_number',
+        'image_width', 'image_height', 'tracking_state',
+        'intrinsic_matrix', 'projection_matrix', 'view_matrix', 'pose_matrix',
+        'depth_range', 'motion', 'motion_mask',
+        '_rgb', '_rgb_quality', '_depth', '_decoded', '_rgb_image', '_luma',
+        '_depth_map', '_depth_meters', '_depth_confidence',
+    )
+
+    def __init__(self, client_id: str, device_id: str = '', timestamp_ns: int = 0, frame_number: int = 0):
+        self.client_id = client_id
+        self.device_id = device_id
+        self.timestamp_ns = timestamp_ns
+        self.frame_number = frame_number
+
+        # Camera (tracking_state is None when the frame had no camera data)
+        self.image_width = 0
+        self.image_height = 0
+        self.tracking_state: Optional[int] = None
+        self.intrinsic_matrix: Optional[np.ndarray] = None   # (3, 3)
+        self.projection_matrix: Optional[np.ndarray] = None  # (4, 4)
+        self.view_matrix: Optional[np.ndarray] = None        # (4, 4)
+        self.pose_matrix: Optional[np.ndarray] = None        # (4, 4)
+
+        self.depth_range: Optional[Tuple[float, float]] = None
+        self.motion: Optional[np.ndarray] = None  # (MOTION_SIZE,) float32
+        self.motion_mask = 0                      # bit i set -> MOTION_LAYOUT[i] present
+
+        self._rgb: Optional[tuple] = None    # (data, format, width, height)
+        self._rgb_quality = 0                # JPEG quality the phone used (0: unknown)
+        self._depth: Optional[tuple] = None  # (data, width, height, confidence, format)
+        self._decoded = 0                    # bitmask of memoized payloads
+        self._rgb_image: Optional[np.ndarray] = None
+        self._luma: Optional[np.ndarray] = None
+        self._depth_map: Optional[np.ndarray] = None
+        self._depth_meters: Optional[np.ndarray] = None
+        self._depth_confidence: Optional[np.ndarray] = None
+
+    # --- payloads ---
+
+    def set_rgb_payload(self, data: bytes, image_format: int, width: int, height: int, quality: int = 0):
+        self._rgb = (data, image_format, width, height)
+        self._rgb_quality = quality
+
+    @property
+    def rgb_jpeg(self) -> Optional[Tuple[bytes, int, int, int]]:
+        """(data, width, height, quality) of the phone's JPEG, if RGB arrived as JPEG; 0 means unknown"""
+        if self._rgb is None or self._rgb[1] != ar_stream_pb2.JPEG:
+            return None
+        data, _, width, height = self._rgb
+        return data, width, height, self._rgb_quality
+
+    def set_depth_payload(self, data: bytes, width: int, height: int, confidence: bytes = b'',
+                          depth_format: int = ar_stream_pb2.UINT16_MILLIMETERS):
+        self._depth = (data, width, height, confidence, depth_format)
+
+    @property
+    def depth_format(self) -> Optional[int]:
+        return self._depth[4] if self._depth is not None else None
+
+    @property
+    def has_rgb(self) -> bool:
+        return self._rgb is not None
+
+    @property
+    def has_depth(self) -> bool:
+        return self._depth is not None
+
+    @property
+    def has_camera(self) -> bool:
+        return self.tracking_state is not None
+
+    def has_payload(self, key: str) -> bool:
+        """Check whether the phone sent the payload behind a lazy key"""
+        if key in ('rgb_image', 'luma'):
+            return self._rgb is not None
+        if key in ('depth_map', 'depth_meters'):
+            return self._depth is not None
+        return self._depth is not None and bool(self._depth[3])
+
+    def _decode(self, key: str) -> Optional[np.ndarray]:
+        bit = _DECODE_BITS[key]
+        with _memo_lock:
+            if self._decoded & bit:
+                return getattr(self, '_' + key)
+        value = None
+        if self.has_payload(key):
+            try:
+                if key == 'rgb_image':
+                    value = decode_rgb(*self._rgb)
+                elif key == 'luma':
+                    value = decode_luma(*self._rgb)
+                elif key == 'depth_map':
+                    data, width, height, _, depth_format = self._depth
+                    value = decode_depth(data, width, height, depth_format)
+                elif key == 'depth_meters':
+                    value = self.depth_map
+                    if value is not None and value.dtype != np.float32:
+                        value = value.astype(np.float32)
+                        value *= 0.001
+                        value.flags.writeable = False
+                else:
+                    _, width, height, confidence, _ = self._depth
+                    value = np.frombuffer(confidence, dtype=np.uint8).reshape(height, width)
+            except Exception as e:
+                logger.error(f"Failed to decode {key} for frame {self.frame_number}: {e}")
+        with _memo_lock:
+            setattr(self, '_' + key, value)
+            self._decoded |= bit
+        return value
+
+    @property
+    def rgb_image(self) -> Optional[np.ndarray]:
+        """(H, W, 3) uint8 RGB image, or None if absent or undecodable"""
+        return self._decode('rgb_image')
+
+    @property
+    def luma(self) -> Optional[np.ndarray]:
+        """(H, W) uint8 luma plane, for consumers that only need grayscale"""
+        return self._decode('luma')
+
+    @property
+    def depth_map(self) -> Optional[np.ndarray]:
+        """
+        (H, W) depth as sent by the phone (uint16 millimetres, or float32 metres
+        for FLOAT32_METERS), as a read-only view over the payload; or None
+        """
+        return self._decode('depth_map')
+
+    @property
+    def depth_meters(self) -> Optional[np.ndarray]:
+        """
+        (H, W) read-only float32 depth in metres, or None.
+
+        Converted at most once per frame (and not at all for FLOAT32_METERS);
+        metric consumers should share this view rather than rescale depth_map.
+        """
+        return self._decode('depth_meters')
+
+    @property
+    def depth_confidence(self) -> Optional[np.ndarray]:
+        """(H, W) uint8 depth confidence, or None"""
+        return self._decode('depth_confidence')
+
+    # --- decoding control ---
+
+    def is_decoded(self, key: str) -> bool:
+        """Check whether a payload has already been materialized"""
+        return bool(self._decoded & _DECODE_BITS[key])
+
+    def materialize(self, keys: Iterable[str]) -> dict:
+        """Decode the given payloads now and return the decoded values"""
+        return {key: self._decode(key) for key in keys if self.has_payload(key)}
+
+    def store(self, decoded: dict):
+        """Store payloads decoded elsewhere (e.g. in a decode worker process)"""
+        with _memo_lock:
+            for key, value in decoded.items():
+                setattr(self, '_' + key, value)
+                self._decoded |= _DECODE_BITS[key]
+
+    def release(self):
+        """
+        Drop memoized arrays so the frame falls back to its wire size.
+
+        A decode still running publishes its result afterwards; the frame then
+        keeps that array, which is only memory, never a missing payload.
+        """
+        with _memo_lock:
+            self._decoded = 0
+            self._rgb_image = self._luma = None
+            self._depth_map = self._depth_meters = self._depth_confidence = None
+
+    @property
+    def wire_size(self) -> int:
+        """Size of the compressed payloads kept for this frame"""
+        size = 0
+        if self._rgb is not None:
+            size += len(self._rgb[0])
+        if self._depth is not None:
+            size += len(self._depth[0]) + len(self._depth[3])
+        return size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by this frame: payload bytes plus arrays that own their data"""
+        arrays = (self._rgb_image, self._luma, self._depth_map, self._depth_meters, self._depth_confidence)
+        decoded = sum(value.nbytes for value in arrays if value is not None and value.flags.owndata)
+        return self.wire_size + decoded
+
+    # --- motion ---
+
+    def motion_dict(self) -> dict:
+        """Motion as {'field': {'x': .., 'y': .., 'z': ..}} for JSON consumers"""
+        if self.motion is None:
+            return {}
+        values = self.motion.tolist()
+        return {
+            field: dict(zip(_AXES, values[offset:offset + size]))
+            for index, (field, offset, size) in enumerate(MOTION_LAYOUT)
+            if self.motion_mask & (1 << index)
+        }
+
+
+class MotionSamples:
+    """
+    A run of high-rate motion samples from an ARFrameBatch.
+
+    values has one MOTION_LAYOUT row per sample; mask says which fields the
+    phone sent (the same for every sample of a batch).
+    """
+
+    __slots__ = ('timestamps_ns', 'values', 'mask')
+
+    def __init__(self, timestamps_ns: np.ndarray, values: np.ndarray, mask: int):
+        self.timestamps_ns = timestamps_ns  # (N,) int64
+        self.values = values                # (N, MOTION_SIZE) float32
+        self.mask = mask
+
+    def __len__(self) -> int:
+        return len(self.timestamps_ns)
+
+    def latest_before(self, timestamp_ns: int) -> Optional[int]:
+        """Index of the last sample at or before timestamp_ns, or None"""
+        index = int(np.searchsorted(self.timestamps_ns, timestamp_ns, side='right')) - 1
+        return index if index >= 0 else None
+
+
+def materialize_frame(frame: FrameRecord, keys: Tuple[str, ...]) -> Tuple[dict, float]:
+    """
+    Decode payloads of a frame, returning (decoded values, seconds spent).
+
+    Module-level so it can run in a decode worker process.
+    """
+    start = time.perf_counter()
+    decoded = frame.materialize(keys)
+    return decoded, time.perf_counter() - start
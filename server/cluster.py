@@ -0,0 +1,244 @@
+"""
+Multi-worker mode.
+With cluster.workers > 1 the server runs several uvicorn worker processes. Each
+phone connection stays in the worker that accepted it; workers exchange
+dashboard traffic, per-client stats and commands through a small hub on a local
+unix socket, so every worker's dashboards and REST API see every client.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Wire format: header length, payload length, flags; then JSON header and raw payload
+_PREFIX = struct.Struct('!IIB')
+_DROPPABLE = 1
+
+# Droppable messages (e.g. frame updates) are skipped for a peer whose socket
+# buffer is above this size instead of queueing without bound; other messages
+# are dropped (and logged) only past twice that
+MAX_BUFFERED_BYTES = 16 * 1024 * 1024
+
+
+def backed_up(writer: asyncio.StreamWriter, droppable: bool) -> bool:
+    """Whether a message should be dropped rather than queued on a connection"""
+    limit = MAX_BUFFERED_BYTES if droppable else 2 * MAX_BUFFERED_BYTES
+    return writer.transport.get_write_buffer_size() > limit
+
+ENV_SOCKET = 'CAMALYTICS_CLUSTER_SOCKET'
+
+
+def encode_message(header: dict, payload: bytes = b'', droppable: bool = False) -> bytes:
+    head = json.dumps(header).encode('utf-8')
+    return _PREFIX.pack(len(head), len(payload), _DROPPABLE if droppable else 0) + head + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[bytes, int, dict, bytes]:
+    """
+    Read one message.
+
+    Returns:
+        (raw bytes, flags, header, payload); raises IncompleteReadError at EOF
+    """
+    prefix = await reader.readexactly(_PREFIX.size)
+    head_len, payload_len, flags = _PREFIX.unpack(prefix)
+    body = await reader.readexactly(head_len + payload_len)
+    return prefix + body, flags, json.loads(body[:head_len]), body[head_len:]
+
+
+# ============================================================
+#  Hub (runs in the uvicorn supervisor process)
+# ============================================================
+
+async def _serve_hub(socket_path: str):
+    peers = set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peers.add(writer)
+        try:
+            while True:
+                raw, flags, header, _ = await read_message(reader)
+                for peer in list(peers):
+                    if peer is writer:
+                        continue
+                    if backed_up(peer, bool(flags & _DROPPABLE)):
+                        if not flags & _DROPPABLE:
+                            logger.warning(f"Cluster peer backed up, dropping '{header.get('kind')}' message")
+                        continue
+                    peer.write(raw)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            peers.discard(writer)
+            writer.close()
+
+    Path(socket_path).unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(handle, path=socket_path)
+    logger.info(f"Cluster hub listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+def start_hub(socket_path: str, timeout_s: float = 5.0) -> threading.Thread:
+    """Run the relay hub on a daemon thread and wait until it accepts connections"""
+    Path(socket_path).unlink(missing_ok=True)
+    thread = threading.Thread(target=asyncio.run, args=(_serve_hub(socket_path),),
+                              name='cluster-hub', daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout_s
+    while not Path(socket_path).exists():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Cluster hub did not start on {socket_path}")
+        time.sleep(0.05)
+    return thread
+
+
+# ============================================================
+#  Worker side
+# ============================================================
+
+class Cluster:
+    """A worker process's connection to the cluster hub (inactive with one worker)"""
+
+    def __init__(self, workers: int = 1, socket_path: str = '/tmp/camalytics-cluster.sock',
+                 stats_interval_s: float = 1.0, peer_timeout_s: float = 3.0):
+        self.workers = max(1, workers)
+        self.socket_path = socket_path
+        self.stats_interval_s = stats_interval_s
+        self.peer_timeout_s = peer_timeout_s
+        self.worker_id = os.getpid()
+        self.peers: Dict[int, dict] = {}  # worker_id -> {'at', 'clients', 'dashboards', 'subscriptions'}
+        self.dropped = 0
+        self._handlers: Dict[str, Callable[[dict, bytes], Awaitable[None]]] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._listen_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'Cluster':
+        """Create from the `cluster` section of config.yaml"""
+        cluster_config = config.get('cluster', {})
+        return cls(
+            workers=cluster_config.get('workers', 1),
+            socket_path=cluster_config.get('socket_path', '/tmp/camalytics-cluster.sock'),
+            stats_interval_s=cluster_config.get('stats_interval_s', 1.0),
+            peer_timeout_s=cluster_config.get('peer_timeout_s', 3.0),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._writer is not None
+
+    def on(self, kind: str, handler: Callable[[dict, bytes], Awaitable[None]]):
+        """Register a coroutine handler(header, payload) for messages of one kind"""
+        self._handlers[kind] = handler
+
+    async def connect(self):
+        """Join the hub if this process was started as a cluster worker"""
+        socket_path = os.environ.get(ENV_SOCKET)
+        if not socket_path:
+            return
+        self.worker_id = os.getpid()
+        self._reader, self._writer = await asyncio.open_unix_connection(socket_path)
+        self._listen_task = asyncio.create_task(self._listen())
+        logger.info(f"Worker {self.worker_id} joined cluster hub at {socket_path}")
+
+    async def close(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def publish(self, kind: str, header: Optional[dict] = None, payload: bytes = b'',
+                droppable: bool = False, to: Optional[int] = None):
+        """
+        Send a message to the other workers (or only to worker `to`).
+
+        Droppable messages are skipped while the hub connection is backed up;
+        others only once it is backed up far enough to grow without bound.
+        """
+        if self._writer is None:
+            return
+        if backed_up(self._writer, droppable):
+            self.dropped += 1
+            if not droppable:
+                logger.warning(f"Cluster hub connection backed up, dropping '{kind}' message")
+            return
+        message = {**(header or {}), 'kind': kind, 'from': self.worker_id}
+        if to is not None:
+            message['to'] = to
+        self._writer.write(encode_message(message, payload, droppable))
+
+    async def _listen(self):
+        try:
+            while True:
+                _, _, header, payload = await read_message(self._reader)
+                if header.get('to', self.worker_id) != self.worker_id:
+                    continue
+                kind = header['kind']
+                if kind == 'stats':
+                    self.peers[header['from']] = {
+                        'at': time.monotonic(),
+                        'clients': header.get('clients', []),
+                        'dashboards': header.get('dashboards', 0),
+                        'subscriptions': header.get('subscriptions', {}),
+                    }
+                    continue
+                handler = self._handlers.get(kind)
+                if handler is None:
+                    continue
+                try:
+                    await handler(header, payload)
+                except Exception as e:
+                    logger.error(f"Cluster handler for '{kind}' failed: {e}", exc_info=True)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError) as e:
+            logger.error(f"Lost connection to cluster hub: {type(e).__name__}: {e}")
+        finally:
+            # Without a listener the worker would keep publishing to a hub it no longer hears
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # --- views over the other workers ---
+
+    def _live_peers(self) -> List[Tuple[int, dict]]:
+        cutoff = time.monotonic() - self.peer_timeout_s
+        return [(worker_id, peer) for worker_id, peer in self.peers.items() if peer['at'] >= cutoff]
+
+    def remote_clients(self) -> list:
+        """Client rows (as in /api/clients) published by the other workers"""
+        return [client for _, peer in self._live_peers() for client in peer['clients']]
+
+    def remote_dashboards(self) -> int:
+        """Number of dashboards connected to the other workers"""
+        return sum(peer['dashboards'] for _, peer in self._live_peers())
+
+    def remote_subscriptions(self, client_id: str) -> Dict[str, List[list]]:
+        """layer -> image tiers of a client that dashboards on the other workers subscribe to"""
+        merged: Dict[str, List[list]] = {}
+        for _, peer in self._live_peers():
+            for layer, tiers in peer['subscriptions'].get(client_id, {}).items():
+                merged.setdefault(layer, []).extend(tiers)
+        return merged
+
+    def worker_count(self) -> int:
+        """Live workers, this one included"""
+        return 1 + len(self._live_peers()) if self.enabled else 1
+
+    def owner_of(self, client_id: str) -> Optional[int]:
+        """Worker holding a client's phone connection, if it is another worker"""
+        for worker_id, peer in self._live_peers():
+            if any(client['client_id'] == client_id for client in peer['clients']):
+                return worker_id
+        return None
@@ -0,0 +1,472 @@
+"""
+Dashboard connections.
+Every dashboard WebSocket gets its own writer task and a small queue, so one
+slow browser never holds up the others. Queued frame updates are coalesced to
+the latest one per phone; other messages (segmentation updates, replies) are
+never dropped. Frame updates are queued as FrameUpdate objects and serialized
+in the protocol each dashboard asked for (see dashboard_protocol).
+
+Dashboards only receive per-client messages for the clients they subscribed
+to, and only the layers (rgb, depth, segmentation, motion) they asked for.
+Each subscription can cap the frame rate and pick an image tier (width and
+JPEG quality); adaptive subscriptions step both down while the connection's
+send lag is high. Dashboards asking for the same tier share its encodes.
+
+A subscription with "mode": "video" gets the rgb layer as H.264 segments
+(see video_stream) instead of JPEGs. Its writer holds rgb back until the
+first keyframe segment, and again after a segment was dropped, and the
+connection asks the encoder for a keyframe meanwhile. Video is never
+decimated by max_fps, since every segment depends on the one before.
+
+The writer task also checks that the dashboard is still there: once it has
+heard nothing from it for heartbeat_interval_s it queues a {"type": "ping"}
+(busy or not, since a dashboard watching a stream may never write on its own),
+which dashboards answer with a {"action": "pong"}, and a dashboard silent for
+heartbeat_timeout_s is closed.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+from dashboard_protocol import (ALL_LAYERS, DEFAULT_JPEG_QUALITY, DEFAULT_TIER, FrameUpdate, PROTOCOL_JSON,
+                                Tier, is_keyframe_segment, parse_layers)
+
+logger = logging.getLogger(__name__)
+
+
+# Overridable in the `dashboard` section of config.yaml
+DASHBOARD_DEFAULTS = {
+    'jpeg_quality': 0,              # For subscriptions that do not ask for one (0: the phone's JPEG)
+    'adaptive_base_fps': 30,        # Frame rate an adaptive subscription without max_fps backs off from
+    'adaptive_target_lag_ms': 200,  # Step down while queued -> sent lag is above this
+    'adaptive_interval_s': 1.0,     # How often adaptive connections re-evaluate their level
+    'heartbeat_interval_s': 15.0,   # Ping a dashboard after this long without a message from it
+    'heartbeat_timeout_s': 45.0,    # Close a dashboard that sent nothing (not even a pong) for this long
+}
+
+# Widths frames are scaled to, so that similar requests share one encode (0: original)
+WIDTH_STEPS = (0, 1280, 960, 640, 480, 320)
+MIN_JPEG_QUALITY = 30
+
+# Adaptive levels: (frame rate factor, width steps down, JPEG quality drop)
+ADAPTIVE_LEVELS = (
+    (1.0, 0, 0),
+    (0.75, 0, 10),
+    (0.5, 1, 20),
+    (0.5, 2, 30),
+    (0.25, 3, 40),
+)
+
+
+def load_dashboard_settings(config: dict) -> dict:
+    """Merge the `dashboard` section of config.yaml over DASHBOARD_DEFAULTS"""
+    return {**DASHBOARD_DEFAULTS, **(config.get('dashboard') or {})}
+
+
+def snap_width(width: Optional[int]) -> int:
+    """Largest WIDTH_STEPS entry not above width (0 or None: original resolution)"""
+    if not width:
+        return 0
+    fitting = [step for step in WIDTH_STEPS if step and step <= width]
+    return max(fitting) if fitting else WIDTH_STEPS[-1]
+
+
+def snap_quality(quality: int) -> int:
+    """Round to a multiple of 5 within [MIN_JPEG_QUALITY, 95]; 0 (the phone's JPEG) stays 0"""
+    if not quality:
+        return 0
+    return min(95, max(MIN_JPEG_QUALITY, int(round(quality / 5.0)) * 5))
+
+
+class Subscription:
+    """What one dashboard wants of one client"""
+
+    __slots__ = ('layers', 'max_fps', 'tier', 'adaptive', 'video')
+
+    def __init__(self, layers: FrozenSet[str] = ALL_LAYERS, max_fps: float = 0.0,
+                 tier: Tier = DEFAULT_TIER, adaptive: bool = False, video: bool = False):
+        self.layers = layers
+        self.max_fps = max_fps    # 0: every frame
+        self.tier = tier
+        self.adaptive = adaptive
+        self.video = video        # rgb as H.264 segments instead of JPEGs
+
+    @classmethod
+    def from_message(cls, data: dict, settings: dict) -> 'Subscription':
+        """From the options of a subscribe action"""
+        return cls(
+            layers=parse_layers(data.get('layers')),
+            max_fps=max(0.0, float(data.get('max_fps') or 0)),
+            tier=Tier(snap_width(data.get('max_width')),
+                      snap_quality(data.get('jpeg_quality') or settings['jpeg_quality'])),
+            adaptive=bool(data.get('adaptive', False)),
+            video=data.get('mode') == 'video',
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'layers': sorted(self.layers),
+            'max_fps': self.max_fps,
+            'max_width': self.tier.max_width,
+            'jpeg_quality': self.tier.jpeg_quality,
+            'adaptive': self.adaptive,
+            'mode': 'video' if self.video else 'jpeg',
+        }
+
+Message = Union[str, bytes, FrameUpdate]
+
+# Message types that may be replaced by a newer one for the same client
+COALESCED_TYPES = ('frame_update',)
+
+_connection_ids = itertools.count(1)
+
+
+class DashboardConnection:
+    """One dashboard WebSocket and its writer task"""
+
+    # A dashboard that falls this far behind on non-droppable messages is disconnected
+    MAX_CONTROL_QUEUED = 256
+
+    def __init__(self, websocket: WebSocket, protocol: int = PROTOCOL_JSON,
+                 settings: Optional[dict] = None):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.settings = {**DASHBOARD_DEFAULTS, **(settings or {})}
+        self.id = next(_connection_ids)
+        self.connected_at = time.time()
+        self.received_at = time.perf_counter()          # Last message from the dashboard
+        self._pinged_at = float('-inf')                 # Last ping queued
+        self.closed = False
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.level = 0                                  # Index into ADAPTIVE_LEVELS
+        self._adapted_at = time.perf_counter()
+        self._next_frame_at: Dict[str, float] = {}      # client_id -> earliest time for the next frame
+        self._video_tier: Dict[str, Tier] = {}          # client_id -> video tier sent from a keyframe on
+
+        self._frames: 'OrderedDict[str, tuple]' = OrderedDict()  # client_id -> (message, queued_at)
+        self._control: deque = deque()                           # (message, queued_at)
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+        # Stats
+        self.sent = 0
+        self.coalesced = 0
+        self.decimated = 0
+        self.bytes_sent = 0
+        self.lag_s = 0.0       # Moving average of queued -> sent
+        self.max_lag_s = 0.0
+        self.send_s = 0.0      # Moving average of time spent in send
+
+    def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+
+    def received(self):
+        """Note a message from the dashboard (any message counts as a heartbeat)"""
+        self.received_at = time.perf_counter()
+
+    def subscribe(self, client_ids: Iterable[str], subscription: Optional[Subscription] = None,
+                  replace: bool = False) -> List[str]:
+        """
+        Subscribe to clients' frames (all layers, every frame unless given).
+
+        Returns:
+            The clients that were not subscribed before
+        """
+        subscription = subscription or Subscription(tier=Tier(0, self.settings['jpeg_quality']))
+        client_ids = list(client_ids)
+        if replace:
+            for client_id in list(self.subscriptions):
+                if client_id not in client_ids:
+                    self.unsubscribe(client_id)
+        added = []
+        for client_id in client_ids:
+            if client_id not in self.subscriptions:
+                added.append(client_id)
+            self.subscriptions[client_id] = subscription
+        return added
+
+    def unsubscribe(self, client_id: Optional[str] = None):
+        """Drop one client's subscription, or all of them"""
+        if client_id is None:
+            self.subscriptions.clear()
+            self._frames.clear()
+            self._next_frame_at.clear()
+            self._video_tier.clear()
+        else:
+            self.subscriptions.pop(client_id, None)
+            self._frames.pop(client_id, None)
+            self._next_frame_at.pop(client_id, None)
+            self._video_tier.pop(client_id, None)
+
+    # --- frame rate and tier ---
+
+    def max_fps(self, subscription: Subscription) -> float:
+        """Current frame rate cap for a subscription (0: none)"""
+        if subscription.video:
+            return 0.0
+        if not subscription.adaptive or self.level == 0:
+            return subscription.max_fps
+        base = subscription.max_fps or self.settings['adaptive_base_fps']
+        return base * ADAPTIVE_LEVELS[self.level][0]
+
+    def tier(self, subscription: Subscription) -> Tier:
+        """Current image tier for a subscription"""
+        tier = subscription.tier
+        if subscription.adaptive and self.level > 0:
+            _, steps_down, quality_drop = ADAPTIVE_LEVELS[self.level]
+            index = min(WIDTH_STEPS.index(tier.max_width) + steps_down, len(WIDTH_STEPS) - 1)
+            quality = tier.jpeg_quality or DEFAULT_JPEG_QUALITY
+            tier = Tier(WIDTH_STEPS[index], max(MIN_JPEG_QUALITY, quality - quality_drop))
+        if subscription.video:
+            # One H.264 stream per width: quality does not apply
+            return Tier(tier.max_width, 0, True)
+        return tier
+
+    def wants_keyframe(self, client_id: str, tier: Tier) -> bool:
+        """Whether this dashboard waits for a keyframe of a client's video at a tier"""
+        subscription = self.subscriptions.get(client_id)
+        return (subscription is not None and subscription.video and 'rgb' in subscription.layers
+                and self.tier(subscription) == tier and self._video_tier.get(client_id) != tier)
+
+    def _due(self, client_id: str, now: float) -> bool:
+        """Whether a frame of client_id fits under its subscription's frame rate cap"""
+        fps = self.max_fps(self.subscriptions[client_id])
+        if not fps:
+            return True
+        interval = 1.0 / fps
+        next_at = self._next_frame_at.get(client_id, 0.0)
+        # A quarter interval of slack so phone frame jitter does not halve the rate
+        if now + interval / 4 < next_at:
+            return False
+        self._next_frame_at[client_id] = max(next_at, now - interval / 2) + interval
+        return True
+
+    def _adapt(self, now: float):
+        """Step the adaptive level down while sends lag, back up once they keep up"""
+        if now - self._adapted_at < self.settings['adaptive_interval_s']:
+            return
+        self._adapted_at = now
+        if not any(subscription.adaptive for subscription in self.subscriptions.values()):
+            return
+        target_s = self.settings['adaptive_target_lag_ms'] / 1000
+        if self.lag_s > target_s and self.level < len(ADAPTIVE_LEVELS) - 1:
+            self.level += 1
+            logger.info(f"Dashboard {self.id} lagging ({self.lag_s * 1000:.0f} ms), adaptive level {self.level}")
+        elif self.lag_s < target_s / 4 and self.level > 0:
+            self.level -= 1
+
+    def enqueue(self, message: Message, msg_type: str, client_id: Optional[str] = None):
+        """Queue a message for this dashboard without waiting for the send"""
+        if self.closed:
+            return
+        now = time.perf_counter()
+        if msg_type in COALESCED_TYPES and client_id is not None:
+            if client_id in self.subscriptions and not self._due(client_id, now):
+                self.decimated += 1
+                return
+            if client_id in self._frames:
+                self.coalesced += 1
+                del self._frames[client_id]
+                # The dropped video segment breaks the stream until the next keyframe
+                self._video_tier.pop(client_id, None)
+            self._frames[client_id] = (message, now)
+        else:
+            if len(self._control) >= self.MAX_CONTROL_QUEUED:
+                logger.warning(f"Dashboard {self.id} is not keeping up, disconnecting")
+                self.closed = True
+                asyncio.create_task(self._close_socket())
+                return
+            self._control.append((message, now))
+        self._wakeup.set()
+
+    def _next(self) -> Optional[tuple]:
+        if self._control:
+            return self._control.popleft()
+        if self._frames:
+            return self._frames.popitem(last=False)[1]
+        return None
+
+    async def _run(self):
+        try:
+            while not self.closed:
+                self._heartbeat(time.perf_counter())
+                if self.closed:
+                    break
+                item = self._next()
+                if item is None:
+                    self._wakeup.clear()
+                    try:
+                        # The only timer of an idle connection: one wakeup per heartbeat interval
+                        await asyncio.wait_for(self._wakeup.wait(), self.settings['heartbeat_interval_s'])
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                message, queued_at = item
+                started = time.perf_counter()
+                if isinstance(message, FrameUpdate):
+                    subscription = self.subscriptions.get(message.client_id)
+                    if subscription is None:
+                        continue
+                    message = message.encode(self.protocol, *self._frame_form(message, subscription))
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                done = time.perf_counter()
+                self._record_send(len(message), done - queued_at, done - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Dashboard {self.id} send failed: {e}")
+            self.closed = True
+
+    def _frame_form(self, update: FrameUpdate, subscription: Subscription) -> tuple:
+        """(layers, tier) to send a frame update in; rgb video waits for a keyframe segment"""
+        tier = self.tier(subscription)
+        layers = subscription.layers
+        if tier.video and 'rgb' in layers and self._video_tier.get(update.client_id) != tier:
+            image = update.images.get(tier, {}).get('rgb')
+            if image is not None and is_keyframe_segment(image[1]):
+                self._video_tier[update.client_id] = tier
+            else:
+                layers = layers - {'rgb'}
+        return layers, tier
+
+    def _record_send(self, size: int, lag_s: float, send_s: float):
+        self.sent += 1
+        self.bytes_sent += size
+        self.lag_s += (lag_s - self.lag_s) * 0.1
+        self.send_s += (send_s - self.send_s) * 0.1
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        self._adapt(time.perf_counter())
+
+    def _heartbeat(self, now: float):
+        """Ping a dashboard that has been quiet for a heartbeat interval, or close it if it stopped answering"""
+        interval_s = self.settings['heartbeat_interval_s']
+        silent_s = now - self.received_at
+        if silent_s < interval_s:
+            return
+        if silent_s > self.settings['heartbeat_timeout_s']:
+            logger.warning(f"Dashboard {self.id} silent for {silent_s:.0f}s, disconnecting")
+            self.closed = True
+            asyncio.create_task(self._close_socket(1001, "Heartbeat timeout"))
+            return
+        if now - self._pinged_at >= interval_s:
+            self._pinged_at = now
+            self._control.append((json.dumps({'type': 'ping', 't': time.time()}), now))
+
+    async def _close_socket(self, code: int = 1013, reason: str = "Dashboard too slow"):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def close(self):
+        self.closed = True
+        self._frames.clear()
+        self._control.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._writer = None
+
+    def get_stats(self) -> dict:
+        return {
+            'id': self.id,
+            'protocol': self.protocol,
+            'subscriptions': {client_id: subscription.to_dict()
+                              for client_id, subscription in self.subscriptions.items()},
+            'adaptive_level': self.level,
+            'connected_at': self.connected_at,
+            'silent_s': round(time.perf_counter() - self.received_at, 1),
+            'queued': len(self._frames) + len(self._control),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'decimated': self.decimated,
+            'bytes_sent': self.bytes_sent,
+            'lag_ms': round(self.lag_s * 1000, 2),
+            'max_lag_ms': round(self.max_lag_s * 1000, 2),
+            'send_ms': round(self.send_s * 1000, 2),
+        }
+
+
+class DashboardHub:
+    """The dashboard connections of this server process"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**DASHBOARD_DEFAULTS, **(settings or {})}
+        self.connections: Dict[WebSocket, DashboardConnection] = {}
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def __iter__(self) -> Iterator[DashboardConnection]:
+        return iter(list(self.connections.values()))
+
+    def add(self, websocket: WebSocket, protocol: int = PROTOCOL_JSON) -> DashboardConnection:
+        connection = DashboardConnection(websocket, protocol, self.settings)
+        connection.start()
+        self.connections[websocket] = connection
+        return connection
+
+    async def remove(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is not None:
+            await connection.close()
+
+    def broadcast(self, message: Message, msg_type: str, client_id: Optional[str] = None):
+        """
+        Queue a message on every dashboard subscribed to `client_id` (on every
+        dashboard if None), dropping connections whose writer has failed.
+        """
+        for websocket, connection in list(self.connections.items()):
+            if connection.closed:
+                self.connections.pop(websocket, None)
+                asyncio.create_task(connection.close())
+                continue
+            if client_id is None or client_id in connection.subscriptions:
+                connection.enqueue(message, msg_type, client_id)
+
+    def subscribed_tiers(self, client_id: str) -> Dict[str, Set[Tier]]:
+        """layer -> tiers the dashboards currently want of one client"""
+        wanted: Dict[str, Set[Tier]] = {}
+        for connection in self:
+            subscription = connection.subscriptions.get(client_id)
+            if subscription is not None:
+                tier = connection.tier(subscription)
+                for layer in subscription.layers:
+                    wanted.setdefault(layer, set()).add(tier)
+        return wanted
+
+    def frame_forms(self, client_id: str) -> Set[tuple]:
+        """(protocol, layers, tier) forms the dashboards subscribed to a client receive its frames in"""
+        return {(connection.protocol, subscription.layers, connection.tier(subscription))
+                for connection in self
+                for subscription in (connection.subscriptions.get(client_id),) if subscription is not None}
+
+    def wants_keyframe(self, client_id: str, tier: Tier) -> bool:
+        """Whether a dashboard waits for a keyframe of a client's video at a tier"""
+        return any(connection.wants_keyframe(client_id, tier) for connection in self)
+
+    def subscriptions(self) -> Dict[str, Dict[str, list]]:
+        """client_id -> layer -> tiers, over all dashboards (JSON friendly, for the cluster stats)"""
+        merged: Dict[str, Dict[str, list]] = {}
+        client_ids = {client_id for connection in self for client_id in connection.subscriptions}
+        for client_id in client_ids:
+            merged[client_id] = {layer: sorted(list(tier) for tier in tiers)
+                                 for layer, tiers in self.subscribed_tiers(client_id).items()}
+        return merged
+
+    def get_stats(self) -> list:
+        return [connection.get_stats() for connection in self]
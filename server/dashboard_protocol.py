@@ -0,0 +1,326 @@
+"""
+Dashboard wire formats for frame updates.
+Protocol 1 is the original JSON text message with base64 images. Protocol 2
+(opt-in with /ws/dashboard?protocol=2) sends each frame update as one binary
+message: a fixed little-endian header, the client id, float32 camera matrices
+and motion, then the encoded images as they are. Other message types stay JSON
+text in both protocols.
+
+Binary layout (all little-endian):
+
+    header      28 bytes, see _HEADER
+    client_id   UTF-8, zero-padded to a multiple of 4 bytes
+    matrices    float32 x 16 (pose, view, projection) / x 9 (intrinsic), each if its flag is set
+    motion      uint32 field mask + float32 x MOTION_SIZE, if FLAG_MOTION is set
+    images      per image: uint8 layer, uint8 format, uint16 tier, uint32 length, bytes
+
+Messages to browsers carry the images of one tier (tier index 0). Between
+workers the same layout carries every tier, the tier index referring to the
+list of tiers sent alongside it.
+
+Protocol 1 messages are serialized with orjson when it is installed (camera
+matrices straight from their float32 arrays), else with the json module.
+
+Video tiers carry the rgb layer as an MP4 image: one fragmented MP4 segment of
+an H.264 stream (see video_stream). A segment starting with an ftyp box has
+the init segment in front and starts with a keyframe.
+"""
+
+import base64
+import json
+import logging
+import struct
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional dependency: the json module is used without it
+    orjson = None
+
+from buffer.frame_record import MOTION_LAYOUT, MOTION_SIZE, FrameRecord
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_JSON = 1
+PROTOCOL_BINARY = 2
+PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+
+MAGIC = b'CAMF'
+
+# magic, version, flags, tracking state, image count, frame number, timestamp (ns),
+# width, height, client id length, padding
+_HEADER = struct.Struct('<4sBBBBIqHHH2x')
+_IMAGE = struct.Struct('<BBHI')
+_MOTION_MASK = struct.Struct('<I')
+
+# Header flags
+FLAG_POSE = 1
+FLAG_VIEW = 2
+FLAG_PROJECTION = 4
+FLAG_INTRINSIC = 8
+FLAG_MOTION = 16
+FLAG_RESOLUTION = 32
+FLAG_CAMERA = 64
+
+# (matrix, flag, float count), in wire order
+_MATRICES = (
+    ('pose_matrix', FLAG_POSE, 16),
+    ('view_matrix', FLAG_VIEW, 16),
+    ('projection_matrix', FLAG_PROJECTION, 16),
+    ('intrinsic_matrix', FLAG_INTRINSIC, 9),
+)
+
+# Image layers: name -> (wire id, JSON key)
+LAYERS = {
+    'rgb': (1, 'rgb_frame'),
+    'segmentation': (2, 'segmentation_frame'),
+    'depth': (3, 'depth_frame'),
+}
+_LAYER_NAMES = {wire_id: name for name, (wire_id, _) in LAYERS.items()}
+
+IMAGE_FORMATS = {'JPEG': 1, 'PNG': 2, 'MP4': 3}
+_FORMAT_NAMES = {wire_id: name for name, wire_id in IMAGE_FORMATS.items()}
+
+# What a dashboard can subscribe to per client; 'motion' covers the camera
+# matrices and motion vectors
+ALL_LAYERS: FrozenSet[str] = frozenset(('rgb', 'depth', 'segmentation', 'motion'))
+
+_AXES = ('x', 'y', 'z', 'w')
+
+
+class Tier(NamedTuple):
+    """Image size and quality a frame is encoded at for some dashboards"""
+    max_width: int      # 0: original resolution
+    jpeg_quality: int   # 0: the phone's JPEG as is where possible, else DEFAULT_JPEG_QUALITY
+    video: bool = False  # rgb as H.264 segments instead of JPEGs
+
+
+DEFAULT_JPEG_QUALITY = 75
+DEFAULT_TIER = Tier(0, 0)
+
+
+def is_keyframe_segment(data: bytes) -> bool:
+    """Whether an MP4 image is a valid starting point (init segment + keyframe)"""
+    return data[4:8] == b'ftyp'
+
+
+def _array_to_list(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(message: dict) -> str:
+    """JSON text of a message whose values may include numpy arrays"""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(message, default=_array_to_list)
+
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def parse_layers(layers: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """Layers requested by a dashboard subscription (all of them if unspecified)"""
+    if layers is None:
+        return ALL_LAYERS
+    requested = frozenset(layers)
+    if requested - ALL_LAYERS:
+        logger.warning(f"Ignoring unknown dashboard layers: {sorted(requested - ALL_LAYERS)}")
+    return requested & ALL_LAYERS
+
+
+class FrameUpdate:
+    """
+    One frame_update for the dashboards.
+
+    Serialized per protocol, layer selection and tier on first use (or ahead
+    of the sends, with prepare) and cached, so a frame is encoded once per
+    distinct form however many dashboards receive it, and the latest update
+    of a client is ready to send as is to a dashboard that subscribes later.
+    """
+
+    __slots__ = ('client_id', 'frame_number', 'timestamp_ns', 'resolution', 'tracking_state',
+                 'matrices', 'motion', 'motion_mask', 'images', '_encoded')
+
+    def __init__(self, client_id: str, frame_number: int = 0, timestamp_ns: int = 0):
+        self.client_id = client_id
+        self.frame_number = frame_number
+        self.timestamp_ns = timestamp_ns
+        self.resolution: Optional[Tuple[int, int]] = None     # (width, height)
+        self.tracking_state: Optional[int] = None              # None without camera data
+        self.matrices: Dict[str, np.ndarray] = {}               # name -> flat float32
+        self.motion: Optional[np.ndarray] = None                # (MOTION_SIZE,) float32
+        self.motion_mask = 0
+        self.images: Dict[Tier, Dict[str, Tuple[str, bytes]]] = {}  # tier -> layer -> (format, bytes)
+        self._encoded: Dict[tuple, object] = {}                # (protocol, layers, tier) -> message
+
+    @classmethod
+    def from_frame(cls, client_id: str, frame: FrameRecord) -> 'FrameUpdate':
+        """Metadata of a frame; images are added with add_image"""
+        update = cls(client_id, frame.frame_number, frame.timestamp_ns)
+        if frame.has_camera:
+            update.tracking_state = frame.tracking_state
+            for name, _, _ in _MATRICES:
+                matrix = getattr(frame, name)
+                if matrix is not None:
+                    update.matrices[name] = np.asarray(matrix, dtype=np.float32).ravel()
+        if frame.motion is not None:
+            update.motion = frame.motion
+            update.motion_mask = frame.motion_mask
+        return update
+
+    def add_image(self, layer: str, image_format: str, data: bytes, tier: Tier = DEFAULT_TIER):
+        self.images.setdefault(tier, {})[layer] = (image_format, data)
+        self._encoded.clear()
+
+    def encode(self, protocol: int, layers: Optional[FrozenSet[str]] = None, tier: Tier = DEFAULT_TIER):
+        """
+        The message for a dashboard speaking `protocol`, subscribed to `layers`
+        (None: all) at `tier` (or the closest tier this update was encoded at).
+        """
+        if layers is not None and layers >= ALL_LAYERS:
+            layers = None
+        tier = self._closest_tier(tier)
+        key = (protocol, layers, tier)
+        if key not in self._encoded:
+            if protocol == PROTOCOL_BINARY:
+                self._encoded[key] = self._build_binary(layers, tier)
+            else:
+                self._encoded[key] = self._build_json(layers, tier)
+        return self._encoded[key]
+
+    def prepare(self, forms: Iterable[Tuple[int, Optional[FrozenSet[str]], Tier]]):
+        """Serialize ahead of the sends, e.g. on a worker thread, in the given (protocol, layers, tier) forms"""
+        for protocol, layers, tier in forms:
+            self.encode(protocol, layers, tier)
+
+    def has_images(self, layer: str, tiers: Iterable[Tier]) -> bool:
+        """Whether an image of a layer was added at every one of the tiers"""
+        return all(layer in self.images.get(tier, {}) for tier in tiers)
+
+    def _closest_tier(self, tier: Tier) -> Tier:
+        if tier in self.images or not self.images:
+            return tier
+
+        def distance(candidate: Tier):
+            # 0 (original resolution) is larger than any explicit width
+            return (candidate.video != tier.video,
+                    abs((candidate.max_width or 1 << 16) - (tier.max_width or 1 << 16)),
+                    abs(candidate.jpeg_quality - tier.jpeg_quality))
+        return min(self.images, key=distance)
+
+    def _parts(self, layers: Optional[FrozenSet[str]], tier: Tier):
+        """(images, include camera and motion) for a layer selection"""
+        images = self.images.get(tier, {})
+        if layers is None:
+            return images, True
+        return {layer: image for layer, image in images.items() if layer in layers}, 'motion' in layers
+
+    # --- protocol 1 ---
+
+    def to_json(self, layers: Optional[FrozenSet[str]] = None, tier: Tier = DEFAULT_TIER) -> str:
+        return self.encode(PROTOCOL_JSON, layers, tier)
+
+    def _build_json(self, layers: Optional[FrozenSet[str]], tier: Tier) -> str:
+        images, with_motion = self._parts(layers, tier)
+        msg: dict = {
+            'type': 'frame_update',
+            'client_id': self.client_id,
+            'timestamp': self.timestamp_ns,
+            'frame_number': self.frame_number,
+        }
+        for layer, (_, data) in images.items():
+            msg[LAYERS[layer][1]] = base64.b64encode(data).decode('ascii')
+        if self.resolution is not None:
+            msg['resolution'] = {'width': self.resolution[0], 'height': self.resolution[1]}
+        if self.tracking_state is not None and with_motion:
+            msg['camera'] = dict(self.matrices)
+            msg['tracking_state'] = self.tracking_state
+        if self.motion is not None and with_motion:
+            values = self.motion.tolist()
+            msg['motion'] = {
+                field: dict(zip(_AXES, values[offset:offset + size]))
+                for index, (field, offset, size) in enumerate(MOTION_LAYOUT)
+                if self.motion_mask & (1 << index)
+            }
+        return dumps(msg)
+
+    # --- protocol 2 ---
+
+    def to_binary(self, layers: Optional[FrozenSet[str]] = None, tier: Tier = DEFAULT_TIER) -> bytes:
+        return self.encode(PROTOCOL_BINARY, layers, tier)
+
+    def to_relay(self) -> Tuple[List[list], bytes]:
+        """All tiers in one binary message, for another worker: (tier list, message)"""
+        tiers = list(self.images)
+        images = [(index, layer, image) for index, tier in enumerate(tiers)
+                  for layer, image in self.images[tier].items()]
+        return [list(tier) for tier in tiers], self._pack(images, True)
+
+    def _build_binary(self, layers: Optional[FrozenSet[str]], tier: Tier) -> bytes:
+        images, with_motion = self._parts(layers, tier)
+        return self._pack([(0, layer, image) for layer, image in images.items()], with_motion)
+
+    def _pack(self, images: List[tuple], with_motion: bool) -> bytes:
+        client_id = self.client_id.encode('utf-8')
+        flags = 0
+        if self.tracking_state is not None and with_motion:
+            flags |= FLAG_CAMERA
+        if self.resolution is not None:
+            flags |= FLAG_RESOLUTION
+        width, height = self.resolution or (0, 0)
+
+        parts = [None, client_id, b'\0' * (_pad4(len(client_id)) - len(client_id))]
+        if flags & FLAG_CAMERA:
+            for name, flag, _ in _MATRICES:
+                if name in self.matrices:
+                    flags |= flag
+                    parts.append(self.matrices[name].tobytes())
+        if self.motion is not None and with_motion:
+            flags |= FLAG_MOTION
+            parts.append(_MOTION_MASK.pack(self.motion_mask))
+            parts.append(np.asarray(self.motion, dtype=np.float32).tobytes())
+        for tier_index, layer, (image_format, data) in images:
+            parts.append(_IMAGE.pack(LAYERS[layer][0], IMAGE_FORMATS[image_format], tier_index, len(data)))
+            parts.append(data)
+
+        parts[0] = _HEADER.pack(MAGIC, PROTOCOL_BINARY, flags, self.tracking_state or 0,
+                                len(images), self.frame_number & 0xFFFFFFFF,
+                                self.timestamp_ns, width, height, len(client_id))
+        return b''.join(parts)
+
+    @classmethod
+    def from_binary(cls, data: bytes, tiers: Optional[List[list]] = None) -> 'FrameUpdate':
+        """Parse a protocol 2 message, e.g. one from to_relay with its tier list"""
+        (magic, version, flags, tracking_state, image_count, frame_number,
+         timestamp_ns, width, height, id_len) = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != PROTOCOL_BINARY:
+            raise ValueError(f"Not a frame update message (magic {magic!r}, version {version})")
+        offset = _HEADER.size
+        update = cls(bytes(data[offset:offset + id_len]).decode('utf-8'), frame_number, timestamp_ns)
+        offset += _pad4(id_len)
+
+        if flags & FLAG_RESOLUTION:
+            update.resolution = (width, height)
+        if flags & FLAG_CAMERA:
+            update.tracking_state = tracking_state
+        for name, flag, count in _MATRICES:
+            if flags & flag:
+                update.matrices[name] = np.frombuffer(data, dtype='<f4', count=count, offset=offset)
+                offset += count * 4
+        if flags & FLAG_MOTION:
+            update.motion_mask, = _MOTION_MASK.unpack_from(data, offset)
+            offset += _MOTION_MASK.size
+            update.motion = np.frombuffer(data, dtype='<f4', count=MOTION_SIZE, offset=offset)
+            offset += MOTION_SIZE * 4
+        for _ in range(image_count):
+            layer, image_format, tier_index, length = _IMAGE.unpack_from(data, offset)
+            offset += _IMAGE.size
+            tier = Tier(*tiers[tier_index]) if tiers else DEFAULT_TIER
+            update.add_image(_LAYER_NAMES[layer], _FORMAT_NAMES[image_format], bytes(data[offset:offset + length]), tier)
+            offset += length
+        return update
@@ -0,0 +1,60 @@
+"""
+Depth colorization for the dashboard depth layer.
+Depth is mapped through a precomputed colormap lookup table over the range the
+phone reports (DepthFrame.min_depth_m / max_depth_m), so a frame costs one
+numpy indexing operation instead of a min/max scan plus PIL colorize.
+"""
+
+import functools
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# 256 colors of the black -> blue -> white ramp the dashboard has always used
+COLORMAP = np.asarray(ImageOps.colorize(
+    Image.fromarray(np.arange(256, dtype=np.uint8)[None, :]), 'black', 'white', 'blue'))[0]
+
+
+@functools.lru_cache(maxsize=8)
+def millimeter_lut(min_mm: int, max_mm: int) -> np.ndarray:
+    """(65536, 3) uint8 colors for every uint16 millimetre value over [min_mm, max_mm]"""
+    mm = np.arange(65536, dtype=np.float32)
+    scale = np.float32(255.0 / (max_mm - min_mm)) if max_mm > min_mm else np.float32(0.0)
+    index = np.clip((mm - np.float32(min_mm)) * scale, 0, 255).astype(np.uint8)
+    lut = COLORMAP[index]
+    lut.flags.writeable = False
+    return lut
+
+
+def colorize_depth(depth: np.ndarray, depth_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """
+    Colorize a depth map as an (H, W, 3) uint8 image.
+
+    Args:
+        depth: FrameRecord.depth_map (uint16 millimetres or float32 metres)
+        depth_range: (min_m, max_m) reported by the phone; without a usable
+            range the frame's own min/max is used
+
+    Returns:
+        Colorized depth, clamped to the range
+    """
+    lo, hi = depth_range or (0.0, 0.0)
+    has_range = hi > lo
+
+    if depth.dtype == np.uint16:
+        if has_range:
+            min_mm, max_mm = int(round(lo * 1000)), int(round(hi * 1000))
+        else:
+            min_mm, max_mm = int(depth.min()), int(depth.max())
+        return millimeter_lut(min_mm, max_mm)[depth]
+
+    # float32 metres: one scaled copy, then the 256-entry table
+    if not has_range:
+        lo, hi = float(np.nanmin(depth)), float(np.nanmax(depth))
+    scale = np.float32(255.0 / (hi - lo)) if hi > lo else np.float32(0.0)
+    index = depth - np.float32(lo)
+    index *= scale
+    # fmax/fmin rather than clip: invalid (NaN) depth comes out as 0, like missing uint16 depth
+    np.fmin(np.fmax(index, 0, out=index), 255, out=index)
+    return COLORMAP[index.astype(np.uint8)]
@@ -0,0 +1,113 @@
+"""
+Server-to-phone flow control for the AR stream.
+Periodically turns a client's pipeline drops and ingest latency into a
+recommended frame rate, JPEG quality and payload selection, sent to the phone
+as a small JSON text message on /ar-stream.
+"""
+
+import logging
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+# Overridable in the `flow_control` section of config.yaml
+FLOW_DEFAULTS = {
+    'enabled': True,
+    'interval_s': 1.0,          # How often the recommendation is recomputed
+    'min_fps': 5,
+    'max_fps': 30,
+    'min_jpeg_quality': 40,
+    'max_jpeg_quality': 85,
+    'drop_ratio_high': 0.25,    # Back off when a stage drops more than this share of frames
+    'drop_ratio_low': 0.05,     # Ramp up again below this share
+    'max_ingest_ms': 150.0,     # Back off when receive -> decoded takes longer than this
+    'resend_every': 10,         # Repeat an unchanged recommendation every N intervals
+}
+
+
+def load_flow_settings(config: dict) -> dict:
+    """Merge the `flow_control` section of config.yaml over FLOW_DEFAULTS"""
+    return {**FLOW_DEFAULTS, **(config.get('flow_control') or {})}
+
+
+class FlowController:
+    """
+    Frame rate / quality recommendation for one phone.
+
+    Additive increase, multiplicative decrease: overload (stage drops or slow
+    ingest) cuts the frame rate by a quarter and lowers JPEG quality, and once
+    the frame rate is at its floor depth is shed. Quiet intervals restore depth
+    first, then quality and frame rate step by step.
+    """
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**FLOW_DEFAULTS, **(settings or {})}
+        self.max_fps = int(self.settings['max_fps'])
+        self.jpeg_quality = int(self.settings['max_jpeg_quality'])
+        self.shed_depth = False
+        self._last_frames: Optional[int] = None
+        self._last_dropped: Dict[str, int] = {}
+        self._last_message: Optional[dict] = None
+        self._since_sent = 0
+
+    @property
+    def interval_s(self) -> float:
+        return float(self.settings['interval_s'])
+
+    def _drop_ratio(self, frames_received: int, dropped: Dict[str, int]) -> float:
+        """Largest share of this interval's frames dropped by any single stage"""
+        frames = frames_received - (self._last_frames if self._last_frames is not None else frames_received)
+        ratio = 0.0
+        if frames > 0:
+            for stage, count in dropped.items():
+                ratio = max(ratio, (count - self._last_dropped.get(stage, count)) / frames)
+        self._last_frames = frames_received
+        self._last_dropped = dict(dropped)
+        return ratio
+
+    def update(self, frames_received: int, dropped: Dict[str, int], ingest_ms: float,
+               dashboard_layers: Set[str], segmentation_active: bool) -> Optional[dict]:
+        """
+        Fold one interval of client stats into the recommendation.
+
+        Args:
+            frames_received: Total frames received from the phone so far
+            dropped: stage -> total frames dropped by that pipeline stage
+            ingest_ms: Recent receive -> decoded latency
+            dashboard_layers: Layers of this client that dashboards subscribe to
+            segmentation_active: Whether frames are forwarded to segmentation
+
+        Returns:
+            The flow_control message to send, or None if nothing changed
+        """
+        s = self.settings
+        drop_ratio = self._drop_ratio(frames_received, dropped)
+
+        if drop_ratio > s['drop_ratio_high'] or ingest_ms > s['max_ingest_ms']:
+            if self.max_fps <= s['min_fps']:
+                self.shed_depth = True
+            self.max_fps = max(int(s['min_fps']), int(self.max_fps * 0.75))
+            self.jpeg_quality = max(int(s['min_jpeg_quality']), self.jpeg_quality - 10)
+        elif drop_ratio < s['drop_ratio_low'] and ingest_ms < s['max_ingest_ms'] / 2:
+            if self.shed_depth:
+                self.shed_depth = False
+            else:
+                self.jpeg_quality = min(int(s['max_jpeg_quality']), self.jpeg_quality + 5)
+                self.max_fps = min(int(s['max_fps']), self.max_fps + 2)
+
+        # RGB feeds dashboards and segmentation; depth is only shown on dashboards
+        message = {
+            'type': 'flow_control',
+            'max_fps': self.max_fps,
+            'jpeg_quality': self.jpeg_quality,
+            'send_rgb': bool(dashboard_layers & {'rgb', 'segmentation'}) or segmentation_active,
+            'send_depth': 'depth' in dashboard_layers and not self.shed_depth,
+        }
+
+        self._since_sent += 1
+        if message == self._last_message and self._since_sent < s['resend_every']:
+            return None
+        self._last_message = message
+        self._since_sent = 0
+        return message
@@ -0,0 +1,226 @@
+"""
+Frame decoding stage for the AR stream.
+Parses serialized ARFrame / ARFrameBatch messages into frame records and decodes
+their image payloads off the asyncio event loop, on a thread pool or a process pool.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Add proto directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+from proto import ar_stream_pb2
+
+from buffer.frame_record import FrameRecord, MotionSamples, MOTION_LAYOUT, MOTION_SIZE, materialize_frame
+
+logger = logging.getLogger(__name__)
+
+
+_CAMERA_MATRICES = (('intrinsic_matrix', (3, 3)), ('projection_matrix', (4, 4)),
+                    ('view_matrix', (4, 4)), ('pose_matrix', (4, 4)))
+
+def extract_frame_data(ar_frame, client_id: str) -> FrameRecord:
+    """
+    Extract data from protobuf ARFrame into a FrameRecord.
+
+    Metadata is copied out eagerly; image payloads are kept as bytes and only
+    decoded when a consumer reads them.
+    """
+    frame = FrameRecord(client_id, ar_frame.device_id, ar_frame.timestamp_ns, ar_frame.frame_number)
+
+    # Camera data
+    if ar_frame.HasField('camera'):
+        cam = ar_frame.camera
+        frame.image_width = cam.image_width
+        frame.image_height = cam.image_height
+        frame.tracking_state = cam.tracking_state
+        for name, shape in _CAMERA_MATRICES:
+            raw = getattr(cam, name)
+            if raw:
+                setattr(frame, name, np.array(raw, dtype=np.float32).reshape(shape))
+
+    # RGB frame (decoded on first access)
+    if ar_frame.HasField('rgb_frame'):
+        rgb = ar_frame.rgb_frame
+        frame.set_rgb_payload(rgb.data, rgb.format, rgb.width, rgb.height, rgb.quality)
+
+    # Depth frame (decoded on first access)
+    if ar_frame.HasField('depth_frame'):
+        depth = ar_frame.depth_frame
+        frame.set_depth_payload(depth.data, depth.width, depth.height, depth.confidence, depth.format)
+        frame.depth_range = (depth.min_depth_m, depth.max_depth_m)
+
+    # Motion / sensor data, packed into one float32 array
+    if ar_frame.HasField('motion'):
+        motion = ar_frame.motion
+        values = np.zeros(MOTION_SIZE, dtype=np.float32)
+        mask = 0
+        for index, (field, offset, size) in enumerate(MOTION_LAYOUT):
+            if motion.HasField(field):
+                v = getattr(motion, field)
+                values[offset:offset + size] = (v.x, v.y, v.z, v.w) if size == 4 else (v.x, v.y, v.z)
+                mask |= 1 << index
+        if mask:
+            frame.motion = values
+            frame.motion_mask = mask
+
+    return frame
+
+
+def extract_motion_samples(samples) -> Optional[MotionSamples]:
+    """
+    Unpack protobuf MotionSamples into one (N, MOTION_SIZE) float32 array.
+
+    Each packed column is copied into its MOTION_LAYOUT slice in one go;
+    columns whose length does not match the sample count are ignored.
+    """
+    timestamps = np.fromiter(samples.timestamp_ns, dtype=np.int64, count=len(samples.timestamp_ns))
+    count = len(timestamps)
+    if count == 0:
+        return None
+    values = np.zeros((count, MOTION_SIZE), dtype=np.float32)
+    mask = 0
+    for index, (field, offset, size) in enumerate(MOTION_LAYOUT):
+        column = getattr(samples, field)
+        if not column:
+            continue
+        if len(column) != count * size:
+            logger.warning(f"Ignoring motion column {field}: {len(column)} values for {count} samples")
+            continue
+        values[:, offset:offset + size] = np.fromiter(column, dtype=np.float32, count=count * size).reshape(count, size)
+        mask |= 1 << index
+    if count > 1 and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, values = timestamps[order], values[order]
+    return MotionSamples(timestamps, values, mask)
+
+
+def decode_frame(data: bytes, client_id: str) -> Tuple[FrameRecord, dict]:
+    """
+    Parse a serialized ARFrame into a FrameRecord.
+
+    Runs inside the decode pool, so it must stay a picklable module-level function.
+
+    Returns:
+        (frame_data, timings) where timings maps stage name -> seconds
+    """
+    start = time.perf_counter()
+    ar_frame = ar_stream_pb2.ARFrame()
+    ar_frame.ParseFromString(data)
+    frame_data = extract_frame_data(ar_frame, client_id)
+    return frame_data, {'parse': time.perf_counter() - start}
+
+
+def decode_batch(data: bytes, client_id: str) -> Tuple[Tuple[str, List[FrameRecord], Optional[MotionSamples]], dict]:
+    """
+    Parse a serialized ARFrameBatch in one pass.
+
+    Frames without their own motion data get the latest motion sample taken at
+    or before their timestamp.
+
+    Returns:
+        ((device_id, frames, motion_samples), timings)
+    """
+    start = time.perf_counter()
+    batch = ar_stream_pb2.ARFrameBatch()
+    batch.ParseFromString(data)
+    frames = [extract_frame_data(ar_frame, client_id) for ar_frame in batch.frames]
+    motion = extract_motion_samples(batch.motion) if batch.HasField('motion') else None
+    for frame in frames:
+        if not frame.device_id:
+            frame.device_id = batch.device_id
+        if frame.motion is None and motion is not None:
+            index = motion.latest_before(frame.timestamp_ns)
+            if index is not None:
+                frame.motion = motion.values[index].copy()
+                frame.motion_mask = motion.mask
+    device_id = batch.device_id or (frames[0].device_id if frames else '')
+    return (device_id, frames, motion), {'parse': time.perf_counter() - start}
+
+
+class FrameDecoder:
+    """Runs ARFrame decoding inline, on a thread pool or on a process pool"""
+
+    MODES = ('inline', 'thread', 'process')
+
+    def __init__(self, mode: str = 'thread', workers: int = 4, max_in_flight_per_client: int = 4):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown decode mode: {mode} (expected one of {self.MODES})")
+        self.mode = mode
+        self.workers = workers
+        self.max_in_flight_per_client = max(1, max_in_flight_per_client)
+        self.executor: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'FrameDecoder':
+        """Create a decoder from the `decode` section of config.yaml"""
+        decode_config = config.get('decode', {})
+        return cls(
+            mode=decode_config.get('mode', 'thread'),
+            workers=decode_config.get('workers', 4),
+            max_in_flight_per_client=decode_config.get('max_in_flight_per_client', 4),
+        )
+
+    def start(self):
+        """Create the worker pool for the configured mode"""
+        if self.executor is not None:
+            return
+        if self.mode == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='frame-decode')
+        elif self.mode == 'process':
+            # Spawn rather than fork: the parent is running an event loop and uvicorn
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        logger.info(f"Frame decoder started: mode={self.mode}, workers={self.workers}, "
+                    f"max_in_flight_per_client={self.max_in_flight_per_client}")
+
+    def shutdown(self):
+        """Stop the worker pool, dropping frames that have not started decoding"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, data: bytes, client_id: str, batched: bool = False) -> asyncio.Future:
+        """
+        Hand raw ARFrame (or ARFrameBatch, if batched) bytes to the decode pool.
+
+        Returns:
+            Future resolving to the result of decode_frame / decode_batch
+        """
+        decode = decode_batch if batched else decode_frame
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            future = loop.create_future()
+            try:
+                future.set_result(decode(data, client_id))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        return loop.run_in_executor(self.executor, decode, data, client_id)
+
+    async def materialize(self, frame: FrameRecord, keys: Iterable[str]) -> float:
+        """
+        Decode the given payloads of a frame on the pool.
+
+        Returns:
+            Seconds spent decoding (0.0 if everything was already decoded)
+        """
+        missing = tuple(key for key in keys if frame.has_payload(key) and not frame.is_decoded(key))
+        if not missing:
+            return 0.0
+        if self.executor is None:
+            _, seconds = materialize_frame(frame, missing)
+            return seconds
+        loop = asyncio.get_running_loop()
+        decoded, seconds = await loop.run_in_executor(self.executor, materialize_frame, frame, missing)
+        # In process mode the worker decoded a copy of the frame
+        frame.store(decoded)
+        return seconds
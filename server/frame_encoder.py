@@ -0,0 +1,242 @@
+"""
+Encoding stage for dashboard images.
+The RGB, segmentation overlay and depth layers of a frame are rendered and
+encoded on a worker pool, so the layers of one frame encode in parallel and
+the event loop (and with it the /ar-stream receivers) never waits on PIL.
+Encoded images are memoized per (client_id, frame, layer, tier): a late
+subscriber, or a rebuilt latest frame, reuses what was already encoded. An
+encode still running is memoized too (as a future), so a broadcast and a
+subscribe snapshot asking for the same frame at once share one encode. Frame
+updates are also serialized here, once per form the dashboards receive.
+"""
+
+import asyncio
+import io
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from dashboard_protocol import DEFAULT_JPEG_QUALITY, FrameUpdate, Tier
+
+logger = logging.getLogger(__name__)
+
+
+# zlib level for dashboard PNGs: much faster than PIL's default (6) for slightly larger files
+PNG_COMPRESS_LEVEL = 1
+
+
+def encode_image(image_array: np.ndarray, format='JPEG', quality: int = DEFAULT_JPEG_QUALITY) -> bytes:
+    buf = io.BytesIO()
+    options = {'quality': quality} if format == 'JPEG' else {'compress_level': PNG_COMPRESS_LEVEL}
+    Image.fromarray(image_array).save(buf, format=format, **options)
+    return buf.getvalue()
+
+
+def resize_to_width(image_array: np.ndarray, width: int) -> np.ndarray:
+    """Scale an image down to `width` pixels wide (0 or a larger width: unchanged)"""
+    h, w = image_array.shape[:2]
+    if not width or width >= w:
+        return image_array
+    return cv2.resize(image_array, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+def tier_key(tier: Tier, format: str) -> Tier:
+    """
+    Tiers that share an image: a PNG only depends on the width, and video tiers
+    share the JPEG tiers' images. MP4 segments come from one stream per width.
+    """
+    if format == 'MP4':
+        return Tier(tier.max_width, 0, True)
+    return Tier(tier.max_width, 0 if format == 'PNG' else tier.jpeg_quality)
+
+
+def encode_tiers(render: Callable[[], np.ndarray], tiers: Iterable[Tier], format='JPEG') -> Dict[Tier, bytes]:
+    """Render an image, then encode it once per distinct tier (resizing once per width)"""
+    image_array = render()
+    resized: dict = {}
+    encoded: dict = {}
+    for tier in tiers:
+        if tier.max_width not in resized:
+            resized[tier.max_width] = resize_to_width(image_array, tier.max_width)
+        encoded[tier] = encode_image(resized[tier.max_width], format, tier.jpeg_quality or DEFAULT_JPEG_QUALITY)
+    return encoded
+
+
+# Memoized encode: the bytes, or a future resolving to them (None if the encode failed)
+Memo = Union[bytes, asyncio.Future]
+
+
+class FrameEncoder:
+    """Encodes dashboard images inline or on a thread pool and memoizes the results"""
+
+    MODES = ('inline', 'thread')
+
+    def __init__(self, mode: str = 'thread', workers: int = 4, frames_per_client: int = 2):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown encode mode: {mode} (expected one of {self.MODES})")
+        self.mode = mode
+        self.workers = workers
+        self.frames_per_client = max(1, frames_per_client)
+        self.executor: Optional[Executor] = None
+        # client_id -> (frame_number, timestamp_ns) -> (layer, tier) -> encoded bytes,
+        # or a future of them while the encode runs. Only touched from the event
+        # loop; the timestamp tells apart frames of a client whose numbering
+        # restarted (a reconnect, or a playback loop).
+        self._cache: Dict[str, 'OrderedDict[Tuple[int, int], Dict[Tuple[str, Tier], Memo]]'] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'FrameEncoder':
+        """Create an encoder from the `encode` section of config.yaml"""
+        encode_config = config.get('encode', {})
+        return cls(
+            mode=encode_config.get('mode', 'thread'),
+            workers=encode_config.get('workers', 4),
+            frames_per_client=encode_config.get('frames_per_client', 2),
+        )
+
+    def start(self):
+        """Create the worker pool for the configured mode"""
+        if self.executor is not None:
+            return
+        if self.mode == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='frame-encode')
+        logger.info(f"Frame encoder started: mode={self.mode}, workers={self.workers}, "
+                    f"frames_per_client={self.frames_per_client}")
+
+    def shutdown(self):
+        """Stop the worker pool, dropping encodes that have not started"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def forget(self, client_id: str):
+        """Drop the memoized images of a client"""
+        self._cache.pop(client_id, None)
+
+    def _frame_cache(self, client_id: str, frame_key: Tuple[int, int]) -> Dict[Tuple[str, Tier], Memo]:
+        frames = self._cache.setdefault(client_id, OrderedDict())
+        if frame_key in frames:
+            frames.move_to_end(frame_key)
+            return frames[frame_key]
+        frames[frame_key] = {}
+        while len(frames) > self.frames_per_client:
+            frames.popitem(last=False)
+        return frames[frame_key]
+
+    async def _memoized(self, cached: Dict[Tuple[str, Tier], Memo], layer: str, wanted: Dict[Tier, List[Tier]],
+                        compute: Callable[[Tuple[Tier, ...]], Awaitable[Dict[Tier, bytes]]]) -> Dict[Tier, bytes]:
+        """
+        Look up memoized encodes, joining those in flight and computing the rest once.
+
+        Args:
+            wanted: memo tier -> requested tiers it serves
+            compute: encodes the missing memo tiers, returning memo tier -> bytes
+
+        Returns:
+            requested tier -> encoded bytes (tiers whose encode failed are left out)
+        """
+        found: Dict[Tier, bytes] = {}
+        joined: Dict[Tier, asyncio.Future] = {}
+        missing = []
+        for key in wanted:
+            memo = cached.get((layer, key))
+            if memo is None:
+                missing.append(key)
+            elif isinstance(memo, asyncio.Future):
+                joined[key] = memo
+            else:
+                found[key] = memo
+        self.hits += len(found) + len(joined)
+
+        if missing:
+            self.misses += len(missing)
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                cached[(layer, key)] = future
+            encoded: Dict[Tier, bytes] = {}
+            try:
+                encoded = await compute(tuple(missing))
+            finally:
+                for key, future in futures.items():
+                    data = encoded.get(key)
+                    if data is not None:
+                        cached[(layer, key)] = data
+                    elif cached.get((layer, key)) is future:
+                        # Failed or cancelled: the next request encodes again
+                        del cached[(layer, key)]
+                    future.set_result(data)
+            found.update(encoded)
+
+        for key, future in joined.items():
+            data = await future
+            if data is not None:
+                found[key] = data
+        return {tier: found[key] for key, tiers in wanted.items() if key in found for tier in tiers}
+
+    async def encode(self, client_id: str, frame_number: int, timestamp_ns: int, layer: str,
+                     render: Callable[[], np.ndarray], tiers: Iterable[Tier], format='JPEG') -> Dict[Tier, bytes]:
+        """
+        Encode one layer of a frame at the given tiers.
+
+        Args:
+            render: produces the (H, W, 3) uint8 image; called on the pool, and
+                only if some tier is neither memoized nor being encoded
+            tiers: the subscribed tiers of the layer
+
+        Returns:
+            tier -> encoded bytes, for every requested tier
+        """
+        wanted: Dict[Tier, List[Tier]] = {}
+        for tier in tiers:
+            wanted.setdefault(tier_key(tier, format), []).append(tier)
+        return await self._memoized(
+            self._frame_cache(client_id, (frame_number, timestamp_ns)), layer, wanted,
+            lambda missing: self.run(encode_tiers, render, missing, format))
+
+    async def encode_video(self, client_id: str, frame_number: int, timestamp_ns: int, layer: str,
+                           encode_segment: Callable[[Tier], bytes], tiers: Iterable[Tier]) -> Dict[Tier, bytes]:
+        """
+        Video segments of a frame at the given video tiers, memoized per
+        width (there is one stream per width) so a frame is never fed to a
+        stream twice.
+
+        Args:
+            encode_segment: encodes the frame on the stream of a width-only
+                video tier; called on the pool
+        """
+        wanted: Dict[Tier, List[Tier]] = {}
+        for tier in tiers:
+            wanted.setdefault(tier_key(tier, 'MP4'), []).append(tier)
+        return await self._memoized(
+            self._frame_cache(client_id, (frame_number, timestamp_ns)), layer, wanted,
+            lambda missing: self.run(lambda: {tier: encode_segment(tier) for tier in missing}))
+
+    async def serialize(self, update: FrameUpdate, forms: Iterable[tuple]):
+        """Serialize a frame update on the pool in the forms dashboards will send it in"""
+        forms = tuple(forms)
+        if forms:
+            await self.run(update.prepare, forms)
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) on the encoder pool (inline without one)"""
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def get_stats(self) -> dict:
+        """Pool settings and memoization counters"""
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'cached_clients': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,146 @@
+"""
+Per-client frame pipeline.
+Each consumer of decoded frames (dashboard broadcast, segmentation) gets a
+bounded queue drained by a single worker task, so a slow consumer can only
+hold a fixed number of frames and tasks no matter how fast the phone sends.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Default settings per stage, overridable in the `pipeline` section of config.yaml
+STAGE_DEFAULTS = {
+    'broadcast': {'policy': 'latest_only', 'max_queued': 1},
+    'segmentation': {'policy': 'latest_only', 'max_queued': 1},
+}
+
+
+def load_stage_settings(config: dict) -> Dict[str, dict]:
+    """Merge the `pipeline` section of config.yaml over STAGE_DEFAULTS"""
+    pipeline_config = config.get('pipeline') or {}
+    settings = {}
+    for stage, defaults in STAGE_DEFAULTS.items():
+        settings[stage] = {**defaults, **(pipeline_config.get(stage) or {})}
+        StageQueue.check_policy(settings[stage]['policy'])
+    return settings
+
+
+class StageQueue:
+    """
+    Bounded queue for one pipeline stage, drained by a single worker task.
+
+    Policies for a full queue:
+      drop_oldest - discard the oldest queued item to make room
+      latest_only - keep only the newest item (older queued items are dropped)
+      block       - wait for room, pushing backpressure up to the producer
+    """
+
+    POLICIES = ('drop_oldest', 'latest_only', 'block')
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[None]],
+                 policy: str = 'drop_oldest', max_queued: int = 1):
+        self.check_policy(policy)
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.max_queued = 1 if policy == 'latest_only' else max(1, max_queued)
+        self.dropped = 0
+        self.processed = 0
+        self._items: deque = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def check_policy(cls, policy: str):
+        if policy not in cls.POLICIES:
+            raise ValueError(f"Unknown pipeline policy: {policy} (expected one of {cls.POLICIES})")
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def put(self, item):
+        """Queue an item, applying the drop policy if the queue is full"""
+        if self.policy == 'block':
+            while len(self._items) >= self.max_queued:
+                self._not_full.clear()
+                await self._not_full.wait()
+        else:
+            dropped = 0
+            while len(self._items) >= self.max_queued:
+                self._items.popleft()
+                dropped += 1
+            self.dropped += dropped
+        self._items.append(item)
+        self._not_empty.set()
+
+    async def _run(self):
+        while True:
+            while not self._items:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+            item = self._items.popleft()
+            self._not_full.set()
+            try:
+                await self.handler(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage '{self.name}' failed: {e}", exc_info=True)
+            self.processed += 1
+
+    async def close(self):
+        """Stop the worker, dropping anything still queued"""
+        self.dropped += len(self._items)
+        self._items.clear()
+        self._not_full.set()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def get_stats(self) -> dict:
+        return {
+            'policy': self.policy,
+            'queued': len(self._items),
+            'max_queued': self.max_queued,
+            'processed': self.processed,
+            'dropped': self.dropped,
+        }
+
+
+class ClientPipeline:
+    """The stage queues for one connected client"""
+
+    def __init__(self, client_id: str, handlers: Dict[str, Callable[[Any], Awaitable[None]]],
+                 settings: Dict[str, dict]):
+        self.client_id = client_id
+        self.stages: Dict[str, StageQueue] = {}
+        for stage, handler in handlers.items():
+            stage_settings = settings.get(stage, STAGE_DEFAULTS.get(stage, {}))
+            queue = StageQueue(stage, handler,
+                               policy=stage_settings.get('policy', 'drop_oldest'),
+                               max_queued=stage_settings.get('max_queued', 1))
+            queue.start()
+            self.stages[stage] = queue
+
+    async def put(self, stage: str, item):
+        await self.stages[stage].put(item)
+
+    async def close(self):
+        for queue in self.stages.values():
+            await queue.close()
+
+    def get_stats(self) -> dict:
+        return {stage: queue.get_stats() for stage, queue in self.stages.items()}
@@ -3,13 +3,16 @@ AR Stream Server - WebSocket server for streaming AR data from Android devices
 
 Endpoints:
   GET  /api/clients             - List connected clients
+  GET  /api/clients/{id}/motion - Buffered high-rate motion samples of a client
   GET  /api/health              - Health check
+  GET  /api/dashboards          - Dashboard connections with send lag/drop stats
+  GET  /api/metrics/segmentation - Segmentation latency percentiles and throughput per client
   GET  /api/recordings          - List recordings
   POST /api/segmentation/*      - Enable/disable segmentation
   POST /api/upload_recording    - Upload a recording
   POST /api/playback/*          - Start/stop playback
-  WS   /ar-stream               - AR data stream (from Android app)
-  WS   /ws/dashboard            - Dashboard real-time updates
+  WS   /ar-stream               - AR data stream (from Android app; ?batched=1 for ARFrameBatch)
+  WS   /ws/dashboard            - Dashboard real-time updates (?protocol=2 for binary frame updates)
   WS   /ws/segmentation         - Segmentation prompts/results
   /    (static)                 - React dashboard (served from dashboard/dist/)
 """
@@ -18,19 +21,28 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, H
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+import functools
 import logging
 import yaml
 from pathlib import Path
-import numpy as np
-from PIL import Image, ImageOps
-import io
-import base64
 import json
-from typing import Set
+import time
+from typing import Optional
 
 from buffer.client_manager import ClientManager
+from buffer.frame_record import FrameRecord, MOTION_LAYOUT
+from cluster import Cluster, ENV_SOCKET, start_hub
+from dashboard_hub import DashboardHub, Subscription, load_dashboard_settings
+from dashboard_protocol import FrameUpdate, PROTOCOLS, PROTOCOL_BINARY, PROTOCOL_JSON, Tier
+from depth_colormap import colorize_depth
+from frame_decoder import FrameDecoder, extract_frame_data
+from frame_encoder import FrameEncoder
+from frame_pipeline import ClientPipeline, load_stage_settings
+from flow_control import FlowController, load_flow_settings
 from playback import PlaybackManager
-from segmentation_client import segmentation_client
+from segmentation_client import load_segmentation_settings, segmentation_client
+from segmentation_overlay import SegmentationOverlay
+from video_stream import VideoStreams, load_video_settings
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -62,13 +74,18 @@ except ImportError as e:
 
 # --- State ---
 client_manager = ClientManager()
-dashboard_connections: Set[WebSocket] = set()
-latest_frames: dict = {}
-latest_segmentation_masks: dict = {}  # client_id -> encoded masks
+dashboard_hub = DashboardHub(load_dashboard_settings(config))
+latest_frames: dict = {}             # client_id -> latest FrameUpdate
+segmentation_overlays: dict = {}      # client_id -> SegmentationOverlay of the latest result
 segmentation_enabled: dict = {}       # client_id -> bool
-last_segmentation_time: dict = {}     # client_id -> timestamp
-SEGMENTATION_FRAME_INTERVAL = 1.0
 playback_manager = PlaybackManager(recordings_dir="recordings")
+frame_decoder = FrameDecoder.from_config(config)
+frame_encoder = FrameEncoder.from_config(config)
+video_streams = VideoStreams(load_video_settings(config))
+stage_settings = load_stage_settings(config)
+client_pipelines: dict = {}           # client_id -> ClientPipeline
+flow_settings = load_flow_settings(config)
+cluster = Cluster.from_config(config)
 
 
 # ============================================================
@@ -78,205 +95,217 @@ playback_manager = PlaybackManager(recordings_dir="recordings")
 @app.on_event("startup")
 async def startup():
     logger.info("Starting BayesMech CamAlytics Server...")
+    frame_decoder.start()
+    frame_encoder.start()
+    segmentation_client.configure(load_segmentation_settings(config))
     await segmentation_client.connect()
     segmentation_client.set_result_callback(handle_segmentation_result)
+    segmentation_client.set_encoder(frame_encoder.run)
+    await cluster.connect()
+    if cluster.enabled:
+        cluster.on('dashboard', _on_cluster_dashboard_message)
+        cluster.on('command', _on_cluster_command)
+        asyncio.create_task(_publish_cluster_stats())
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Shutting down server...")
+    await cluster.close()
     await segmentation_client.close()
+    frame_decoder.shutdown()
+    frame_encoder.shutdown()
 
 
 # ============================================================
-#  Frame extraction helpers
+#  Image encoding
 # ============================================================
 
-VEC3_FIELDS = [
-    'linear_acceleration', 'linear_velocity_pose', 'linear_velocity_accel',
-    'angular_velocity', 'gravity',
-]
-
-def _extract_vec3(msg) -> dict:
-    return {'x': msg.x, 'y': msg.y, 'z': msg.z}
-
-def extract_frame_data(ar_frame, client_id: str) -> dict:
-    """Extract data from protobuf ARFrame into a plain dict."""
-    data = {
-        'client_id': client_id,
-        'timestamp_ns': ar_frame.timestamp_ns,
-        'frame_number': ar_frame.frame_number,
-    }
-
-    # Camera data
-    if ar_frame.HasField('camera'):
-        cam = ar_frame.camera
-        camera = {
-            'image_width': cam.image_width,
-            'image_height': cam.image_height,
-            'tracking_state': cam.tracking_state,
-        }
-        for name, shape in [('intrinsic_matrix', (3, 3)), ('projection_matrix', (4, 4)),
-                            ('view_matrix', (4, 4)), ('pose_matrix', (4, 4))]:
-            raw = getattr(cam, name)
-            if raw:
-                camera[name] = np.array(raw).reshape(shape)
-        data['camera'] = camera
-
-    # RGB frame
-    if ar_frame.HasField('rgb_frame'):
-        rgb = ar_frame.rgb_frame
-        try:
-            if rgb.format == ar_stream_pb2.JPEG:
-                data['rgb_image'] = np.array(Image.open(io.BytesIO(rgb.data)))
-            elif rgb.format == ar_stream_pb2.RGB_888:
-                data['rgb_image'] = np.frombuffer(rgb.data, dtype=np.uint8).reshape(rgb.height, rgb.width, 3)
-            else:
-                logger.error(f"Unknown RGB format: {rgb.format}")
-        except Exception as e:
-            logger.error(f"Failed to decode RGB frame: {e}")
-
-    # Depth frame
-    if ar_frame.HasField('depth_frame'):
-        depth = ar_frame.depth_frame
-        try:
-            data['depth_map'] = np.frombuffer(depth.data, dtype=np.uint16).reshape(depth.height, depth.width)
-            data['depth_range'] = (depth.min_depth_m, depth.max_depth_m)
-            if depth.confidence:
-                data['depth_confidence'] = np.frombuffer(depth.confidence, dtype=np.uint8).reshape(depth.height, depth.width)
-        except Exception as e:
-            logger.error(f"Failed to decode depth frame: {e}")
-
-    # Motion / sensor data
-    if ar_frame.HasField('motion'):
-        motion = ar_frame.motion
-        motion_data = {}
-        for field in VEC3_FIELDS:
-            if motion.HasField(field):
-                motion_data[field] = _extract_vec3(getattr(motion, field))
-        if motion.HasField('orientation'):
-            o = motion.orientation
-            motion_data['orientation'] = {'x': o.x, 'y': o.y, 'z': o.z, 'w': o.w}
-        if motion_data:
-            data['motion'] = motion_data
-
-    return data
-
+def can_pass_through(tier: Tier, width: int, quality: int) -> bool:
+    """Whether the phone's own JPEG (width pixels wide, encoded at quality) can be sent as is for a tier."""
+    # Re-encoding at a higher quality than the phone used would only add bytes
+    return (width > 0 and (not tier.max_width or tier.max_width >= width)
+            and (not tier.jpeg_quality or tier.jpeg_quality >= quality))
 
 # ============================================================
-#  Image encoding helpers
+#  Lazy frame decoding
 # ============================================================
 
-def encode_image_to_base64(image_array: np.ndarray, format='JPEG') -> str:
-    buf = io.BytesIO()
-    Image.fromarray(image_array).save(buf, format=format)
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
-
-def encode_depth_to_base64(depth_array: np.ndarray) -> str:
-    depth_norm = ((depth_array - depth_array.min()) /
-                  (depth_array.max() - depth_array.min()) * 255).astype(np.uint8)
-    img = ImageOps.colorize(Image.fromarray(depth_norm).convert('L'), 'black', 'white', 'blue')
-    buf = io.BytesIO()
-    img.save(buf, format='PNG')
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
-
-def composite_rgb_with_masks(rgb_frame: np.ndarray, encoded_masks: dict) -> np.ndarray:
-    """Overlay segmentation masks onto an RGB frame."""
-    import cv2
-    output = rgb_frame.copy()
-    colors = [[255,0,0], [0,255,0], [0,0,255], [255,255,0], [255,0,255], [0,255,255]]
-
-    for idx, (obj_id, mask_base64) in enumerate(encoded_masks.items()):
-        try:
-            mask_rgba = np.array(Image.open(io.BytesIO(base64.b64decode(mask_base64))))
-            mask = mask_rgba[:, :, 3] > 0 if mask_rgba.shape[2] == 4 else mask_rgba[:, :, 0] > 0
-            if mask.shape[:2] != rgb_frame.shape[:2]:
-                mask = cv2.resize(mask.astype(np.uint8),
-                                  (rgb_frame.shape[1], rgb_frame.shape[0]),
-                                  interpolation=cv2.INTER_NEAREST).astype(bool)
-            output[mask] = (output[mask] * 0.5 + np.array(colors[idx % len(colors)]) * 0.5).astype(np.uint8)
-        except Exception as e:
-            logger.error(f"Failed to decode mask {obj_id}: {e}")
+async def materialize_frame(client_id: str, frame: FrameRecord, keys: tuple):
+    """Decode the image payloads a consumer needs on the frame decoder pool."""
+    seconds = await frame_decoder.materialize(frame, keys)
+    if seconds:
+        client_manager.record_stage_time(client_id, 'decode', seconds)
 
-    return output
+async def send_frame_to_segmentation(client_id: str, frame: FrameRecord):
+    # Credit may have been spent since the frame was queued
+    if not segmentation_client.wants_frame(client_id):
+        return
+    # A phone JPEG that fits goes to the segmentation server without being decoded here
+    if segmentation_client.needs_reencode(frame):
+        await materialize_frame(client_id, frame, ('rgb_image',))
+    if await segmentation_client.send_frame(client_id, frame):
+        client_manager.increment_seg_request(client_id)
 
 
 # ============================================================
 #  Dashboard broadcasting
 # ============================================================
 
-async def _broadcast_to_dashboards(msg_json: str):
-    """Send a JSON string to all dashboard WebSocket connections."""
-    disconnected = set()
-    for conn in dashboard_connections:
-        try:
-            await conn.send_text(msg_json)
-        except Exception:
-            disconnected.add(conn)
-    dashboard_connections.difference_update(disconnected)
-
-async def broadcast_frame_to_dashboards(client_id: str, frame_data: dict):
-    """Encode frame data and broadcast to all connected dashboards."""
-    if not dashboard_connections:
+def wanted_tiers(client_id: str) -> dict:
+    """layer -> image tiers of a client's frames that dashboards, in this or another worker, subscribe to."""
+    wanted = dashboard_hub.subscribed_tiers(client_id)
+    if cluster.enabled:
+        for layer, tiers in cluster.remote_subscriptions(client_id).items():
+            wanted.setdefault(layer, set()).update(Tier(*tier) for tier in tiers)
+    return wanted
+
+def _broadcast_to_dashboards(message, msg_type: str, client_id: str):
+    """Queue a message (JSON string or FrameUpdate) on all dashboards, including those of other workers."""
+    header = {'type': msg_type, 'client_id': client_id}
+    if isinstance(message, FrameUpdate):
+        # Frame updates travel between workers in the binary form, with every encoded tier
+        header['tiers'], payload = message.to_relay()
+    else:
+        payload = message.encode('utf-8')
+    # Frame updates are superseded by the next one and may be dropped between workers
+    cluster.publish('dashboard', header, payload, droppable=msg_type == 'frame_update')
+    # Each dashboard has its own writer task (see dashboard_hub); this never waits on a send
+    dashboard_hub.broadcast(message, msg_type, client_id)
+
+async def build_frame_update(client_id: str, frame: FrameRecord, wanted: dict, video: bool = True) -> FrameUpdate:
+    """
+    Encode the wanted layers and tiers of a frame, the layers in parallel on the encoder pool.
+    With video=False, video tiers are left out (their streams only advance on live frames).
+    """
+    rgb_tiers = {tier for tier in wanted.get('rgb', ()) if not tier.video}
+    video_tiers = {tier for tier in wanted.get('rgb', ()) if tier.video} if video else set()
+    segmentation_tiers = set()
+    overlay = segmentation_overlays.get(client_id)
+    if segmentation_enabled.get(client_id, True) and overlay is not None:
+        segmentation_tiers = wanted.get('segmentation', set())
+    depth_tiers = wanted.get('depth', set())
+
+    # Tiers the phone's JPEG already satisfies get its bytes without a decode/re-encode
+    jpeg = frame.rgb_jpeg
+    passthrough_tiers = set()
+    if jpeg is not None:
+        passthrough_tiers = {tier for tier in rgb_tiers if can_pass_through(tier, jpeg[1], jpeg[3])}
+    encode_tiers = rgb_tiers - passthrough_tiers
+
+    need_rgb = bool(encode_tiers or segmentation_tiers or video_tiers)
+    keys = ('rgb_image',) if need_rgb else ()
+    if depth_tiers:
+        keys += ('depth_map',)
+    await materialize_frame(client_id, frame, keys)
+
+    update = FrameUpdate.from_frame(client_id, frame)
+
+    for tier in passthrough_tiers:
+        update.add_image('rgb', 'JPEG', jpeg[0], tier)
+    if passthrough_tiers:
+        update.resolution = (jpeg[1], jpeg[2])
+
+    def encode(layer, render, tiers, format='JPEG'):
+        return frame_encoder.encode(client_id, frame.frame_number, frame.timestamp_ns, layer, render, tiers, format)
+
+    # (layer, format, encode): rendering (overlay, colormap) runs on the pool with the encode
+    jobs = []
+    rgb_image = frame.rgb_image if need_rgb else None
+    if rgb_image is not None:
+        h, w = rgb_image.shape[:2]
+        update.resolution = (w, h)
+        if encode_tiers:
+            jobs.append(('rgb', 'JPEG', encode('rgb', lambda: rgb_image, encode_tiers)))
+        if segmentation_tiers:
+            render = functools.partial(overlay.composite, rgb_image)
+            jobs.append(('segmentation', 'JPEG', encode('segmentation', render, segmentation_tiers)))
+        if video_tiers:
+            def encode_segment(tier):
+                return video_streams.encode(client_id, tier.max_width, rgb_image, frame.timestamp_ns,
+                                            dashboard_hub.wants_keyframe(client_id, tier))
+            jobs.append(('rgb', 'MP4', frame_encoder.encode_video(
+                client_id, frame.frame_number, frame.timestamp_ns, 'rgb', encode_segment, video_tiers)))
+    depth_map = frame.depth_map if depth_tiers else None
+    if depth_map is not None:
+        render = functools.partial(colorize_depth, depth_map, frame.depth_range)
+        jobs.append(('depth', 'PNG', encode('depth', render, depth_tiers, 'PNG')))
+    if video:
+        video_streams.retain(client_id, {tier.max_width for tier in video_tiers})
+
+    results = await asyncio.gather(*(job for _, _, job in jobs), return_exceptions=True)
+    for (layer, format, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to encode {layer} {format}: {result}")
+            continue
+        for tier, data in result.items():
+            # The first segment of a video stream is empty (see video_stream)
+            if data:
+                update.add_image(layer, format, data, tier)
+    return update
+
+async def broadcast_frame_to_dashboards(client_id: str, frame: FrameRecord):
+    """Encode the layers and tiers subscribed dashboards want of a frame and broadcast it."""
+    wanted = wanted_tiers(client_id)
+    if not wanted:
         return
-
-    msg: dict = {
-        'type': 'frame_update',
-        'client_id': client_id,
-        'timestamp': frame_data.get('timestamp_ns', 0),
-        'frame_number': frame_data.get('frame_number', 0),
+    started = time.perf_counter()
+    update = await build_frame_update(client_id, frame, wanted)
+    # Ready-to-send messages for the dashboards' writers, and for later subscribers
+    await frame_encoder.serialize(update, dashboard_hub.frame_forms(client_id))
+    latest_frames[client_id] = update
+    _broadcast_to_dashboards(update, 'frame_update', client_id)
+    client_manager.record_stage_time(client_id, 'broadcast', time.perf_counter() - started)
+
+def snapshot_covers(update: FrameUpdate, frame: FrameRecord, wanted: dict) -> bool:
+    """Whether a frame update of `frame` has every wanted image the frame can produce (video aside)."""
+    if (update.frame_number, update.timestamp_ns) != (frame.frame_number, frame.timestamp_ns):
+        return False
+    client_id = update.client_id
+    producible = {
+        'rgb': frame.has_rgb,
+        'segmentation': (frame.has_rgb and segmentation_enabled.get(client_id, True)
+                         and client_id in segmentation_overlays),
+        'depth': frame.has_depth,
     }
-
-    # RGB + segmentation overlay
-    if 'rgb_image' in frame_data:
-        try:
-            msg['rgb_frame'] = encode_image_to_base64(frame_data['rgb_image'])
-            h, w = frame_data['rgb_image'].shape[:2]
-            msg['resolution'] = {'width': w, 'height': h}
-
-            if segmentation_enabled.get(client_id, True) and client_id in latest_segmentation_masks:
-                masks = latest_segmentation_masks[client_id]
-                if masks:
-                    try:
-                        msg['segmentation_frame'] = encode_image_to_base64(
-                            composite_rgb_with_masks(frame_data['rgb_image'], masks))
-                    except Exception as e:
-                        logger.error(f"Failed to composite segmentation: {e}")
-        except Exception as e:
-            logger.error(f"Failed to encode RGB image: {e}")
-
-    # Depth
-    if 'depth_map' in frame_data:
-        try:
-            msg['depth_frame'] = encode_depth_to_base64(frame_data['depth_map'])
-        except Exception as e:
-            logger.error(f"Failed to encode depth map: {e}")
-
-    # Camera matrices (flatten numpy arrays to lists)
-    if 'camera' in frame_data:
-        camera = frame_data['camera']
-        cam_msg: dict = {}
-        for key in ('pose_matrix', 'view_matrix', 'projection_matrix', 'intrinsic_matrix'):
-            if key in camera and camera[key] is not None:
-                cam_msg[key] = camera[key].flatten().tolist()
-        msg['camera'] = cam_msg
-        msg['tracking_state'] = camera.get('tracking_state', 0)
-
-    # Motion (already plain dicts)
-    if 'motion' in frame_data:
-        msg['motion'] = frame_data['motion']
-
-    latest_frames[client_id] = msg
-    await _broadcast_to_dashboards(json.dumps(msg))
+    return all(update.has_images(layer, {tier for tier in tiers if not tier.video})
+               for layer, tiers in wanted.items() if producible.get(layer))
+
+async def latest_frame_update(client_id: str):
+    """
+    The latest frame update of a client for a new subscriber.
+
+    The snapshot in latest_frames is sent as is when it already has every
+    wanted image (its serialized forms are cached, so this is one send of
+    existing bytes). Otherwise a local client's latest frame is rebuilt for
+    the current subscriptions; tiers that were already encoded come from the
+    encoder's memo, so only a tier or layer nobody watched before is encoded.
+    Clients of other workers fall back to the last relayed update.
+    """
+    current = latest_frames.get(client_id)
+    frame_buffer = client_manager.get_frame_buffer(client_id)
+    frame = frame_buffer.get_latest_frame() if frame_buffer else None
+    if frame is None:
+        return current
+    wanted = wanted_tiers(client_id)
+    if current is not None and snapshot_covers(current, frame, wanted):
+        return current
+    update = await build_frame_update(client_id, frame, wanted, video=False)
+    await frame_encoder.serialize(update, dashboard_hub.frame_forms(client_id))
+    # A newer frame may have been broadcast while this one was encoding
+    current = latest_frames.get(client_id)
+    if current is None or current.frame_number == update.frame_number:
+        latest_frames[client_id] = update
+    return update
 
 async def broadcast_segmentation_to_dashboards(client_id: str, encoded_masks: dict, prompt: str):
-    if not dashboard_connections:
+    if not wanted_tiers(client_id):
         return
-    await _broadcast_to_dashboards(json.dumps({
+    _broadcast_to_dashboards(json.dumps({
         'type': 'segmentation_update',
         'client_id': client_id,
         'masks': encoded_masks,
         'prompt': prompt,
-    }))
+    }), 'segmentation_update', client_id)
 
 
 # ============================================================
@@ -290,12 +319,79 @@ async def handle_segmentation_result(data: dict):
     if not segmentation_enabled.get(client_id, True):
         return
     encoded_masks = data.get('masks', {})
-    latest_segmentation_masks[client_id] = encoded_masks
+    # Decode the masks once here, on the encoder pool, rather than on every dashboard frame
+    overlay = await frame_encoder.run(SegmentationOverlay.from_encoded, encoded_masks)
+    if overlay is None:
+        segmentation_overlays.pop(client_id, None)
+    else:
+        segmentation_overlays[client_id] = overlay
     client_manager.increment_seg_output(client_id)
     logger.info(f"Segmentation result for {client_id}: {len(encoded_masks)} masks")
     await broadcast_segmentation_to_dashboards(client_id, encoded_masks, data.get('prompt', 'unknown'))
 
 
+# ============================================================
+#  Per-client commands (routed to the worker owning the client)
+# ============================================================
+
+async def _command_prompt(client_id: str, **kwargs):
+    await segmentation_client.send_prompt(client_id=client_id, **kwargs)
+
+async def _command_clear_masks(client_id: str):
+    await segmentation_client.clear_session(client_id)
+    segmentation_overlays.pop(client_id, None)
+
+async def _command_set_segmentation(client_id: str, enabled: bool):
+    segmentation_enabled[client_id] = enabled
+    await segmentation_client.clear_session(client_id)
+    segmentation_overlays.pop(client_id, None)
+
+CLIENT_COMMANDS = {
+    'prompt': _command_prompt,
+    'clear_masks': _command_clear_masks,
+    'set_segmentation': _command_set_segmentation,
+}
+
+async def run_client_command(command: str, client_id: str, **kwargs):
+    """Run a command here, or hand it to the worker holding the client's phone connection."""
+    owner = cluster.owner_of(client_id) if cluster.enabled else None
+    if owner is None:
+        await CLIENT_COMMANDS[command](client_id, **kwargs)
+    else:
+        cluster.publish('command', {'command': command, 'client_id': client_id, 'kwargs': kwargs}, to=owner)
+
+
+# ============================================================
+#  Cluster (multi-worker mode)
+# ============================================================
+
+async def _on_cluster_dashboard_message(header: dict, payload: bytes):
+    """Forward another worker's dashboard update to this worker's dashboards."""
+    if header['type'] == 'frame_update':
+        message = FrameUpdate.from_binary(payload, header.get('tiers'))
+        await frame_encoder.serialize(message, dashboard_hub.frame_forms(header['client_id']))
+        latest_frames[header['client_id']] = message
+    else:
+        message = payload.decode('utf-8')
+    dashboard_hub.broadcast(message, header['type'], header['client_id'])
+
+async def _on_cluster_command(header: dict, payload: bytes):
+    try:
+        await CLIENT_COMMANDS[header['command']](header['client_id'], **header.get('kwargs', {}))
+    except Exception as e:
+        logger.error(f"Command {header['command']} for {header['client_id']} failed: {e}")
+
+def _publish_stats_now():
+    cluster.publish('stats', {'clients': _local_client_rows(), 'dashboards': len(dashboard_hub),
+                              'subscriptions': dashboard_hub.subscriptions()})
+
+async def _publish_cluster_stats():
+    """Periodically share this worker's clients and dashboard count with the other workers."""
+    while True:
+        _publish_stats_now()
+        await asyncio.sleep(cluster.stats_interval_s)
+
+
 # ============================================================
 #  Playback helper
 # ============================================================
@@ -303,12 +399,12 @@ async def handle_segmentation_result(data: dict):
 def _make_playback_broadcast(playback_client_id: str):
     """Create a broadcast callback for playback frames."""
     async def broadcast_frame(ar_frame):
-        frame_data = extract_frame_data(ar_frame, playback_client_id)
+        frame = extract_frame_data(ar_frame, playback_client_id)
         frame_buffer = client_manager.get_frame_buffer(playback_client_id)
         if frame_buffer:
-            frame_buffer.add_frame(frame_data)
+            frame_buffer.add_frame(frame)
             client_manager.update_last_frame_time(playback_client_id)
-        await broadcast_frame_to_dashboards(playback_client_id, frame_data)
+        await broadcast_frame_to_dashboards(playback_client_id, frame)
     return broadcast_frame
 
 
@@ -316,8 +412,52 @@ def _make_playback_broadcast(playback_client_id: str):
 #  WebSocket: AR stream (phone -> server)
 # ============================================================
 
+async def _receive_frames(websocket: WebSocket, pending: asyncio.Queue,
+                          in_flight: asyncio.Semaphore, temp_client_id: str, batched: bool):
+    """Read raw ARFrame / ARFrameBatch bytes from the phone and hand them to the frame decoder."""
+    try:
+        while True:
+            data = await websocket.receive_bytes()
+            await in_flight.acquire()
+            pending.put_nowait((time.perf_counter(), frame_decoder.submit(data, temp_client_id, batched)))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Receive error for {temp_client_id}: {e}")
+    finally:
+        # Wake the consumer so the endpoint can clean up
+        pending.put_nowait(None)
+
+
+async def _send_flow_control(websocket: WebSocket, client_id: str, pipeline: ClientPipeline):
+    """Periodically tell the phone what frame rate / quality the server can keep up with."""
+    controller = FlowController(flow_settings)
+    while True:
+        await asyncio.sleep(controller.interval_s)
+        frame_buffer = client_manager.get_frame_buffer(client_id)
+        if frame_buffer is None:
+            return
+        ingest = client_manager.get_stage_timings(client_id).get('ingest', {})
+        message = controller.update(
+            frames_received=frame_buffer.frames_received,
+            dropped={stage: stats['dropped'] for stage, stats in pipeline.get_stats().items()},
+            ingest_ms=ingest.get('recent_ms', 0.0),
+            dashboard_layers=set(wanted_tiers(client_id)),
+            segmentation_active=segmentation_enabled.get(client_id, True),
+        )
+        if message is not None:
+            try:
+                await websocket.send_text(json.dumps(message))
+            except Exception:
+                return
+
+
 @app.websocket("/ar-stream")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, batched: bool = False):
+    """
+    Query params:
+        batched: if set, every message is an ARFrameBatch instead of an ARFrame
+    """
     temp_client_id = f"{websocket.client.host}:{websocket.client.port}"
     client_id = temp_client_id
     device_id = None
@@ -341,23 +481,39 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception:
         pass
 
+    # Raw bytes are decoded on the frame decoder pool while the next message is
+    # received. Results are consumed in arrival order; the semaphore bounds how
+    # many frames of this client can be in flight at once.
+    pending: asyncio.Queue = asyncio.Queue()
+    in_flight = asyncio.Semaphore(frame_decoder.max_in_flight_per_client)
+    receiver = asyncio.create_task(_receive_frames(websocket, pending, in_flight, temp_client_id, batched))
+    # Decoded frames are handed to bounded per-stage queues (see frame_pipeline);
+    # with the 'block' policy a full queue stalls this loop and thus the phone.
+    pipeline = None
+    flow_task = None
+
     try:
-        frame_count = 0
         while True:
-            data = await websocket.receive_bytes()
-            frame_count += 1
-
-            ar_frame = ar_stream_pb2.ARFrame()
+            item = await pending.get()
+            if item is None:
+                break
+            submitted_at, decode_future = item
             try:
-                ar_frame.ParseFromString(data)
+                result, timings = await decode_future
             except Exception as e:
-                logger.error(f"Failed to parse protobuf from {temp_client_id}: {e}")
+                logger.error(f"Failed to decode frame from {temp_client_id}: {e}")
                 continue
+            finally:
+                in_flight.release()
+            if batched:
+                message_device_id, frames, motion = result
+            else:
+                message_device_id, frames, motion = result.device_id, (result,), None
 
-            # Register client on first frame
-            if frame_count == 1:
-                if ar_frame.device_id:
-                    device_id = ar_frame.device_id
+            # Register client on first message
+            if pipeline is None:
+                if message_device_id:
+                    device_id = message_device_id
                     old_client = client_manager.find_client_by_device_id(device_id)
                     if old_client:
                         client_manager.remove_client(old_client)
@@ -365,35 +521,60 @@ async def websocket_endpoint(websocket: WebSocket):
                 else:
                     client_id = temp_client_id
                 client_manager.add_client(client_id, websocket, device_id=device_id, connection_info=temp_client_id)
-
-            frame_data = extract_frame_data(ar_frame, client_id)
-
-            # Buffer frame
+                pipeline = ClientPipeline(client_id, {
+                    'broadcast': lambda f: broadcast_frame_to_dashboards(client_id, f),
+                    'segmentation': lambda f: send_frame_to_segmentation(client_id, f),
+                }, stage_settings)
+                client_pipelines[client_id] = pipeline
+                if flow_settings['enabled']:
+                    flow_task = asyncio.create_task(_send_flow_control(websocket, client_id, pipeline))
+            for frame in frames:
+                frame.client_id = client_id
+
+            for stage, seconds in timings.items():
+                client_manager.record_stage_time(client_id, stage, seconds)
+            client_manager.record_stage_time(client_id, 'ingest', time.perf_counter() - submitted_at)
+
+            # Buffer frames and motion samples in bulk
             frame_buffer = client_manager.get_frame_buffer(client_id)
             if frame_buffer:
-                frame_buffer.add_frame(frame_data)
+                if frames:
+                    frame_buffer.add_frames(frames)
+                if motion is not None:
+                    frame_buffer.add_motion_samples(motion)
                 client_manager.update_last_frame_time(client_id)
 
-            # Segmentation (throttled)
-            if 'rgb_image' in frame_data and segmentation_enabled.get(client_id, True):
-                now = asyncio.get_event_loop().time()
-                if now - last_segmentation_time.get(client_id, 0) >= SEGMENTATION_FRAME_INTERVAL:
-                    last_segmentation_time[client_id] = now
-                    asyncio.create_task(segmentation_client.send_frame(
-                        client_id, frame_data['rgb_image'], ar_frame.frame_number))
-                    client_manager.increment_seg_request(client_id)
+            # Only the newest frame of a batch goes on to the consumers
+            if not frames:
+                continue
+            frame = frames[-1]
+
+            # Segmentation, at the rate the segmentation server grants credits for
+            if (frame.has_rgb and segmentation_enabled.get(client_id, True)
+                    and segmentation_client.wants_frame(client_id)):
+                await pipeline.put('segmentation', frame)
 
-            # Broadcast to dashboards
-            if dashboard_connections:
-                asyncio.create_task(broadcast_frame_to_dashboards(client_id, frame_data))
+            # Broadcast to subscribed dashboards
+            if wanted_tiers(client_id):
+                await pipeline.put('broadcast', frame)
 
     except WebSocketDisconnect:
         pass
     except Exception as e:
         logger.error(f"Error for client {client_id}: {e}", exc_info=True)
     finally:
+        receiver.cancel()
+        if flow_task is not None:
+            flow_task.cancel()
+        if pipeline is not None:
+            if client_pipelines.get(client_id) is pipeline:
+                del client_pipelines[client_id]
+            await pipeline.close()
         client_manager.remove_client(client_id)
-        for d in (segmentation_enabled, last_segmentation_time, latest_segmentation_masks):
+        frame_encoder.forget(client_id)
+        video_streams.forget(client_id)
+        segmentation_client.latency.forget(client_id)
+        for d in (segmentation_enabled, segmentation_overlays):
             d.pop(client_id, None)
 
 
@@ -402,31 +583,52 @@ async def websocket_endpoint(websocket: WebSocket):
 # ============================================================
 
 @app.websocket("/ws/dashboard")
-async def dashboard_websocket(websocket: WebSocket):
+async def dashboard_websocket(websocket: WebSocket, protocol: int = PROTOCOL_JSON):
     await websocket.accept()
-    dashboard_connections.add(websocket)
-    logger.info(f"Dashboard connected. Total: {len(dashboard_connections)}")
+    if protocol not in PROTOCOLS:
+        protocol = PROTOCOL_JSON
+    connection = dashboard_hub.add(websocket, protocol)
+    logger.info(f"Dashboard connected (protocol {protocol}). Total: {len(dashboard_hub)}")
 
     try:
-        while True:
+        # Sends run on the connection's writer task; this loop only wakes when the dashboard sends something
+        async for message in websocket.iter_text():
+            connection.received()
             try:
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=0.1)
                 data = json.loads(message)
-                if data.get('action') == 'subscribe':
-                    subscribed_client = data.get('client_id')
-                    if subscribed_client in latest_frames:
-                        await websocket.send_text(json.dumps(latest_frames[subscribed_client]))
-            except asyncio.TimeoutError:
-                pass
             except json.JSONDecodeError:
-                pass
-            await asyncio.sleep(0.1)
+                continue
+            action = data.get('action')
+            if action == 'subscribe':
+                # client_ids replaces the subscription set; client_id adds one client
+                subscription = Subscription.from_message(data, dashboard_hub.settings)
+                if subscription.video and (protocol != PROTOCOL_BINARY or not video_streams.available):
+                    # Video needs binary messages and PyAV; fall back to JPEG frames
+                    subscription.video = False
+                if 'client_ids' in data:
+                    added = connection.subscribe(data['client_ids'], subscription, replace=True)
+                elif data.get('client_id'):
+                    added = connection.subscribe([data['client_id']], subscription)
+                else:
+                    added = []
+                for subscribed_client in added:
+                    update = await latest_frame_update(subscribed_client)
+                    if update is not None:
+                        connection.enqueue(update, 'frame_update', subscribed_client)
+                # Let the other workers start encoding without waiting for the next stats tick
+                _publish_stats_now()
+            elif action == 'unsubscribe':
+                connection.unsubscribe(data.get('client_id'))
+                _publish_stats_now()
+            elif action == 'ping':
+                connection.enqueue(json.dumps({'type': 'pong', 't': data.get('t')}), 'pong')
     except WebSocketDisconnect:
         pass
     except Exception as e:
         logger.error(f"Dashboard WebSocket error: {e}", exc_info=True)
     finally:
-        dashboard_connections.discard(websocket)
+        await dashboard_hub.remove(websocket)
+        _publish_stats_now()
 
 
 # ============================================================
@@ -448,13 +650,13 @@ async def segmentation_websocket(websocket: WebSocket):
                 client_id = data.get('client_id')
 
                 if msg_type in ('add_text_prompt', 'add_point_prompt'):
-                    kwargs = {'client_id': client_id}
+                    kwargs = {}
                     if msg_type == 'add_text_prompt':
                         kwargs['text'] = data.get('text')
                     else:
                         kwargs['points'] = data.get('points')
                         kwargs['labels'] = data.get('labels')
-                    await segmentation_client.send_prompt(**kwargs)
+                    await run_client_command('prompt', client_id, **kwargs)
                     await websocket.send_text(json.dumps({
                         'type': 'segmentation_queued',
                         'client_id': client_id,
@@ -462,8 +664,7 @@ async def segmentation_websocket(websocket: WebSocket):
                     }))
 
                 elif msg_type == 'clear_masks':
-                    await segmentation_client.clear_session(client_id)
-                    latest_segmentation_masks.pop(client_id, None)
+                    await run_client_command('clear_masks', client_id)
                     await websocket.send_text(json.dumps({'type': 'masks_cleared', 'client_id': client_id}))
 
                 elif msg_type == 'get_status':
@@ -486,8 +687,8 @@ async def segmentation_websocket(websocket: WebSocket):
 #  REST API
 # ============================================================
 
-@app.get("/api/clients")
-async def get_clients():
+def _local_client_rows() -> list:
+    """Stats rows for the clients connected to this worker."""
     clients_data = []
     for client_id in client_manager.get_all_clients():
         buffer = client_manager.get_frame_buffer(client_id)
@@ -497,17 +698,48 @@ async def get_clients():
             clients_data.append({
                 'client_id': stats['client_id'],
                 'frame_count': stats['frames_received'],
+                'motion_samples': stats['motion_samples_received'],
                 'current_fps': round(stats['avg_fps_received'], 1),
                 'buffer_size': stats['buffer_size'],
+                'buffer_bytes': stats['buffer_bytes'],
                 'max_buffer_size': stats['max_size'],
                 'depth_percentage': stats['depth_percentage'],
                 'frames_with_depth': stats['frames_with_depth'],
                 'frames_without_depth': stats['frames_without_depth'],
                 'seg_requests_sent': seg['seg_requests_sent'],
                 'seg_outputs_received': seg['seg_outputs_received'],
+                'stage_timings': client_manager.get_stage_timings(client_id),
+                'segmentation_latency': segmentation_client.latency.get_stats(client_id),
+                'pipeline': client_pipelines[client_id].get_stats() if client_id in client_pipelines else {},
+                'worker': cluster.worker_id,
             })
+    return clients_data
+
+@app.get("/api/clients")
+async def get_clients():
+    clients_data = _local_client_rows()
+    if cluster.enabled:
+        clients_data += cluster.remote_clients()
     return {"clients": clients_data, "count": len(clients_data)}
 
+@app.get("/api/clients/{client_id}/motion")
+async def get_client_motion(client_id: str, since_ns: Optional[int] = None):
+    """High-rate motion samples buffered for a client on this worker (newer than since_ns if given)"""
+    buffer = client_manager.get_frame_buffer(client_id)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail=f"Unknown client: {client_id}")
+    timestamps, values, masks = buffer.get_motion_samples(since_ns)
+    return {"client_id": client_id,
+            "fields": [{"name": name, "offset": offset, "size": size} for name, offset, size in MOTION_LAYOUT],
+            "timestamps_ns": timestamps.tolist(), "values": values.tolist(), "masks": masks.tolist()}
+
+@app.get("/api/metrics/segmentation")
+async def get_segmentation_metrics():
+    """Rolling segmentation latency percentiles (ms) and throughput per client on this worker."""
+    return {"clients": segmentation_client.latency.get_all_stats(),
+            "window_s": segmentation_client.latency.settings['metrics_window_s'],
+            "worker": cluster.worker_id}
+
 @app.get("/api/health")
 async def health_check():
     seg_status = await segmentation_client.get_status()
@@ -515,19 +747,25 @@ async def health_check():
         "version": "split-service",
         "main_server": "running",
         "segmentation_server": "connected" if seg_status.get("connected") else "disconnected",
-        "active_clients": len(client_manager.get_all_clients()),
-        "dashboard_connections": len(dashboard_connections),
+        "active_clients": len(client_manager.get_all_clients()) + (len(cluster.remote_clients()) if cluster.enabled else 0),
+        "dashboard_connections": len(dashboard_hub) + (cluster.remote_dashboards() if cluster.enabled else 0),
+        "workers": cluster.worker_count(),
+        "cluster_dropped": cluster.dropped,
     }
 
+@app.get("/api/dashboards")
+async def get_dashboards():
+    """Per-connection send stats for this worker's dashboards."""
+    return {"dashboards": dashboard_hub.get_stats(), "count": len(dashboard_hub),
+            "encoder": frame_encoder.get_stats(),
+            "video": {"available": video_streams.available, "streams": len(video_streams)}}
+
 @app.post("/api/segmentation/enable")
 async def api_enable_segmentation(request: dict):
     client_id = request.get("client_id")
     if not client_id:
         raise HTTPException(status_code=400, detail="Missing client_id")
-    segmentation_enabled[client_id] = True
-    last_segmentation_time[client_id] = 0
-    await segmentation_client.clear_session(client_id)
-    latest_segmentation_masks.pop(client_id, None)
+    await run_client_command('set_segmentation', client_id, enabled=True)
     logger.info(f"Segmentation enabled for {client_id}")
     return {"status": "enabled", "client_id": client_id}
 
@@ -536,10 +774,7 @@ async def api_disable_segmentation(request: dict):
     client_id = request.get("client_id")
     if not client_id:
         raise HTTPException(status_code=400, detail="Missing client_id")
-    segmentation_enabled[client_id] = False
-    last_segmentation_time.pop(client_id, None)
-    await segmentation_client.clear_session(client_id)
-    latest_segmentation_masks.pop(client_id, None)
+    await run_client_command('set_segmentation', client_id, enabled=False)
     logger.info(f"Segmentation disabled for {client_id}")
     return {"status": "disabled", "client_id": client_id}
 
@@ -610,5 +845,13 @@ else:
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host=config['server']['host'], port=config['server']['port'], log_level="info")
+    if cluster.workers > 1:
+        # Workers inherit the hub address through the environment
+        start_hub(cluster.socket_path)
+        os.environ[ENV_SOCKET] = cluster.socket_path
+        uvicorn.run("main:app", host=config['server']['host'], port=config['server']['port'],
+                    workers=cluster.workers, log_level="info")
+    else:
+        uvicorn.run(app, host=config['server']['host'], port=config['server']['port'], log_level="info")
@@ -1,7 +1,11 @@
 """
 Client for communicating with the segmentation server (v2.0 API)
-Uses binary protobuf over WebSocket for video streaming
-HTTP for session management and prompts
+All sessions share one multiplexed WebSocket (/segment/channel) carrying
+binary protobuf envelopes: frames and results routed by session_id, and
+session start / prompt / delete as control messages answered by request_id.
+HTTP is only used for the status endpoint. Frames are flow controlled by
+credits the segmentation server grants per session: a frame is only sent while
+its session holds one.
 """
 
 import asyncio
@@ -11,85 +15,148 @@ import numpy as np
 import cv2
 import sys
 from pathlib import Path
-from typing import Optional, Callable, Dict
+from typing import Awaitable, Optional, Callable, Dict, Tuple
 
 # Add proto directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 from proto import ar_stream_pb2
 
+from buffer.frame_record import FrameRecord
+from segmentation_metrics import SegmentationLatency
+
 logger = logging.getLogger(__name__)
 
 
-class SessionConnection:
-    """Represents a single session's WebSocket connection"""
+# Overridable in the `segmentation` section of config.yaml
+SEGMENTATION_DEFAULTS = {
+    'max_width': 0,       # Downscale frames wider than this before sending (0: full resolution)
+    'jpeg_quality': 85,   # Quality of frames that have to be (re-)encoded
+    'session_retry_s': 1.0,       # Wait after a failed session start before trying again...
+    'session_retry_max_s': 30.0,  # ...doubling per consecutive failure up to this
+    'credit_timeout_s': 5.0,      # Send one frame without credit after this long, in case a grant was lost
+}
+
+
+def load_segmentation_settings(config: dict) -> dict:
+    """Merge the `segmentation` section of config.yaml over SEGMENTATION_DEFAULTS"""
+    return {**SEGMENTATION_DEFAULTS, **(config.get('segmentation') or {})}
+
+
+def encode_jpeg(rgb_frame: np.ndarray, max_width: int, quality: int) -> Tuple[bytes, int, int, int]:
+    """
+    (data, width, height, quality) of an RGB frame as JPEG, downscaled to max_width.
+
+    Module-level so it can run in an encoder worker process.
+    """
+    # RGBA payloads decode to a strided view, which OpenCV cannot take
+    rgb_frame = np.ascontiguousarray(rgb_frame)
+    height, width = rgb_frame.shape[:2]
+    if max_width and width > max_width:
+        height = max(1, round(height * max_width / width))
+        width = max_width
+        rgb_frame = cv2.resize(rgb_frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+    _, jpeg_data = cv2.imencode('.jpg', bgr_frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return jpeg_data.tobytes(), width, height, quality
+
+
+class SegmentationChannel:
+    """The multiplexed WebSocket to the segmentation server, shared by all sessions"""
 
-    def __init__(self, session_id: str, client_id: str, ws: aiohttp.ClientWebSocketResponse):
-        self.session_id = session_id
-        self.client_id = client_id  # Original client_id for this session
+    def __init__(self, ws: aiohttp.ClientWebSocketResponse):
         self.ws = ws
         self.listen_task: Optional[asyncio.Task] = None
-        self.callback: Optional[Callable] = None
+        self._send_lock = asyncio.Lock()  # Frames of different phones are sent from separate tasks
+        self._next_request_id = 0
+        self._replies: Dict[int, asyncio.Future] = {}  # request_id -> Future of the SegmentationControlReply
+        self._late: Dict[int, int] = {}  # request_id -> action, of requests that timed out before their reply
 
-    async def start_listening(self, callback: Callable):
-        """Start listening for results on this connection"""
-        self.callback = callback
-        self.listen_task = asyncio.create_task(self._listen())
+    @property
+    def closed(self) -> bool:
+        return self.ws.closed
 
-    async def _listen(self):
-        """Listen for segmentation results"""
+    async def start_listening(
+        self,
+        on_output: Callable[[ar_stream_pb2.SegmentationOutput], Awaitable],
+        on_reply: Callable[[ar_stream_pb2.SegmentationControlReply, Optional[int]], None],
+        on_credit: Callable[[ar_stream_pb2.SegmentationCredit], None],
+        on_close: Callable[['SegmentationChannel'], None]
+    ):
+        """Start listening for results, replies and credits on this channel"""
+        self.listen_task = asyncio.create_task(self._listen(on_output, on_reply, on_credit, on_close))
+
+    async def _listen(self, on_output, on_reply, on_credit, on_close):
+        """
+        Route results to on_output and replies to their request. Unsolicited
+        replies go to on_reply, as do late ones with the action they answer.
+        """
         try:
             async for msg in self.ws:
                 if msg.type == aiohttp.WSMsgType.BINARY:
                     try:
-                        output = ar_stream_pb2.SegmentationOutput()
-                        output.ParseFromString(msg.data)
-
-                        # Convert to dict format - use original client_id, not session_id
-                        result_dict = {
-                            "type": "segmentation_result",
-                            "client_id": self.client_id,  # Original client_id
-                            "session_id": output.session_id,
-                            "frame_number": output.frame_number,
-                            "timestamp_ms": output.timestamp_ms,
-                            "prompt": output.prompt_type,
-                            "num_objects": output.num_objects,
-                            "masks": {}
-                        }
-
-                        # Decode masks
-                        for mask in output.masks:
-                            mask_base64 = mask.mask_data.decode('utf-8')
-                            result_dict["masks"][str(mask.object_id)] = mask_base64
-
-                        # Call callback
-                        if self.callback:
-                            try:
-                                await self.callback(result_dict)
-                            except Exception as e:
-                                logger.error(f"Error in result callback: {e}", exc_info=True)
+                        envelope = ar_stream_pb2.SegmentationEnvelope()
+                        envelope.ParseFromString(msg.data)
+                        payload = envelope.WhichOneof('payload')
+
+                        if payload == 'output':
+                            await on_output(envelope.output)
+                        elif payload == 'credit':
+                            on_credit(envelope.credit)
+                        elif payload == 'reply':
+                            future = self._replies.get(envelope.reply.request_id)
+                            if future is None:
+                                on_reply(envelope.reply, self._late.pop(envelope.reply.request_id, None))
+                            elif not future.done():
+                                future.set_result(envelope.reply)
 
                     except Exception as e:
-                        logger.error(f"Error parsing SegmentationOutput: {e}", exc_info=True)
+                        logger.error(f"Error parsing SegmentationEnvelope: {e}", exc_info=True)
 
                 elif msg.type == aiohttp.WSMsgType.ERROR:
                     logger.error(f"WebSocket error: {msg.data}")
                     break
                 elif msg.type == aiohttp.WSMsgType.CLOSE:
-                    logger.info(f"WebSocket close for session {self.session_id}")
+                    logger.info("Segmentation channel closed by the server")
                     break
 
         except asyncio.CancelledError:
-            logger.info(f"WebSocket listener cancelled for {self.session_id}")
+            logger.info("Segmentation channel listener cancelled")
         except Exception as e:
             logger.error(f"Error listening for results: {e}", exc_info=True)
-
-    async def send_frame(self, request: ar_stream_pb2.SegmentationRequest):
-        """Send a frame via this WebSocket"""
-        if self.ws and not self.ws.closed:
-            await self.ws.send_bytes(request.SerializeToString())
+        finally:
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Segmentation channel closed"))
+            on_close(self)
+
+    async def send(self, envelope: ar_stream_pb2.SegmentationEnvelope):
+        """Send an envelope via this WebSocket"""
+        if self.ws.closed:
+            raise ConnectionError("Segmentation channel closed")
+        data = envelope.SerializeToString()
+        async with self._send_lock:
+            await self.ws.send_bytes(data)
+
+    async def request(self, envelope: ar_stream_pb2.SegmentationEnvelope,
+                      timeout: float) -> ar_stream_pb2.SegmentationControlReply:
+        """Send a control envelope and wait for its reply"""
+        self._next_request_id = self._next_request_id % 0xFFFFFFFF + 1  # 0 marks unsolicited replies
+        request_id = envelope.control.request_id = self._next_request_id
+        future = self._replies[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self.send(envelope)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._late[request_id] = envelope.control.action
+            raise
+        finally:
+            del self._replies[request_id]
 
     async def close(self):
         """Close this connection"""
+        if not self.ws.closed:
+            await self.ws.close()
         if self.listen_task:
             self.listen_task.cancel()
             try:
@@ -97,24 +164,32 @@ class SessionConnection:
             except asyncio.CancelledError:
                 pass
 
-        if self.ws and not self.ws.closed:
-            await self.ws.close()
-
 
 class SegmentationClient:
     """Client for communicating with segmentation server v2.0"""
 
-    def __init__(self, segmentation_host: str = "http://127.0.0.1:8081"):
+    def __init__(self, segmentation_host: str = "http://127.0.0.1:8081", settings: Optional[dict] = None):
         self.host = segmentation_host
+        self.settings = {**SEGMENTATION_DEFAULTS, **(settings or {})}
+        self.latency = SegmentationLatency(self.settings)
         self.ws_url = segmentation_host.replace("http://", "ws://").replace("https://", "wss://")
         self.session: Optional[aiohttp.ClientSession] = None
         self.is_connected = False
         self._retry_task: Optional[asyncio.Task] = None
         self.result_callback: Optional[Callable] = None
+        self.run_encode: Optional[Callable[..., Awaitable]] = None  # Runs JPEG encodes off the event loop
 
-        # Per-session WebSocket connections
+        # One multiplexed WebSocket for all sessions
+        self.channel: Optional[SegmentationChannel] = None
         self.client_id_to_session: Dict[str, str] = {}  # client_id -> session_id
-        self.session_connections: Dict[str, SessionConnection] = {}  # session_id -> SessionConnection
+        self.session_to_client: Dict[str, str] = {}  # session_id -> client_id
+        # Frame credits granted by the segmentation server
+        self._credits: Dict[str, int] = {}  # session_id -> frames that may be sent
+        self._last_sent: Dict[str, float] = {}  # session_id -> loop time of the last frame sent
+        # Session starts in flight, shared by every caller for the client
+        self._pending_sessions: Dict[str, asyncio.Task] = {}  # client_id -> Task -> session_id
+        # client_id -> (loop time before which starts are not retried, last wait in s, error)
+        self._session_failures: Dict[str, Tuple[float, float, str]] = {}
 
     async def connect(self):
         """Connect to segmentation server"""
@@ -127,6 +202,7 @@ class SegmentationClient:
             async with self.session.get(f"{self.host}/segment/status", timeout=timeout) as resp:
                 if resp.status == 200:
                     status = await resp.json()
+                    await self._open_channel()
                     logger.info(f"✓ Connected to segmentation server: {status}")
                     self.is_connected = True
                 else:
@@ -142,6 +218,10 @@ class SegmentationClient:
 
         # Start background retry if connection failed
         if not self.is_connected:
+            self._start_retry()
+
+    def _start_retry(self):
+        if self._retry_task is None or self._retry_task.done():
             self._retry_task = asyncio.create_task(self._retry_connection())
 
     async def _retry_connection(self):
@@ -154,6 +234,7 @@ class SegmentationClient:
                     self.session = aiohttp.ClientSession()
                 async with self.session.get(f"{self.host}/segment/status", timeout=timeout) as resp:
                     if resp.status == 200:
+                        await self._open_channel()
                         self.is_connected = True
                         logger.info("✓ Reconnected to segmentation server")
                         return
@@ -161,100 +242,276 @@ class SegmentationClient:
                 pass  # Keep retrying silently
 
     async def _ensure_session(self, client_id: str) -> str:
-        """Ensure a session exists for this client_id, create if needed"""
+        """
+        Ensure a session exists for this client_id, create if needed.
+
+        Concurrent callers for a client share one session start. After a
+        failed start, callers get the cached error until the backoff expires.
+        """
         if client_id in self.client_id_to_session:
             return self.client_id_to_session[client_id]
 
-        if not self.is_connected or not self.session:
+        if not self.is_connected or self.channel is None:
             raise RuntimeError("Segmentation server not connected")
 
+        task = self._pending_sessions.get(client_id)
+        if task is None:
+            failure = self._session_failures.get(client_id)
+            if failure is not None:
+                retry_at, _, error = failure
+                wait_s = retry_at - asyncio.get_running_loop().time()
+                if wait_s > 0:
+                    raise RuntimeError(f"Session start failed ({error}), retrying in {wait_s:.1f}s")
+            task = asyncio.create_task(self._start_session(client_id))
+            self._pending_sessions[client_id] = task
+            task.add_done_callback(lambda t: self._session_started(client_id, t))
+        # A caller that is cancelled must not cancel the start for the others
+        return await asyncio.shield(task)
+
+    def _session_started(self, client_id: str, task: asyncio.Task):
+        if self._pending_sessions.get(client_id) is task:
+            del self._pending_sessions[client_id]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller was cancelled
+
+    async def _start_session(self, client_id: str) -> str:
+        """Create a session, recording a failure for the backoff"""
         try:
-            # Create new session
-            async with self.session.post(
-                f"{self.host}/segment/session/start",
-                timeout=aiohttp.ClientTimeout(total=5)
-            ) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    session_id = result["session_id"]
-                    self.client_id_to_session[client_id] = session_id
-                    logger.info(f"✓ Created session {session_id} for client {client_id}")
-
-                    # Connect WebSocket for this session
-                    await self._connect_websocket(session_id, client_id)
-
-                    return session_id
-                else:
-                    raise RuntimeError(f"Failed to create session: {resp.status}")
-
+            session_id = await self._create_session(client_id)
         except Exception as e:
-            logger.error(f"Error creating session: {e}")
+            _, last_wait_s, _ = self._session_failures.get(client_id, (0.0, 0.0, ''))
+            wait_s = min(last_wait_s * 2 or self.settings['session_retry_s'], self.settings['session_retry_max_s'])
+            self._session_failures[client_id] = (
+                asyncio.get_running_loop().time() + wait_s, wait_s, str(e) or type(e).__name__)
+            logger.error(f"Error creating session for {client_id} (retry in {wait_s:.1f}s): {e}")
             raise
-
-    async def _connect_websocket(self, session_id: str, client_id: str):
-        """Connect WebSocket for a session"""
+        self._session_failures.pop(client_id, None)
+        return session_id
+
+    async def _create_session(self, client_id: str) -> str:
+        # Create new session
+        reply = await self._control(ar_stream_pb2.SegmentationControl.START_SESSION, timeout=5)
+        if reply.status != 200:
+            raise RuntimeError(f"Failed to create session: {reply.status} {reply.error}")
+        session_id = reply.session_id
+
+        self.client_id_to_session[client_id] = session_id
+        self.session_to_client[session_id] = client_id
+        logger.info(f"✓ Created session {session_id} for client {client_id}")
+        return session_id
+
+    async def _delete_session(self, session_id: str) -> bool:
+        """Delete a session on the server; whether it succeeded"""
         try:
-            timeout = aiohttp.ClientTimeout(total=5)
-            ws = await self.session.ws_connect(
-                f"{self.ws_url}/segment/stream?session_id={session_id}",
-                timeout=timeout
-            )
-
-            # Create session connection wrapper with original client_id
-            conn = SessionConnection(session_id, client_id, ws)
-            self.session_connections[session_id] = conn
+            reply = await self._control(ar_stream_pb2.SegmentationControl.DELETE_SESSION, timeout=5,
+                                        session_id=session_id)
+            return reply.status == 200
+        except Exception as e:
+            logger.error(f"Error deleting session {session_id}: {e}")
+            return False
 
-            # Start listening
-            await conn.start_listening(self.result_callback)
+    async def _control(self, action: int, timeout: float, **fields) -> ar_stream_pb2.SegmentationControlReply:
+        """Send a control message on the channel and wait for its reply"""
+        if self.channel is None:
+            raise RuntimeError("Segmentation server not connected")
+        envelope = ar_stream_pb2.SegmentationEnvelope()
+        envelope.control.action = action
+        for name, value in fields.items():
+            if isinstance(value, list):
+                getattr(envelope.control, name).extend(value)
+            else:
+                setattr(envelope.control, name, value)
+        return await self.channel.request(envelope, timeout)
+
+    async def _open_channel(self):
+        """Connect the multiplexed WebSocket"""
+        timeout = aiohttp.ClientTimeout(total=5)
+        ws = await self.session.ws_connect(f"{self.ws_url}/segment/channel", timeout=timeout)
+        self.channel = SegmentationChannel(ws)
+        await self.channel.start_listening(self._on_output, self._on_reply, self._on_credit, self._on_channel_closed)
+        # The server forgets credits with the old channel; one frame re-attaches a session and earns new ones
+        for session_id in self.session_to_client:
+            self._credits[session_id] = 1
+        logger.info("✓ Segmentation channel connected")
+
+    def _on_channel_closed(self, channel: SegmentationChannel):
+        if self.channel is not channel:
+            return
+        self.channel = None
+        if self.is_connected:
+            # The server keeps the sessions: frames re-attach them after the reconnect
+            logger.warning("⚠ Segmentation channel lost - will reconnect in background")
+            self.is_connected = False
+            self._start_retry()
 
-            logger.info(f"✓ WebSocket connected for session {session_id} (client: {client_id})")
+    def _on_reply(self, reply: ar_stream_pb2.SegmentationControlReply, action: Optional[int] = None):
+        """
+        A reply the server sent unasked (a frame was for a session it no longer
+        has), or one that came after its request timed out (action is set)
+        """
+        if action == ar_stream_pb2.SegmentationControl.START_SESSION:
+            # The start already failed for its callers: delete the session instead of leaking it
+            if reply.status == 200 and reply.session_id not in self.session_to_client:
+                logger.warning(f"Deleting segmentation session {reply.session_id} started after its timeout")
+                asyncio.create_task(self._delete_session(reply.session_id))
+            return
+        if action is None and reply.status == 404 and reply.session_id in self.session_to_client:
+            client_id = self.session_to_client.pop(reply.session_id)
+            if self.client_id_to_session.get(client_id) == reply.session_id:
+                del self.client_id_to_session[client_id]
+            self._forget_credits(reply.session_id)
+            logger.warning(f"Segmentation session {reply.session_id} of {client_id} is gone; starting a new one")
+
+    def _on_credit(self, credit: ar_stream_pb2.SegmentationCredit):
+        self._credits[credit.session_id] = self._credits.get(credit.session_id, 0) + credit.credits
+
+    def _forget_credits(self, session_id: str):
+        self._credits.pop(session_id, None)
+        self._last_sent.pop(session_id, None)
+
+    def _may_send(self, session_id: str, now: float) -> bool:
+        """Whether a session holds credit, or has waited so long for it that a grant was probably lost"""
+        return (self._credits.get(session_id, 0) > 0
+                or now - self._last_sent.get(session_id, float('-inf')) >= self.settings['credit_timeout_s'])
+
+    def wants_frame(self, client_id: str) -> bool:
+        """Whether send_frame would send a frame of this client now (so it is worth queueing one)"""
+        if not self.is_connected:
+            return False
+        now = asyncio.get_running_loop().time()
+        session_id = self.client_id_to_session.get(client_id)
+        if session_id is None:
+            # A frame starts the session, unless the last start failed and is backing off
+            failure = self._session_failures.get(client_id)
+            return failure is None or failure[0] <= now
+        return self._may_send(session_id, now)
+
+    def _take_credit(self, session_id: str) -> bool:
+        now = asyncio.get_running_loop().time()
+        if not self._may_send(session_id, now):
+            return False
+        if self._credits.get(session_id, 0) > 0:
+            self._credits[session_id] -= 1
+        self._last_sent[session_id] = now
+        return True
+
+    async def _on_output(self, output: ar_stream_pb2.SegmentationOutput):
+        client_id = self.session_to_client.get(output.session_id)
+        if client_id is None:
+            return
+        self.latency.on_result(client_id, output, asyncio.get_running_loop().time() * 1000)
+        if not self.result_callback:
+            return
 
+        # Convert to dict format - use original client_id, not session_id
+        result_dict = {
+            "type": "segmentation_result",
+            "client_id": client_id,  # Original client_id
+            "session_id": output.session_id,
+            "frame_number": output.frame_number,
+            "timestamp_ms": output.timestamp_ms,
+            "prompt": output.prompt_type,
+            "num_objects": output.num_objects,
+            "masks": {}
+        }
+
+        # Decode masks
+        for mask in output.masks:
+            mask_base64 = mask.mask_data.decode('utf-8')
+            result_dict["masks"][str(mask.object_id)] = mask_base64
+
+        # Call callback
+        try:
+            await self.result_callback(result_dict)
         except Exception as e:
-            logger.error(f"✗ Failed to connect WebSocket: {e}")
-            raise
+            logger.error(f"Error in result callback: {e}", exc_info=True)
+
+    def configure(self, settings: dict):
+        """Apply settings from config.yaml (see SEGMENTATION_DEFAULTS)"""
+        self.settings = {**SEGMENTATION_DEFAULTS, **settings}
+        self.latency = SegmentationLatency(self.settings)
+
+    def needs_reencode(self, frame: FrameRecord) -> bool:
+        """Whether a frame's RGB has to be decoded and encoded again before it is sent"""
+        jpeg = frame.rgb_jpeg
+        if jpeg is None:
+            return True
+        width = jpeg[1]
+        max_width = self.settings['max_width']
+        # Without a known width the JPEG has to be decoded to tell whether it fits
+        return bool(max_width) and (not width or width > max_width)
+
+    async def _encode_image(self, frame: FrameRecord) -> Optional[tuple]:
+        """(data, width, height, quality) of the JPEG to send for a frame; None without RGB"""
+        if not self.needs_reencode(frame):
+            # The phone's own JPEG goes out untouched
+            return frame.rgb_jpeg
+
+        rgb_frame = frame.rgb_image
+        if rgb_frame is None:
+            return None
+        args = (rgb_frame, self.settings['max_width'], self.settings['jpeg_quality'])
+        if self.run_encode is None:
+            return encode_jpeg(*args)
+        return await self.run_encode(encode_jpeg, *args)
 
     def set_result_callback(self, callback: Callable):
         """Set callback function for segmentation results"""
         self.result_callback = callback
 
-    async def send_frame(self, client_id: str, rgb_frame: np.ndarray, frame_number: int):
+    def set_encoder(self, run: Callable[..., Awaitable]):
+        """Set how frames are (re-)encoded off the event loop: run(fn, *args), e.g. FrameEncoder.run"""
+        self.run_encode = run
+
+    async def send_frame(self, client_id: str, frame: FrameRecord) -> bool:
         """
-        Send frame to segmentation server (non-blocking)
+        Send frame to segmentation server (non-blocking), if its session holds credit
 
         Args:
             client_id: Client identifier
-            rgb_frame: RGB numpy array (H, W, 3)
-            frame_number: Frame number
+            frame: Frame record with an RGB payload; a phone JPEG is forwarded as
+                is unless it is wider than max_width, anything else is encoded
+                from rgb_image (which the caller should have decoded)
+
+        Returns:
+            Whether the frame was sent
         """
         if not self.is_connected:
-            return  # Silently skip if not connected
+            return False  # Silently skip if not connected
 
         try:
             # Ensure session exists
             session_id = await self._ensure_session(client_id)
+            if self.channel is None or not self._may_send(session_id, asyncio.get_running_loop().time()):
+                return False
+
+            # The credit is only taken once there is a frame to spend it on
+            image = await self._encode_image(frame)
+            if image is None or self.channel is None or not self._take_credit(session_id):
+                return False
 
             # Build SegmentationRequest
-            request = ar_stream_pb2.SegmentationRequest()
+            envelope = ar_stream_pb2.SegmentationEnvelope()
+            request = envelope.frame
             request.session_id = session_id
-            request.frame_number = frame_number
+            request.frame_number = frame.frame_number
             request.timestamp_ms = int(asyncio.get_event_loop().time() * 1000)
 
-            # Encode frame as JPEG
-            bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
-            _, jpeg_data = cv2.imencode('.jpg', bgr_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-
-            request.image_frame.data = jpeg_data.tobytes()
+            data, width, height, quality = image
+            request.image_frame.data = data
             request.image_frame.format = ar_stream_pb2.JPEG
-            request.image_frame.width = rgb_frame.shape[1]
-            request.image_frame.height = rgb_frame.shape[0]
-            request.image_frame.quality = 85
+            request.image_frame.width = width
+            request.image_frame.height = height
+            request.image_frame.quality = quality
 
-            # Send via session's WebSocket
-            if session_id in self.session_connections:
-                await self.session_connections[session_id].send_frame(request)
+            # Send via the shared channel
+            await self.channel.send(envelope)
+            self.latency.on_sent(client_id, session_id, request.frame_number, request.timestamp_ms)
+            return True
 
         except Exception as e:
             logger.debug(f"Error sending frame: {e}")
+            return False
 
     async def send_prompt(
         self,
@@ -272,7 +529,7 @@ class SegmentationClient:
             points: Point coordinates [[x, y], ...] (optional)
             labels: Point labels [1, 0, ...] (optional)
         """
-        if not self.is_connected or not self.session:
+        if not self.is_connected or self.channel is None:
             raise RuntimeError("Segmentation server not connected")
 
         try:
@@ -280,22 +537,18 @@ class SegmentationClient:
             session_id = await self._ensure_session(client_id)
 
             # Send prompt
-            async with self.session.post(
-                f"{self.host}/segment/session/{session_id}/prompt",
-                json={
-                    "text": text,
-                    "points": points,
-                    "labels": labels
-                },
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    logger.info(f"✓ Prompt sent for {client_id}: {result.get('num_objects', 0)} objects")
-                    return result
-                else:
-                    error = await resp.json()
-                    raise ValueError(error.get("detail", "Unknown error"))
+            reply = await self._control(
+                ar_stream_pb2.SegmentationControl.PROMPT,
+                timeout=30,
+                session_id=session_id,
+                text=text or '',
+                points=[float(c) for point in points or () for c in point],
+                labels=[int(label) for label in labels or ()]
+            )
+            if reply.status != 200:
+                raise ValueError(reply.error or "Unknown error")
+            logger.info(f"✓ Prompt sent for {client_id}: {reply.num_objects} objects")
+            return {"status": "ok", "num_objects": reply.num_objects}
 
         except Exception as e:
             logger.error(f"Error sending prompt: {e}")
@@ -303,30 +556,29 @@ class SegmentationClient:
 
     async def clear_session(self, client_id: str):
         """Clear segmentation session for a client"""
+        # A start in flight would otherwise register its session after the clear
+        pending = self._pending_sessions.get(client_id)
+        if pending is not None:
+            try:
+                await asyncio.shield(pending)
+            except Exception:
+                pass
+        # Clearing (e.g. re-enabling segmentation) resets the backoff
+        self._session_failures.pop(client_id, None)
+
         if client_id not in self.client_id_to_session:
             return
 
         session_id = self.client_id_to_session[client_id]
 
-        # Close WebSocket connection
-        if session_id in self.session_connections:
-            await self.session_connections[session_id].close()
-            del self.session_connections[session_id]
-
-        if not self.is_connected or not self.session:
+        if not self.is_connected or self.channel is None:
             return
 
-        try:
-            async with self.session.delete(
-                f"{self.host}/segment/session/{session_id}",
-                timeout=aiohttp.ClientTimeout(total=5)
-            ) as resp:
-                if resp.status == 200:
-                    logger.info(f"✓ Cleared session for {client_id}")
-                    del self.client_id_to_session[client_id]
-
-        except Exception as e:
-            logger.error(f"Error clearing session: {e}")
+        if await self._delete_session(session_id):
+            logger.info(f"✓ Cleared session for {client_id}")
+            del self.client_id_to_session[client_id]
+            self.session_to_client.pop(session_id, None)
+            self._forget_credits(session_id)
 
     async def get_status(self) -> dict:
         """Get segmentation server status"""
@@ -358,16 +610,18 @@ class SegmentationClient:
             except asyncio.CancelledError:
                 pass
 
-        # Close all session connections
-        for conn in list(self.session_connections.values()):
-            await conn.close()
-        self.session_connections.clear()
+        for task in list(self._pending_sessions.values()):
+            task.cancel()
+
+        # Close the channel (is_connected first, so its loss does not schedule a reconnect)
+        self.is_connected = False
+        if self.channel is not None:
+            await self.channel.close()
 
         # Close HTTP session
         if self.session:
             await self.session.close()
 
-        self.is_connected = False
         logger.info("✓ Segmentation client closed")
 
 
@@ -0,0 +1,149 @@
+"""
+Segmentation latency and throughput per phone.
+Every frame sent is tracked by (session_id, frame_number) until a result for
+it arrives. A result splits its end-to-end time into the stages it went
+through, from the timings the segmentation server echoes in
+SegmentationOutput:
+
+    queue      server receive -> inference start
+    inference  inference start -> end
+    server     server receive -> result sent (queue, inference, mask encoding)
+    transport  end-to-end minus server: both network legs and protobuf handling
+
+Client and server clocks are never compared with each other. Percentiles are
+over a rolling window of recent results.
+"""
+
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+# Overridable in the `segmentation` section of config.yaml
+METRICS_DEFAULTS = {
+    'metrics_window_s': 60.0,     # Percentiles and throughput cover results from this long
+    'metrics_max_pending': 64,    # Frames per phone awaiting a result (most never get one of their own)
+}
+
+STAGES = ('e2e', 'queue', 'inference', 'server', 'transport')
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values) -> dict:
+    """p50/p95/p99 (nearest rank: the ceil(n * p / 100)-th smallest) of a sequence, rounded to 0.1"""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {f'p{p}': round(ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)], 1)
+            for p in PERCENTILES}
+
+
+class ClientLatency:
+    """Frames in flight and recent result timings of one phone"""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending: 'OrderedDict[Tuple[str, int], float]' = OrderedDict()  # -> sent at (ms, client clock)
+        self.samples: Deque[Tuple[float, Dict[str, float]]] = deque()       # (arrived at (s), stage -> ms)
+        self.sent = 0
+        self.answered = 0    # Results matched to a frame this client sent
+        self.results = 0     # All results, including prompt results and frames sent before a restart
+        self.started_s: Optional[float] = None  # First frame sent
+
+    def on_sent(self, key: Tuple[str, int], sent_ms: float, now_s: float):
+        if self.started_s is None:
+            self.started_s = now_s
+        self.sent += 1
+        self.pending[key] = sent_ms
+        self.pending.move_to_end(key)
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+    def on_result(self, key: Tuple[str, int], output, arrived_ms: float, now_s: float) -> Optional[Dict[str, float]]:
+        self.results += 1
+        sent_ms = self.pending.pop(key, None)
+        if sent_ms is None:
+            # The request timestamp is echoed back, in case the frame fell out of pending
+            sent_ms = output.request_timestamp_ms or None
+        if sent_ms is None or not output.received_ms:
+            return None
+        # Frames sent before this one got no result of their own
+        while self.pending and next(iter(self.pending.values())) <= sent_ms:
+            self.pending.popitem(last=False)
+
+        self.answered += 1
+        e2e = arrived_ms - sent_ms
+        server = output.timestamp_ms - output.received_ms
+        sample = {'e2e': e2e, 'server': server, 'transport': max(0.0, e2e - server)}
+        if output.inference_start_ms and output.inference_end_ms:
+            sample['queue'] = max(0, output.inference_start_ms - output.received_ms)
+            sample['inference'] = output.inference_end_ms - output.inference_start_ms
+        self.samples.append((now_s, sample))
+        return sample
+
+    def trim(self, now_s: float, window_s: float):
+        while self.samples and now_s - self.samples[0][0] > window_s:
+            self.samples.popleft()
+
+    def get_stats(self, now_s: float, window_s: float) -> dict:
+        span_s = min(window_s, now_s - self.started_s) if self.started_s is not None else window_s
+        stats = {
+            'sent': self.sent,
+            'results': self.results,
+            'answered': self.answered,
+            'in_flight': len(self.pending),
+            'results_per_s': round(len(self.samples) / span_s, 2) if span_s > 0 else 0.0,
+        }
+        for stage in STAGES:
+            values = [sample[stage] for _, sample in self.samples if stage in sample]
+            if values:
+                stats[f'{stage}_ms'] = percentiles(values)
+        return stats
+
+
+class SegmentationLatency:
+    """Segmentation request timings of all phones, keyed by client_id"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**METRICS_DEFAULTS, **(settings or {})}
+        self._clients: Dict[str, ClientLatency] = {}
+
+    def _client(self, client_id: str) -> ClientLatency:
+        client = self._clients.get(client_id)
+        if client is None:
+            client = self._clients[client_id] = ClientLatency(int(self.settings['metrics_max_pending']))
+        return client
+
+    def on_sent(self, client_id: str, session_id: str, frame_number: int, sent_ms: float):
+        """A frame went out (sent_ms: the request's timestamp_ms)"""
+        self._client(client_id).on_sent((session_id, frame_number), sent_ms, time.monotonic())
+
+    def on_result(self, client_id: str, output, arrived_ms: float) -> Optional[Dict[str, float]]:
+        """
+        A SegmentationOutput arrived (arrived_ms on the clock of sent_ms).
+
+        Returns:
+            Its stage timings in ms, if it answers a frame that was sent
+        """
+        client = self._client(client_id)
+        now_s = time.monotonic()
+        sample = client.on_result((output.session_id, output.frame_number), output, arrived_ms, now_s)
+        client.trim(now_s, self.settings['metrics_window_s'])
+        return sample
+
+    def forget(self, client_id: str):
+        self._clients.pop(client_id, None)
+
+    def get_stats(self, client_id: str) -> dict:
+        """Counters and rolling stage percentiles of one phone (empty if it never segmented)"""
+        client = self._clients.get(client_id)
+        if client is None:
+            return {}
+        window_s = self.settings['metrics_window_s']
+        now_s = time.monotonic()
+        client.trim(now_s, window_s)
+        return client.get_stats(now_s, window_s)
+
+    def get_all_stats(self) -> dict:
+        return {client_id: self.get_stats(client_id) for client_id in list(self._clients)}
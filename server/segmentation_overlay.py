@@ -0,0 +1,93 @@
+"""
+Segmentation overlay for the dashboard.
+The masks of a segmentation result are decoded once, when the result arrives,
+into a single label image (0 = background, i = i-th mask). Every later frame
+is composited with one lookup-table blend over that image, so the cost per
+frame does not depend on how many frames pass between results.
+"""
+
+import base64
+import io
+import logging
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# Overlay colors, cycled through by mask index
+MASK_COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255))
+
+# Per-channel label -> color tables for cv2.LUT (label 0 is background and never drawn)
+_COLOR_LUT = np.array([(0, 0, 0)] + [MASK_COLORS[i % len(MASK_COLORS)] for i in range(255)], dtype=np.uint8)
+_CHANNEL_LUTS = tuple(np.ascontiguousarray(_COLOR_LUT[:, channel]) for channel in range(3))
+
+
+def decode_mask(mask_base64: str) -> np.ndarray:
+    """(H, W) bool mask from a base64 PNG (alpha channel if present, else the first channel)"""
+    mask = np.asarray(Image.open(io.BytesIO(base64.b64decode(mask_base64))))
+    if mask.ndim == 2:
+        return mask > 0
+    return mask[:, :, 3] > 0 if mask.shape[2] == 4 else mask[:, :, 0] > 0
+
+
+class SegmentationOverlay:
+    """The masks of one segmentation result as a label image"""
+
+    def __init__(self, labels: np.ndarray, object_ids: Tuple[str, ...]):
+        self.labels = labels            # (H, W) uint8 at mask resolution
+        self.object_ids = object_ids    # object_ids[i - 1] is drawn with label i
+        self._resized: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.object_ids)
+
+    @classmethod
+    def from_encoded(cls, encoded_masks: Dict[str, str]) -> Optional['SegmentationOverlay']:
+        """Decode a segmentation result's masks; None if none of them decode"""
+        labels = None
+        object_ids = []
+        for obj_id, mask_base64 in encoded_masks.items():
+            if len(object_ids) == 255:
+                logger.warning(f"Only the first 255 of {len(encoded_masks)} masks are drawn")
+                break
+            try:
+                mask = decode_mask(mask_base64)
+            except Exception as e:
+                logger.error(f"Failed to decode mask {obj_id}: {e}")
+                continue
+            if labels is None:
+                labels = np.zeros(mask.shape, dtype=np.uint8)
+            elif mask.shape != labels.shape:
+                mask = cv2.resize(mask.astype(np.uint8), (labels.shape[1], labels.shape[0]),
+                                  interpolation=cv2.INTER_NEAREST).astype(bool)
+            object_ids.append(obj_id)
+            # Later masks are drawn over earlier ones where they overlap
+            labels[mask] = len(object_ids)
+        if labels is None:
+            return None
+        return cls(labels, tuple(object_ids))
+
+    def labels_at(self, height: int, width: int) -> np.ndarray:
+        """The label image at a frame's resolution (resized once per resolution)"""
+        if self.labels.shape == (height, width):
+            return self.labels
+        key = (height, width)
+        if key not in self._resized:
+            self._resized[key] = cv2.resize(self.labels, (width, height), interpolation=cv2.INTER_NEAREST)
+        return self._resized[key]
+
+    def composite(self, rgb_image: np.ndarray) -> np.ndarray:
+        """Blend the mask colors 50/50 onto an (H, W, 3) uint8 frame"""
+        # RGBA payloads decode to a strided [..., :3] view, which OpenCV cannot take
+        rgb_image = np.ascontiguousarray(rgb_image)
+        labels = self.labels_at(*rgb_image.shape[:2])
+        colors = cv2.merge([cv2.LUT(labels, lut) for lut in _CHANNEL_LUTS])
+        blended = cv2.addWeighted(rgb_image, 0.5, colors, 0.5, 0)
+        output = rgb_image.copy()
+        # Labels double as the copy mask: every labelled pixel takes the blend
+        cv2.copyTo(blended, labels, output)
+        return output
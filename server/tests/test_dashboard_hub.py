@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from dashboard_hub import DashboardConnection, Subscription, snap_quality, snap_width
+from dashboard_protocol import Tier
+
+HEARTBEAT = {'heartbeat_interval_s': 0.05, 'heartbeat_timeout_s': 0.2}
+
+
+class FakeWebSocket:
+    """Records sends; answers pings through the connection when `answering`"""
+
+    def __init__(self):
+        self.connection = None
+        self.answering = True
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+        if self.answering and '"ping"' in text:
+            self.connection.received()
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str = ''):
+        self.closed_with = (code, reason)
+
+    @property
+    def pings(self) -> int:
+        return sum(1 for text in self.sent if isinstance(text, str) and json.loads(text).get('type') == 'ping')
+
+
+def connect(websocket: FakeWebSocket) -> DashboardConnection:
+    connection = DashboardConnection(websocket, settings=HEARTBEAT)
+    websocket.connection = connection
+    connection.start()
+    return connection
+
+
+async def stream(connection: DashboardConnection, seconds: float):
+    """Keep the writer busy with frame updates; the dashboard itself writes nothing"""
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    frame = 0
+    while loop.time() < end:
+        frame += 1
+        connection.enqueue(json.dumps({'type': 'frame_update', 'frame_number': frame}), 'frame_update', 'phone')
+        await asyncio.sleep(0.005)
+
+
+def test_streaming_dashboard_is_pinged_and_kept_open():
+    async def run():
+        websocket = FakeWebSocket()
+        connection = connect(websocket)
+        await stream(connection, 0.4)
+        pings_while_streaming = websocket.pings
+        await asyncio.sleep(0.3)  # Pause: still answering pings
+        closed = connection.closed
+        await connection.close()
+        return pings_while_streaming, closed, websocket.closed_with
+
+    pings, closed, closed_with = asyncio.run(run())
+    assert pings >= 3
+    assert not closed and closed_with is None
+
+
+def test_pings_are_not_repeated_within_an_interval():
+    async def run():
+        websocket = FakeWebSocket()
+        websocket.answering = False
+        connection = connect(websocket)
+        await stream(connection, 0.12)
+        await connection.close()
+        return websocket.pings
+
+    # Silent from the start: pings at about 0.05 s and 0.1 s, not one per frame
+    assert 1 <= asyncio.run(run()) <= 3
+
+
+def test_silent_dashboard_is_closed_while_streaming():
+    async def run():
+        websocket = FakeWebSocket()
+        websocket.answering = False
+        connection = connect(websocket)
+        await stream(connection, 0.4)
+        await asyncio.sleep(0.01)
+        closed = connection.closed
+        await connection.close()
+        return closed, websocket.closed_with
+
+    closed, closed_with = asyncio.run(run())
+    assert closed
+    assert closed_with == (1001, 'Heartbeat timeout')
+
+
+def test_idle_dashboard_is_pinged():
+    async def run():
+        websocket = FakeWebSocket()
+        connection = connect(websocket)
+        await asyncio.sleep(0.2)
+        await connection.close()
+        return websocket.pings, websocket.closed_with
+
+    pings, closed_with = asyncio.run(run())
+    assert pings >= 2
+    assert closed_with is None
+
+
+def test_snapping():
+    assert snap_width(None) == 0
+    assert snap_width(1000) == 960
+    assert snap_width(100) == 320
+    assert snap_quality(0) == 0
+    assert snap_quality(73) == 75
+    assert snap_quality(10) == 30
+
+
+def test_video_tiers_are_keyed_by_width_only():
+    connection = DashboardConnection(FakeWebSocket(), settings=HEARTBEAT)
+    tiers = {connection.tier(Subscription(tier=Tier(480, quality), video=True)) for quality in (60, 80)}
+    assert tiers == {Tier(480, 0, True)}
+    assert connection.tier(Subscription(tier=Tier(480, 60))) == Tier(480, 60)
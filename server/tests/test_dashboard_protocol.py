@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+
+from buffer.frame_record import MOTION_SIZE
+from dashboard_protocol import (DEFAULT_TIER, FLAG_CAMERA, FLAG_MOTION, MAGIC, PROTOCOL_BINARY, PROTOCOL_JSON,
+                                FrameUpdate, Tier, _HEADER, is_keyframe_segment)
+
+
+def make_update(client_id='phone-1') -> FrameUpdate:
+    update = FrameUpdate(client_id, frame_number=42, timestamp_ns=1_234_567_890_123)
+    update.resolution = (640, 480)
+    update.tracking_state = 3
+    update.matrices['pose_matrix'] = np.arange(16, dtype=np.float32)
+    update.matrices['intrinsic_matrix'] = np.arange(9, dtype=np.float32) * 0.5
+    update.motion = np.linspace(0, 1, MOTION_SIZE, dtype=np.float32)
+    update.motion_mask = 0b100001
+    update.add_image('rgb', 'JPEG', b'\xff\xd8rgb\xff\xd9')
+    update.add_image('depth', 'PNG', b'\x89PNGdepth')
+    return update
+
+
+def test_binary_round_trip():
+    update = make_update()
+    parsed = FrameUpdate.from_binary(update.to_binary())
+
+    assert (parsed.client_id, parsed.frame_number, parsed.timestamp_ns) == ('phone-1', 42, 1_234_567_890_123)
+    assert parsed.resolution == (640, 480)
+    assert parsed.tracking_state == 3
+    assert set(parsed.matrices) == {'pose_matrix', 'intrinsic_matrix'}
+    np.testing.assert_array_equal(parsed.matrices['pose_matrix'], update.matrices['pose_matrix'])
+    np.testing.assert_array_equal(parsed.matrices['intrinsic_matrix'], update.matrices['intrinsic_matrix'])
+    np.testing.assert_array_equal(parsed.motion, update.motion)
+    assert parsed.motion_mask == 0b100001
+    assert parsed.images == {DEFAULT_TIER: {'rgb': ('JPEG', b'\xff\xd8rgb\xff\xd9'),
+                                            'depth': ('PNG', b'\x89PNGdepth')}}
+
+
+@pytest.mark.parametrize('client_id', ['a', 'ab', 'abc', 'abcd', 'téléphone'])
+def test_client_id_padding(client_id):
+    data = make_update(client_id).to_binary()
+    assert FrameUpdate.from_binary(data).client_id == client_id
+    # The id is zero-padded so the float32 data after it stays 4-byte aligned
+    encoded_id = client_id.encode('utf-8')
+    padded = data[_HEADER.size:_HEADER.size + (len(encoded_id) + 3) // 4 * 4]
+    assert padded == encoded_id + b'\0' * (len(padded) - len(encoded_id))
+    assert len(padded) % 4 == 0
+
+
+def test_header_layout():
+    data = make_update().to_binary()
+    magic, version, flags, tracking_state, image_count = _HEADER.unpack_from(data)[:5]
+    assert (magic, version, tracking_state, image_count) == (MAGIC, PROTOCOL_BINARY, 3, 2)
+    assert flags & FLAG_CAMERA and flags & FLAG_MOTION
+
+
+def test_layer_selection_leaves_out_images_and_motion():
+    update = make_update()
+    parsed = FrameUpdate.from_binary(update.to_binary(frozenset({'rgb'})))
+    assert parsed.images == {DEFAULT_TIER: {'rgb': ('JPEG', b'\xff\xd8rgb\xff\xd9')}}
+    assert parsed.tracking_state is None
+    assert parsed.matrices == {}
+    assert parsed.motion is None
+    assert parsed.resolution == (640, 480)
+
+
+def test_relay_carries_every_tier():
+    update = make_update()
+    small = Tier(320, 60)
+    update.add_image('rgb', 'JPEG', b'small', small)
+    tiers, data = update.to_relay()
+    parsed = FrameUpdate.from_binary(data, tiers)
+    assert parsed.images == update.images
+    np.testing.assert_array_equal(parsed.motion, update.motion)
+
+
+def test_frame_number_wraps_to_32_bits():
+    update = FrameUpdate('c', frame_number=(1 << 32) + 5)
+    assert FrameUpdate.from_binary(update.to_binary()).frame_number == 5
+
+
+def test_rejects_other_messages():
+    data = bytearray(make_update().to_binary())
+    data[:4] = b'NOPE'
+    with pytest.raises(ValueError):
+        FrameUpdate.from_binary(bytes(data))
+
+
+def test_encodings_are_cached_until_an_image_is_added():
+    update = make_update()
+    first = update.to_binary()
+    assert update.to_binary() is first
+    update.add_image('segmentation', 'JPEG', b'overlay')
+    assert update.to_binary() is not first
+
+
+def test_closest_tier_is_used():
+    update = FrameUpdate('c')
+    update.add_image('rgb', 'JPEG', b'big', Tier(0, 80))
+    update.add_image('rgb', 'JPEG', b'small', Tier(320, 60))
+    parsed = FrameUpdate.from_binary(update.to_binary(tier=Tier(480, 60)))
+    assert parsed.images[DEFAULT_TIER]['rgb'] == ('JPEG', b'small')
+
+
+def test_json_protocol_matches_binary_content():
+    update = make_update()
+    message = json.loads(update.encode(PROTOCOL_JSON))
+    assert message['type'] == 'frame_update'
+    assert (message['client_id'], message['frame_number']) == ('phone-1', 42)
+    assert message['resolution'] == {'width': 640, 'height': 480}
+    assert message['camera']['pose_matrix'] == list(range(16))
+    assert set(message['motion']) == {'linear_acceleration', 'orientation'}
+    assert 'rgb_frame' in message and 'depth_frame' in message and 'segmentation_frame' not in message
+
+
+def test_keyframe_segment_detection():
+    assert is_keyframe_segment(b'\0\0\0\x18ftypisom')
+    assert not is_keyframe_segment(b'\0\0\0\x18moof')
@@ -0,0 +1,67 @@
+import numpy as np
+from PIL import Image, ImageOps
+
+from depth_colormap import COLORMAP, colorize_depth, millimeter_lut
+
+BLACK, WHITE = [0, 0, 0], [255, 255, 255]
+
+
+def reference(metres: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    """The colormap applied the direct way, in float64"""
+    index = np.clip((metres.astype(np.float64) - lo) / (hi - lo) * 255, 0, 255)
+    return COLORMAP[index.astype(np.uint8)]
+
+
+def assert_close(image: np.ndarray, expected: np.ndarray):
+    # One step of the ramp at most: float32 scaling may round an exact boundary down
+    assert image.shape == expected.shape and image.dtype == np.uint8
+    assert np.abs(image.astype(int) - expected.astype(int)).max() <= 2
+
+
+def test_colormap_is_the_dashboard_ramp():
+    ramp = Image.fromarray(np.arange(256, dtype=np.uint8)[None, :])
+    np.testing.assert_array_equal(COLORMAP, np.asarray(ImageOps.colorize(ramp, 'black', 'white', 'blue'))[0])
+    assert COLORMAP[0].tolist() == BLACK and COLORMAP[255].tolist() == WHITE
+
+
+def test_millimetres_follow_the_reference():
+    millimetres = np.array([[0, 499, 500, 1200], [2250, 3999, 4000, 65535]], np.uint16)
+    image = colorize_depth(millimetres, (0.5, 4.0))
+    assert_close(image, reference(millimetres / 1000.0, 0.5, 4.0))
+    # Zero (no depth) and anything below the range are black; beyond it, white
+    assert image[0, 0].tolist() == image[0, 1].tolist() == BLACK
+    assert image[1, 2].tolist() == image[1, 3].tolist() == WHITE
+
+
+def test_metres_follow_the_reference():
+    metres = np.array([[0.0, 0.5, 1.2, 2.25], [3.999, 4.0, 9.0, -1.0]], np.float32)
+    image = colorize_depth(metres, (0.5, 4.0))
+    assert_close(image, reference(metres, 0.5, 4.0))
+    assert image[0, 0].tolist() == image[1, 3].tolist() == BLACK
+    assert image[1, 2].tolist() == WHITE
+
+
+def test_invalid_metres_are_black():
+    metres = np.array([[np.nan, 1.0], [2.0, np.inf]], np.float32)
+    image = colorize_depth(metres, (0.5, 4.0))
+    assert image[0, 0].tolist() == BLACK
+    assert image[1, 1].tolist() == WHITE
+    # Without a range the extent skips invalid depth
+    image = colorize_depth(np.array([[np.nan, 1.0, 3.0]], np.float32))
+    assert image[0].tolist() == [BLACK, BLACK, WHITE]
+
+
+def test_frame_extent_without_a_range():
+    millimetres = np.array([[1000, 2000, 3000]], np.uint16)
+    for depth_range in (None, (0.0, 0.0)):
+        image = colorize_depth(millimetres, depth_range)
+        assert_close(image, reference(millimetres / 1000.0, 1.0, 3.0))
+        assert image[0, 0].tolist() == BLACK and image[0, 2].tolist() == WHITE
+
+
+def test_lut_is_cached_and_read_only():
+    lut = millimeter_lut(500, 4000)
+    assert lut is millimeter_lut(500, 4000)
+    assert lut.shape == (65536, 3) and not lut.flags.writeable
+    # An empty range maps everything to the first color
+    assert (millimeter_lut(1000, 1000) == COLORMAP[0]).all()
@@ -0,0 +1,113 @@
+from flow_control import FLOW_DEFAULTS, FlowController, load_flow_settings
+
+ALL = {'rgb', 'depth', 'segmentation', 'motion'}
+
+
+def make_controller(**overrides) -> FlowController:
+    return FlowController({'resend_every': 1000, **overrides})
+
+
+class Phone:
+    """Cumulative counters of one phone, advanced interval by interval"""
+
+    def __init__(self, controller: FlowController):
+        self.controller = controller
+        self.frames = 0
+        self.dropped = {'broadcast': 0, 'segmentation': 0}
+
+    def interval(self, frames=30, dropped=None, ingest_ms=10.0, layers=ALL, segmentation=False):
+        self.frames += frames
+        for stage, count in (dropped or {}).items():
+            self.dropped[stage] += count
+        return self.controller.update(self.frames, dict(self.dropped), ingest_ms, layers, segmentation)
+
+
+def test_load_flow_settings():
+    settings = load_flow_settings({'flow_control': {'min_fps': 10}})
+    assert settings['min_fps'] == 10
+    assert settings['max_fps'] == FLOW_DEFAULTS['max_fps']
+
+
+def test_first_interval_recommends_the_maximum():
+    message = Phone(make_controller()).interval()
+    assert message == {'type': 'flow_control', 'max_fps': 30, 'jpeg_quality': 85,
+                       'send_rgb': True, 'send_depth': True}
+
+
+def test_unchanged_recommendation_is_sent_every_resend_interval():
+    phone = Phone(make_controller(resend_every=3))
+    assert phone.interval() is not None
+    assert phone.interval() is None
+    assert phone.interval() is None
+    assert phone.interval() is not None
+
+
+def test_drops_cut_frame_rate_and_quality():
+    phone = Phone(make_controller())
+    phone.interval()
+    message = phone.interval(frames=30, dropped={'broadcast': 15})
+    assert (message['max_fps'], message['jpeg_quality']) == (22, 75)
+    message = phone.interval(frames=30, dropped={'segmentation': 10})
+    assert (message['max_fps'], message['jpeg_quality']) == (16, 65)
+
+
+def test_drop_ratio_is_per_interval_and_per_stage():
+    phone = Phone(make_controller(drop_ratio_high=0.25))
+    phone.interval(dropped={'broadcast': 100})  # Before the baseline: ignored
+    # 6 of 30 frames dropped by each stage: 20% each, under the threshold
+    assert phone.interval(dropped={'broadcast': 6, 'segmentation': 6}) is None
+    assert phone.controller.max_fps == 30
+
+
+def test_slow_ingest_backs_off():
+    phone = Phone(make_controller(max_ingest_ms=150.0))
+    phone.interval()
+    assert phone.interval(ingest_ms=200.0)['max_fps'] == 22
+
+
+def test_depth_is_shed_at_the_floor_and_restored_first():
+    phone = Phone(make_controller(min_fps=5, min_jpeg_quality=40))
+    phone.interval()
+    while phone.controller.max_fps > 5:
+        phone.interval(ingest_ms=500.0)
+    assert phone.controller.shed_depth is False
+    message = phone.interval(ingest_ms=500.0)
+    assert (message['max_fps'], message['send_depth']) == (5, False)
+    assert message['jpeg_quality'] == 40
+
+    # Recovery: depth comes back before frame rate and quality move
+    message = phone.interval()
+    assert (message['max_fps'], message['jpeg_quality'], message['send_depth']) == (5, 40, True)
+    message = phone.interval()
+    assert (message['max_fps'], message['jpeg_quality']) == (7, 45)
+
+
+def test_quiet_intervals_ramp_up_to_the_caps():
+    phone = Phone(make_controller())
+    phone.interval()
+    phone.interval(ingest_ms=500.0)
+    for _ in range(20):
+        phone.interval()
+    assert (phone.controller.max_fps, phone.controller.jpeg_quality) == (30, 85)
+
+
+def test_between_thresholds_nothing_changes():
+    phone = Phone(make_controller(drop_ratio_low=0.05, drop_ratio_high=0.25, max_ingest_ms=150.0))
+    phone.interval()
+    phone.interval(ingest_ms=500.0)
+    before = (phone.controller.max_fps, phone.controller.jpeg_quality)
+    phone.interval(ingest_ms=100.0)  # Above max_ingest_ms / 2: hold
+    phone.interval(dropped={'broadcast': 3})  # 10%: hold
+    assert (phone.controller.max_fps, phone.controller.jpeg_quality) == before
+
+
+def test_payload_selection_follows_subscriptions():
+    phone = Phone(make_controller(resend_every=1))
+    message = phone.interval(layers=set())
+    assert (message['send_rgb'], message['send_depth']) == (False, False)
+    message = phone.interval(layers=set(), segmentation=True)
+    assert (message['send_rgb'], message['send_depth']) == (True, False)
+    message = phone.interval(layers={'segmentation'})
+    assert (message['send_rgb'], message['send_depth']) == (True, False)
+    message = phone.interval(layers={'depth'})
+    assert (message['send_rgb'], message['send_depth']) == (False, True)
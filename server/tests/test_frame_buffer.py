@@ -0,0 +1,61 @@
+import numpy as np
+
+from buffer.frame_buffer import FrameBuffer
+from buffer.frame_record import MOTION_SIZE, FrameRecord, MotionSamples
+from proto import ar_stream_pb2
+
+
+def samples(start: int, count: int, mask: int = 1) -> MotionSamples:
+    timestamps = np.arange(start, start + count, dtype=np.int64)
+    values = np.repeat(timestamps.astype(np.float32)[:, None], MOTION_SIZE, axis=1)
+    return MotionSamples(timestamps, values, mask)
+
+
+def test_motion_samples_wrap_around_the_ring():
+    buffer = FrameBuffer(motion_capacity=5)
+    buffer.add_motion_samples(samples(0, 3, mask=1))
+    buffer.add_motion_samples(samples(3, 4, mask=2))  # 2 up to the end, 2 wrapped to the start
+    timestamps, values, masks = buffer.get_motion_samples()
+    assert timestamps.tolist() == [2, 3, 4, 5, 6]
+    assert values[:, 0].tolist() == [2, 3, 4, 5, 6]
+    assert masks.tolist() == [1, 2, 2, 2, 2]
+    assert buffer.motion_samples_received == 7
+
+
+def test_run_longer_than_the_ring_keeps_its_newest_samples():
+    buffer = FrameBuffer(motion_capacity=4)
+    buffer.add_motion_samples(samples(0, 3))
+    buffer.add_motion_samples(samples(10, 6))
+    timestamps, values, _ = buffer.get_motion_samples()
+    assert timestamps.tolist() == [12, 13, 14, 15]
+    assert values[:, -1].tolist() == [12, 13, 14, 15]
+    assert buffer.motion_samples_received == 9
+
+
+def test_motion_samples_since():
+    buffer = FrameBuffer(motion_capacity=4)
+    buffer.add_motion_samples(samples(0, 6))
+    timestamps, values, masks = buffer.get_motion_samples(since_ns=3)
+    assert timestamps.tolist() == [4, 5]
+    assert len(values) == len(masks) == 2
+    timestamps, _, _ = buffer.get_motion_samples()
+    timestamps[0] = -1  # A copy: the ring is untouched
+    assert buffer.get_motion_samples()[0].tolist() == [2, 3, 4, 5]
+
+
+def rgb_frame(frame_number: int) -> FrameRecord:
+    frame = FrameRecord('phone', frame_number=frame_number)
+    frame.set_rgb_payload(bytes(4 * 2), ar_stream_pb2.GRAYSCALE, 4, 2)
+    return frame
+
+
+def test_only_the_newest_frame_keeps_decoded_arrays():
+    buffer = FrameBuffer(max_size=3)
+    first, second = rgb_frame(1), rgb_frame(2)
+    buffer.add_frame(first)
+    first.rgb_image
+    buffer.add_frames([second, rgb_frame(3)])
+    assert not first.is_decoded('rgb_image')
+    assert first.nbytes == first.wire_size
+    assert buffer.get_latest_frame().frame_number == 3
+    assert first.rgb_image is not None  # Re-decoded on demand from the kept payload
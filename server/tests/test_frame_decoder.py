@@ -0,0 +1,74 @@
+import numpy as np
+
+from buffer.frame_record import MOTION_LAYOUT, MOTION_SIZE
+from frame_decoder import decode_batch, decode_frame, extract_motion_samples
+from proto import ar_stream_pb2
+
+ACCELERATION = 1 << 0
+ORIENTATION = 1 << 5
+
+
+def motion_samples(timestamps, acceleration=None, orientation=None) -> ar_stream_pb2.MotionSamples:
+    samples = ar_stream_pb2.MotionSamples()
+    samples.timestamp_ns.extend(timestamps)
+    if acceleration is not None:
+        samples.linear_acceleration.extend(acceleration)
+    if orientation is not None:
+        samples.orientation.extend(orientation)
+    return samples
+
+
+def test_motion_columns_land_in_their_layout_slices():
+    samples = extract_motion_samples(motion_samples(
+        [10, 20], acceleration=[1, 2, 3, 4, 5, 6], orientation=[0, 0, 0, 1, 0, 0, 1, 0]))
+    assert len(samples) == 2
+    assert samples.values.shape == (2, MOTION_SIZE) and samples.values.dtype == np.float32
+    assert samples.mask == ACCELERATION | ORIENTATION
+    assert samples.values[1, 0:3].tolist() == [4, 5, 6]
+    assert samples.values[1, 15:19].tolist() == [0, 0, 1, 0]
+    assert not samples.values[:, 3:15].any()  # Fields the phone did not send stay zero
+
+
+def test_mismatched_column_is_ignored_and_samples_are_sorted():
+    samples = extract_motion_samples(motion_samples([30, 10, 20], acceleration=[1, 2, 3, 4],
+                                                    orientation=list(range(12))))
+    assert samples.mask == ORIENTATION
+    assert samples.timestamps_ns.tolist() == [10, 20, 30]
+    assert samples.values[:, 15].tolist() == [4, 8, 0]  # Rows moved with their timestamps
+
+
+def test_no_samples():
+    assert extract_motion_samples(motion_samples([])) is None
+
+
+def test_packed_motion_mask_of_a_frame():
+    ar_frame = ar_stream_pb2.ARFrame(frame_number=1)
+    ar_frame.motion.linear_acceleration.x = 1.5
+    ar_frame.motion.orientation.w = 1.0
+    frame, _ = decode_frame(ar_frame.SerializeToString(), 'phone')
+    assert frame.motion_mask == ACCELERATION | ORIENTATION
+    assert frame.motion.dtype == np.float32 and frame.motion[0] == 1.5
+    assert frame.motion_dict() == {'linear_acceleration': {'x': 1.5, 'y': 0.0, 'z': 0.0},
+                                   'orientation': {'x': 0.0, 'y': 0.0, 'z': 0.0, 'w': 1.0}}
+    fields = [field for index, (field, _, _) in enumerate(MOTION_LAYOUT) if frame.motion_mask & (1 << index)]
+    assert fields == ['linear_acceleration', 'orientation']
+
+
+def test_decode_batch_fills_device_and_motion():
+    batch = ar_stream_pb2.ARFrameBatch(device_id='pixel')
+    for frame_number, timestamp in ((1, 15), (2, 5)):
+        batch.frames.add(frame_number=frame_number, timestamp_ns=timestamp)
+    own = batch.frames.add(frame_number=3, timestamp_ns=25, device_id='other')
+    own.motion.gravity.z = -9.8
+    batch.motion.CopyFrom(motion_samples([10, 20], acceleration=[1, 1, 1, 2, 2, 2]))
+
+    (device_id, frames, motion), timings = decode_batch(batch.SerializeToString(), 'phone')
+    assert device_id == 'pixel' and 'parse' in timings
+    assert [frame.device_id for frame in frames] == ['pixel', 'pixel', 'other']
+    assert len(motion) == 2
+    # The latest sample at or before the frame; none before the first sample
+    assert frames[0].motion[0:3].tolist() == [1, 1, 1] and frames[0].motion_mask == ACCELERATION
+    assert frames[1].motion is None
+    assert frames[2].motion[14] == np.float32(-9.8) and not frames[2].motion[0:3].any()
+    # Each frame gets its own copy of the sample
+    assert frames[0].motion.base is None
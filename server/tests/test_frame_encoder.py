@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from dashboard_protocol import Tier
+from frame_encoder import FrameEncoder, tier_key
+
+FULL = Tier(0, 80)
+SMALL = Tier(320, 60)
+
+
+class Render:
+    """Counts renders; each one waits until released, so encodes overlap"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self) -> np.ndarray:
+        self.calls += 1
+        self.release.wait(5)
+        return np.zeros((48, 64, 3), np.uint8)
+
+
+def run_with_encoder(test, mode='thread'):
+    async def run():
+        encoder = FrameEncoder(mode, workers=2)
+        encoder.start()
+        try:
+            return await test(encoder)
+        finally:
+            encoder.shutdown()
+    return asyncio.run(run())
+
+
+def test_tier_key_shares_png_and_video_images():
+    assert tier_key(Tier(320, 60), 'PNG') == Tier(320, 0)
+    assert tier_key(Tier(320, 60, video=True), 'JPEG') == Tier(320, 60)
+    assert tier_key(Tier(320, 60), 'MP4') == Tier(320, 0, video=True)
+
+
+def test_concurrent_requests_share_one_encode():
+    render = Render()
+
+    async def test(encoder):
+        first = asyncio.create_task(encoder.encode('c', 1, 1, 'rgb', render, [FULL]))
+        second = asyncio.create_task(encoder.encode('c', 1, 1, 'rgb', render, [FULL]))
+        await asyncio.sleep(0.05)
+        render.release.set()
+        return await first, await second, encoder.get_stats()
+
+    first, second, stats = run_with_encoder(test)
+    assert render.calls == 1
+    assert first[FULL] is second[FULL]
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_memoized_per_frame():
+    render = Render()
+    render.release.set()
+
+    async def test(encoder):
+        await encoder.encode('c', 1, 1, 'rgb', render, [FULL, SMALL])
+        await encoder.encode('c', 1, 1, 'rgb', render, [SMALL])
+        await encoder.encode('c', 2, 2, 'rgb', render, [SMALL])
+        return encoder.get_stats()
+
+    stats = run_with_encoder(test, mode='inline')
+    assert render.calls == 2  # Frame 1 once for both tiers, then frame 2
+    assert (stats['hits'], stats['misses']) == (1, 3)
+
+
+def test_failed_encode_is_retried_and_skipped_by_waiters():
+    async def test(encoder):
+        gate = threading.Event()
+
+        def fail():
+            gate.wait(5)
+            raise RuntimeError('broken frame')
+
+        owner = asyncio.create_task(encoder.encode('c', 1, 1, 'rgb', fail, [FULL]))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(encoder.encode('c', 1, 1, 'rgb', fail, [FULL]))
+        await asyncio.sleep(0.01)
+        gate.set()
+        with pytest.raises(RuntimeError):
+            await owner
+        assert await waiter == {}
+
+        render = Render()
+        render.release.set()
+        retried = await encoder.encode('c', 1, 1, 'rgb', render, [FULL])
+        return retried, render.calls
+
+    retried, calls = run_with_encoder(test)
+    assert list(retried) == [FULL] and calls == 1
+
+
+def test_video_segment_is_encoded_once_per_frame():
+    segments = []
+
+    async def test(encoder):
+        def encode_segment(tier):
+            segments.append(tier)
+            return b'segment'
+        video = Tier(0, 80, video=True)
+        return await asyncio.gather(*(encoder.encode_video('c', 1, 1, 'rgb', encode_segment, [video])
+                                      for _ in range(3)))
+
+    results = run_with_encoder(test)
+    assert len(segments) == 1
+    assert all(list(result.values()) == [b'segment'] for result in results)
+
+
+def test_same_width_video_tiers_share_one_segment():
+    segments = []
+
+    async def test(encoder):
+        def encode_segment(tier):
+            segments.append(tier)
+            return b'segment'
+        tiers = [Tier(0, 80, video=True), Tier(0, 60, video=True)]
+        first = await encoder.encode_video('c', 1, 1, 'rgb', encode_segment, tiers)
+        second = await encoder.encode_video('c', 2, 2, 'rgb', encode_segment, tiers)
+        return first, second
+
+    first, second = run_with_encoder(test)
+    assert segments == [Tier(0, 0, video=True)] * 2  # One per frame, on the width's stream
+    assert set(first) == set(second) == {Tier(0, 80, video=True), Tier(0, 60, video=True)}
+
+
+def test_forget_drops_a_clients_memo():
+    render = Render()
+    render.release.set()
+
+    async def test(encoder):
+        await encoder.encode('c', 1, 1, 'rgb', render, [FULL])
+        encoder.forget('c')
+        await encoder.encode('c', 1, 1, 'rgb', render, [FULL])
+
+    run_with_encoder(test, mode='inline')
+    assert render.calls == 2
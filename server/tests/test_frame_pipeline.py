@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from frame_pipeline import STAGE_DEFAULTS, ClientPipeline, StageQueue, load_stage_settings
+
+
+class Recorder:
+    """Stage handler that records items, optionally held until released"""
+
+    def __init__(self, hold: bool = False):
+        self.items = []
+        self.release = asyncio.Event()
+        if not hold:
+            self.release.set()
+
+    async def __call__(self, item):
+        await self.release.wait()
+        self.items.append(item)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_load_stage_settings():
+    settings = load_stage_settings({'pipeline': {'broadcast': {'policy': 'block', 'max_queued': 4}}})
+    assert settings['broadcast'] == {'policy': 'block', 'max_queued': 4}
+    assert settings['segmentation'] == STAGE_DEFAULTS['segmentation']
+    with pytest.raises(ValueError):
+        load_stage_settings({'pipeline': {'segmentation': {'policy': 'drop_newest'}}})
+
+
+def test_latest_only_keeps_the_newest_item():
+    async def run():
+        handler = Recorder(hold=True)
+        queue = StageQueue('test', handler, policy='latest_only', max_queued=5)
+        assert queue.max_queued == 1
+        queue.start()
+        await queue.put(0)
+        await settle()  # 0 is being handled
+        for item in range(1, 5):
+            await queue.put(item)
+        handler.release.set()
+        await settle()
+        await queue.close()
+        return handler.items, queue.get_stats()
+
+    items, stats = asyncio.run(run())
+    assert items == [0, 4]
+    assert (stats['processed'], stats['dropped']) == (2, 3)
+
+
+def test_drop_oldest_keeps_the_newest_max_queued():
+    async def run():
+        handler = Recorder(hold=True)
+        queue = StageQueue('test', handler, policy='drop_oldest', max_queued=2)
+        queue.start()
+        await queue.put(0)
+        await settle()
+        for item in range(1, 6):
+            await queue.put(item)
+        assert len(queue) == 2
+        handler.release.set()
+        await settle()
+        await queue.close()
+        return handler.items, queue.dropped
+
+    items, dropped = asyncio.run(run())
+    assert items == [0, 4, 5]
+    assert dropped == 3
+
+
+def test_block_waits_for_room_and_drops_nothing():
+    async def run():
+        handler = Recorder(hold=True)
+        queue = StageQueue('test', handler, policy='block', max_queued=1)
+        queue.start()
+        await queue.put(0)
+        await settle()
+        await queue.put(1)
+        producer = asyncio.create_task(queue.put(2))
+        await settle()
+        assert not producer.done()  # queue full: the producer waits
+        handler.release.set()
+        await asyncio.wait_for(producer, 1.0)
+        await settle()
+        await queue.close()
+        return handler.items, queue.dropped
+
+    items, dropped = asyncio.run(run())
+    assert items == [0, 1, 2]
+    assert dropped == 0
+
+
+def test_handler_errors_do_not_stop_the_worker():
+    async def run():
+        items = []
+
+        async def handler(item):
+            if item == 'bad':
+                raise RuntimeError('boom')
+            items.append(item)
+
+        queue = StageQueue('test', handler, policy='drop_oldest', max_queued=4)
+        queue.start()
+        for item in ('a', 'bad', 'b'):
+            await queue.put(item)
+        await settle()
+        await queue.close()
+        return items, queue.processed
+
+    items, processed = asyncio.run(run())
+    assert items == ['a', 'b']
+    assert processed == 3
+
+
+def test_close_drops_queued_items():
+    async def run():
+        handler = Recorder(hold=True)
+        queue = StageQueue('test', handler, policy='drop_oldest', max_queued=4)
+        queue.start()
+        for item in range(3):
+            await queue.put(item)
+        await settle()
+        await queue.close()
+        return queue.get_stats()
+
+    stats = asyncio.run(run())
+    assert (stats['queued'], stats['dropped']) == (0, 2)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        StageQueue('test', Recorder(), policy='fifo')
+
+
+def test_client_pipeline_routes_to_stages():
+    async def run():
+        broadcast, segmentation = Recorder(), Recorder()
+        pipeline = ClientPipeline('phone', {'broadcast': broadcast, 'segmentation': segmentation},
+                                  load_stage_settings({}))
+        await pipeline.put('broadcast', 'frame-1')
+        await pipeline.put('segmentation', 'frame-2')
+        await settle()
+        stats = pipeline.get_stats()
+        await pipeline.close()
+        return broadcast.items, segmentation.items, stats
+
+    broadcast_items, segmentation_items, stats = asyncio.run(run())
+    assert (broadcast_items, segmentation_items) == (['frame-1'], ['frame-2'])
+    assert stats['broadcast']['policy'] == 'latest_only'
+    assert stats['segmentation']['processed'] == 1
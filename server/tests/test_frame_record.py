@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from buffer.frame_record import FrameRecord, _raw_view, decode_depth, decode_luma, decode_rgb
+from proto import ar_stream_pb2
+
+WIDTH, HEIGHT = 4, 2
+
+
+def yuv420(luma: np.ndarray) -> bytes:
+    """I420 payload with the given Y plane and neutral chroma"""
+    height, width = luma.shape
+    return luma.tobytes() + bytes([128]) * (width * height // 2)
+
+
+def rgb_frame(data: bytes, image_format: int) -> FrameRecord:
+    frame = FrameRecord('phone')
+    frame.set_rgb_payload(data, image_format, WIDTH, HEIGHT)
+    return frame
+
+
+def test_raw_view_is_a_read_only_view():
+    data = bytes(range(WIDTH * HEIGHT * 4))
+    view = _raw_view(data, ar_stream_pb2.RGBA_8888, WIDTH, HEIGHT)
+    assert view.shape == (HEIGHT, WIDTH, 4)
+    assert not view.flags.writeable and not view.flags.owndata
+    assert view[1, 0].tolist() == [16, 17, 18, 19]
+
+
+def test_decode_rgba_drops_alpha_without_copying():
+    data = bytes(range(WIDTH * HEIGHT * 4))
+    image = decode_rgb(data, ar_stream_pb2.RGBA_8888, WIDTH, HEIGHT)
+    assert (image.shape, image.dtype) == ((HEIGHT, WIDTH, 3), np.uint8)
+    assert image[0, 1].tolist() == [4, 5, 6]
+    assert not image.flags.owndata
+
+
+def test_decode_grayscale_repeats_the_channel():
+    data = bytes(range(WIDTH * HEIGHT))
+    image = decode_rgb(data, ar_stream_pb2.GRAYSCALE, WIDTH, HEIGHT)
+    assert (image.shape, image.dtype) == ((HEIGHT, WIDTH, 3), np.uint8)
+    assert image[1, 2].tolist() == [6, 6, 6]
+
+
+def test_decode_yuv420_converts_to_rgb():
+    luma = np.array([[40] * WIDTH, [200] * WIDTH], np.uint8)
+    image = decode_rgb(yuv420(luma), ar_stream_pb2.YUV_420, WIDTH, HEIGHT)
+    assert (image.shape, image.dtype) == ((HEIGHT, WIDTH, 3), np.uint8)
+    # Neutral chroma: grey pixels that follow the luma
+    assert (image[..., 0] == image[..., 1]).all() and (image[..., 1] == image[..., 2]).all()
+    assert image[0, 0, 0] < image[1, 0, 0]
+
+
+@pytest.mark.parametrize('image_format', [ar_stream_pb2.RGB_888, ar_stream_pb2.RGBA_8888,
+                                          ar_stream_pb2.GRAYSCALE, ar_stream_pb2.YUV_420])
+def test_short_payload_is_rejected(image_format):
+    with pytest.raises(ValueError):
+        decode_rgb(b'\0' * 5, image_format, WIDTH, HEIGHT)
+
+
+def test_luma_is_a_view_over_the_y_plane():
+    luma = np.arange(WIDTH * HEIGHT, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+    frame = rgb_frame(yuv420(luma), ar_stream_pb2.YUV_420)
+    np.testing.assert_array_equal(frame.luma, luma)
+    assert not frame.luma.flags.writeable and not frame.luma.flags.owndata
+    assert frame.luma is frame.luma
+    assert not frame.is_decoded('rgb_image')
+
+    gray = decode_luma(luma.tobytes(), ar_stream_pb2.GRAYSCALE, WIDTH, HEIGHT)
+    np.testing.assert_array_equal(gray, luma)
+    assert not gray.flags.owndata
+
+
+def test_luma_of_rgb_is_converted():
+    data = bytes([90, 90, 90]) * (WIDTH * HEIGHT)
+    luma = rgb_frame(data, ar_stream_pb2.RGB_888).luma
+    assert (luma.shape, luma.dtype) == ((HEIGHT, WIDTH), np.uint8)
+    assert (luma == 90).all()
+
+
+def depth_frame(depth: np.ndarray, depth_format: int) -> FrameRecord:
+    frame = FrameRecord('phone')
+    frame.set_depth_payload(depth.tobytes(), depth.shape[1], depth.shape[0], depth_format=depth_format)
+    return frame
+
+
+def test_decode_depth_keeps_the_wire_type():
+    millimetres = np.array([[0, 500], [1500, 65535]], np.uint16)
+    depth = decode_depth(millimetres.tobytes(), 2, 2, ar_stream_pb2.UINT16_MILLIMETERS)
+    assert depth.dtype == np.uint16 and not depth.flags.writeable
+    np.testing.assert_array_equal(depth, millimetres)
+
+    metres = np.array([[0.0, 0.5], [1.5, np.nan]], np.float32)
+    depth = decode_depth(metres.tobytes(), 2, 2, ar_stream_pb2.FLOAT32_METERS)
+    assert depth.dtype == np.float32 and not depth.flags.writeable
+    np.testing.assert_array_equal(depth, metres)
+
+
+@pytest.mark.parametrize('depth_format', [ar_stream_pb2.UINT16_MILLIMETERS, ar_stream_pb2.FLOAT32_METERS])
+def test_short_depth_payload_is_rejected(depth_format):
+    with pytest.raises(ValueError):
+        decode_depth(b'\0' * 6, 2, 2, depth_format)
+
+
+def test_depth_meters_is_converted_once():
+    frame = depth_frame(np.array([[0, 500], [1500, 2000]], np.uint16), ar_stream_pb2.UINT16_MILLIMETERS)
+    meters = frame.depth_meters
+    assert meters.dtype == np.float32 and not meters.flags.writeable
+    np.testing.assert_allclose(meters, [[0.0, 0.5], [1.5, 2.0]])
+    assert frame.depth_meters is meters
+    assert frame.depth_map.dtype == np.uint16
+
+
+def test_float_depth_meters_is_the_depth_map():
+    frame = depth_frame(np.array([[0.25, 1.0]], np.float32), ar_stream_pb2.FLOAT32_METERS)
+    assert frame.depth_meters is frame.depth_map
+    assert not frame.depth_meters.flags.owndata
+
+
+def test_payloads_stay_undecoded_until_read():
+    frame = rgb_frame(bytes(WIDTH * HEIGHT * 3), ar_stream_pb2.RGB_888)
+    frame.set_depth_payload(np.zeros((HEIGHT, WIDTH), np.uint16).tobytes(), WIDTH, HEIGHT)
+    assert not any(frame.is_decoded(key) for key in ('rgb_image', 'luma', 'depth_map', 'depth_meters'))
+    image = frame.rgb_image
+    assert frame.is_decoded('rgb_image') and not frame.is_decoded('depth_map')
+    assert frame.rgb_image is image  # Memoized: the second read does not decode again
+    assert frame.materialize(('rgb_image', 'depth_confidence')) == {'rgb_image': image}
+
+
+def test_undecodable_payload_is_memoized_as_none():
+    frame = rgb_frame(b'\0' * 5, ar_stream_pb2.RGB_888)
+    assert frame.rgb_image is None
+    assert frame.is_decoded('rgb_image')
+
+
+def test_nbytes_falls_back_to_wire_size():
+    data = bytes(WIDTH * HEIGHT * 4)
+    frame = rgb_frame(yuv420(np.zeros((HEIGHT, WIDTH), np.uint8)), ar_stream_pb2.YUV_420)
+    frame.set_depth_payload(data[:WIDTH * HEIGHT * 2], WIDTH, HEIGHT, confidence=data[:WIDTH * HEIGHT])
+    wire_size = WIDTH * HEIGHT * 3 // 2 + WIDTH * HEIGHT * 2 + WIDTH * HEIGHT
+    assert frame.wire_size == frame.nbytes == wire_size
+    frame.depth_map, frame.luma  # Views over the payload: no extra memory
+    assert frame.nbytes == wire_size
+    frame.rgb_image  # Converted: owns its data
+    assert frame.nbytes == wire_size + WIDTH * HEIGHT * 3
+    frame.release()
+    assert frame.nbytes == wire_size
+    assert not frame.is_decoded('rgb_image')
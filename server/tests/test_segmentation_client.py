@@ -0,0 +1,193 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import cv2
+import numpy as np
+import pytest
+
+from buffer.frame_record import FrameRecord
+from proto import ar_stream_pb2
+from segmentation_client import SegmentationChannel, SegmentationClient, encode_jpeg
+
+Control = ar_stream_pb2.SegmentationControl
+
+
+class FakeSegmentationServer:
+    """The server end of the channel: answers session starts after a delay, and deletes"""
+
+    def __init__(self, start_status=200, start_delay=0.0):
+        self.start_status = start_status
+        self.start_delay = start_delay
+        self.received = []
+        self.closed = False
+        self._incoming = asyncio.Queue()
+        self._sessions = 0
+
+    def requests(self, action: int) -> list:
+        return [envelope.control for envelope in self.received
+                if envelope.WhichOneof('payload') == 'control' and envelope.control.action == action]
+
+    async def send_bytes(self, data: bytes):
+        envelope = ar_stream_pb2.SegmentationEnvelope()
+        envelope.ParseFromString(data)
+        self.received.append(envelope)
+        if envelope.WhichOneof('payload') != 'control':
+            return
+        control = envelope.control
+        reply = ar_stream_pb2.SegmentationEnvelope()
+        reply.reply.request_id = control.request_id
+        reply.reply.status = 200
+        if control.action == Control.START_SESSION:
+            self._sessions += 1
+            reply.reply.status = self.start_status
+            reply.reply.session_id = f's{self._sessions}'
+            asyncio.get_running_loop().call_later(self.start_delay, self.push, reply)
+        else:
+            self.push(reply)
+
+    def push(self, envelope: ar_stream_pb2.SegmentationEnvelope):
+        self._incoming.put_nowait(SimpleNamespace(type=aiohttp.WSMsgType.BINARY, data=envelope.SerializeToString()))
+
+    async def close(self):
+        self.closed = True
+        self._incoming.put_nowait(SimpleNamespace(type=aiohttp.WSMsgType.CLOSE, data=None))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._incoming.get()
+
+
+async def connected_client(server: FakeSegmentationServer, **settings) -> SegmentationClient:
+    client = SegmentationClient(settings=settings)
+    client.channel = SegmentationChannel(server)
+    await client.channel.start_listening(client._on_output, client._on_reply, client._on_credit,
+                                         client._on_channel_closed)
+    client.is_connected = True
+    return client
+
+
+def jpeg_frame(frame_number=1, width=64) -> FrameRecord:
+    frame = FrameRecord('phone', frame_number=frame_number)
+    frame.set_rgb_payload(b'\xff\xd8phone\xff\xd9', ar_stream_pb2.JPEG, width, 48, quality=70)
+    return frame
+
+
+def test_concurrent_frames_start_one_session():
+    async def run():
+        server = FakeSegmentationServer(start_delay=0.02)
+        client = await connected_client(server)
+        sent = await asyncio.gather(*(client.send_frame('phone', jpeg_frame(n)) for n in range(5)))
+        await client.close()
+        return server, client, sent
+
+    server, client, sent = asyncio.run(run())
+    assert len(server.requests(Control.START_SESSION)) == 1
+    assert client.client_id_to_session == {'phone': 's1'}
+    assert sent.count(True) == 1  # The rest wait for credit
+
+
+def test_failed_start_is_cached_and_backs_off():
+    async def run():
+        server = FakeSegmentationServer(start_status=500)
+        client = await connected_client(server, session_retry_s=0.05, session_retry_max_s=0.12)
+        waits = []
+
+        async def attempt():
+            with pytest.raises(RuntimeError):
+                await client._ensure_session('phone')
+            waits.append(client._session_failures['phone'][1])
+
+        await attempt()
+        await attempt()  # Within the backoff: the cached error, no new request
+        assert not await client.send_frame('phone', jpeg_frame())
+        assert not client.wants_frame('phone')
+        starts_during_backoff = len(server.requests(Control.START_SESSION))
+        for wait_s in (0.06, 0.11, 0.13):
+            await asyncio.sleep(wait_s)
+            await attempt()
+        await client.close()
+        return starts_during_backoff, len(server.requests(Control.START_SESSION)), waits
+
+    starts_during_backoff, starts, waits = asyncio.run(run())
+    assert starts_during_backoff == 1
+    assert starts == 4
+    assert waits == [0.05, 0.05, 0.1, 0.12, 0.12]
+
+
+def test_session_started_after_its_timeout_is_deleted():
+    async def run():
+        server = FakeSegmentationServer(start_delay=0.05)
+        client = await connected_client(server)
+        envelope = ar_stream_pb2.SegmentationEnvelope()
+        envelope.control.action = Control.START_SESSION
+        with pytest.raises(asyncio.TimeoutError):
+            await client.channel.request(envelope, timeout=0.01)
+        await asyncio.sleep(0.1)
+        await client.close()
+        return server, client
+
+    server, client = asyncio.run(run())
+    assert [control.session_id for control in server.requests(Control.DELETE_SESSION)] == ['s1']
+    assert client.session_to_client == {}
+
+
+def sent_images(server: FakeSegmentationServer) -> list:
+    return [envelope.frame.image_frame for envelope in server.received if envelope.WhichOneof('payload') == 'frame']
+
+
+def test_phone_jpeg_within_max_width_is_forwarded_as_is():
+    async def run():
+        server = FakeSegmentationServer()
+        client = await connected_client(server, max_width=64)
+        assert await client.send_frame('phone', jpeg_frame(width=64))
+        await client.close()
+        return sent_images(server)
+
+    (image,) = asyncio.run(run())
+    assert image.data == b'\xff\xd8phone\xff\xd9'
+    assert (image.width, image.height, image.quality) == (64, 48, 70)
+
+
+def test_wider_frame_is_reencoded_on_the_encoder():
+    async def run():
+        server = FakeSegmentationServer()
+        client = await connected_client(server, max_width=64, jpeg_quality=60)
+        encodes = []
+
+        async def run_encode(fn, *args):
+            encodes.append(fn)
+            return fn(*args)
+
+        client.set_encoder(run_encode)
+        _, data = cv2.imencode('.jpg', np.zeros((96, 128, 3), np.uint8))
+        frame = FrameRecord('phone')
+        frame.set_rgb_payload(data.tobytes(), ar_stream_pb2.JPEG, 128, 96, quality=90)
+        assert await client.send_frame('phone', frame)
+        await client.close()
+        return sent_images(server), encodes, data.tobytes()
+
+    (image,), encodes, phone_jpeg = asyncio.run(run())
+    assert encodes == [encode_jpeg]
+    assert (image.width, image.height, image.quality) == (64, 48, 60)
+    assert image.data != phone_jpeg
+    assert cv2.imdecode(np.frombuffer(image.data, np.uint8), cv2.IMREAD_COLOR).shape == (48, 64, 3)
+
+
+def test_frame_without_an_image_keeps_the_credit():
+    async def run():
+        server = FakeSegmentationServer()
+        client = await connected_client(server)
+        assert await client.send_frame('phone', jpeg_frame(1))  # Starts the session, without credit
+        client._on_credit(ar_stream_pb2.SegmentationCredit(session_id='s1', credits=1))
+        broken = FrameRecord('phone', frame_number=2)
+        broken.set_rgb_payload(b'\0' * 5, ar_stream_pb2.RGB_888, 64, 48)
+        assert not await client.send_frame('phone', broken)
+        credits_after_broken = client._credits['s1']
+        assert await client.send_frame('phone', jpeg_frame(3))
+        await client.close()
+        return credits_after_broken, client._credits['s1'], len(sent_images(server))
+
+    assert asyncio.run(run()) == (1, 0, 2)
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from segmentation_metrics import ClientLatency, SegmentationLatency, percentiles
+
+
+def make_output(session_id='s', frame_number=1, request_timestamp_ms=0, received_ms=0,
+                inference_start_ms=0, inference_end_ms=0, timestamp_ms=0):
+    return SimpleNamespace(session_id=session_id, frame_number=frame_number,
+                           request_timestamp_ms=request_timestamp_ms, received_ms=received_ms,
+                           inference_start_ms=inference_start_ms, inference_end_ms=inference_end_ms,
+                           timestamp_ms=timestamp_ms)
+
+
+# --- percentiles ---
+
+def test_percentiles_nearest_rank():
+    assert percentiles(range(1, 101)) == {'p50': 50, 'p95': 95, 'p99': 99}
+
+
+def test_percentiles_small_samples():
+    assert percentiles([7.0]) == {'p50': 7.0, 'p95': 7.0, 'p99': 7.0}
+    assert percentiles([2.0, 1.0]) == {'p50': 1.0, 'p95': 2.0, 'p99': 2.0}
+    assert percentiles(list(range(1, 11))) == {'p50': 5, 'p95': 10, 'p99': 10}
+
+
+def test_percentiles_empty_and_rounding():
+    assert percentiles([]) == {}
+    assert percentiles([1.234]) == {'p50': 1.2, 'p95': 1.2, 'p99': 1.2}
+
+
+# --- ClientLatency ---
+
+def test_result_splits_round_trip_into_stages():
+    client = ClientLatency(max_pending=8)
+    client.on_sent(('s', 1), sent_ms=1000.0, now_s=0.0)
+    # Server clock: received 5000, inference 5010-5060, sent 5070
+    output = make_output(frame_number=1, request_timestamp_ms=1000, received_ms=5000,
+                         inference_start_ms=5010, inference_end_ms=5060, timestamp_ms=5070)
+    sample = client.on_result(('s', 1), output, arrived_ms=1100.0, now_s=0.1)
+    assert sample == {'e2e': 100.0, 'server': 70, 'transport': 30.0, 'queue': 10, 'inference': 50}
+    assert client.answered == 1
+    assert not client.pending
+
+
+def test_result_drops_older_frames_that_got_no_result():
+    client = ClientLatency(max_pending=8)
+    for n in range(1, 5):
+        client.on_sent(('s', n), sent_ms=1000.0 + n, now_s=0.0)
+    output = make_output(frame_number=3, received_ms=10, timestamp_ms=20)
+    client.on_result(('s', 3), output, arrived_ms=1050.0, now_s=0.1)
+    assert list(client.pending) == [('s', 4)]
+
+
+def test_unmatched_result_uses_echoed_timestamp():
+    client = ClientLatency(max_pending=8)
+    output = make_output(frame_number=9, request_timestamp_ms=1000, received_ms=10, timestamp_ms=30)
+    sample = client.on_result(('s', 9), output, arrived_ms=1050.0, now_s=0.0)
+    assert sample['e2e'] == 50.0
+    assert 'inference' not in sample
+
+
+def test_result_without_timings_is_counted_but_not_sampled():
+    client = ClientLatency(max_pending=8)
+    client.on_sent(('s', 1), sent_ms=1000.0, now_s=0.0)
+    # A prompt result: no server timings
+    assert client.on_result(('s', 0), make_output(frame_number=0), arrived_ms=1100.0, now_s=0.1) is None
+    assert (client.results, client.answered) == (1, 0)
+    assert list(client.pending) == [('s', 1)]
+
+
+def test_pending_is_bounded():
+    client = ClientLatency(max_pending=3)
+    for n in range(10):
+        client.on_sent(('s', n), sent_ms=float(n), now_s=0.0)
+    assert list(client.pending) == [('s', 7), ('s', 8), ('s', 9)]
+    assert client.sent == 10
+
+
+def test_samples_outside_the_window_are_trimmed():
+    client = ClientLatency(max_pending=8)
+    for n, now_s in ((1, 0.0), (2, 50.0), (3, 100.0)):
+        client.on_sent(('s', n), sent_ms=1000.0 * n, now_s=now_s)
+        client.on_result(('s', n), make_output(frame_number=n, received_ms=1, timestamp_ms=2),
+                         arrived_ms=1000.0 * n + 10 * n, now_s=now_s)
+    client.trim(now_s=100.0, window_s=60.0)
+    stats = client.get_stats(now_s=100.0, window_s=60.0)
+    assert stats['e2e_ms'] == {'p50': 20.0, 'p95': 30.0, 'p99': 30.0}
+    assert stats['results_per_s'] == pytest.approx(2 / 60, abs=0.01)
+
+
+# --- SegmentationLatency ---
+
+def test_stats_per_client_and_forget():
+    latency = SegmentationLatency({'metrics_window_s': 60.0})
+    latency.on_sent('phone', 's', 1, 1000.0)
+    latency.on_result('phone', make_output(frame_number=1, received_ms=10, timestamp_ms=30), 1040.0)
+    stats = latency.get_stats('phone')
+    assert (stats['sent'], stats['answered'], stats['in_flight']) == (1, 1, 0)
+    assert stats['e2e_ms']['p50'] == 40.0
+    assert stats['server_ms']['p50'] == 20
+    assert latency.get_stats('other') == {}
+    assert set(latency.get_all_stats()) == {'phone'}
+
+    latency.forget('phone')
+    assert latency.get_all_stats() == {}
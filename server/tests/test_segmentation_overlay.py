@@ -0,0 +1,61 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+from segmentation_overlay import MASK_COLORS, SegmentationOverlay, decode_mask
+
+
+def encode_mask(mask: np.ndarray, mode: str = 'L') -> str:
+    image = Image.fromarray(mask.astype(np.uint8) * 255)
+    if mode == 'RGBA':
+        rgba = np.zeros(mask.shape + (4,), np.uint8)
+        rgba[..., 3] = mask * 255
+        image = Image.fromarray(rgba, 'RGBA')
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+FIRST = np.array([[1, 1, 0], [0, 0, 0]], bool)
+SECOND = np.array([[0, 1, 1], [0, 0, 0]], bool)
+
+
+def test_masks_become_one_label_image():
+    overlay = SegmentationOverlay.from_encoded({'7': encode_mask(FIRST), '9': encode_mask(SECOND, 'RGBA')})
+    assert overlay.object_ids == ('7', '9') and len(overlay) == 2
+    # Later masks are drawn over earlier ones
+    assert overlay.labels.tolist() == [[1, 2, 2], [0, 0, 0]]
+
+
+def test_undecodable_masks_are_skipped():
+    overlay = SegmentationOverlay.from_encoded({'1': 'not a png', '2': encode_mask(FIRST)})
+    assert overlay.object_ids == ('2',)
+    assert SegmentationOverlay.from_encoded({'1': 'not a png'}) is None
+
+
+def test_composite_blends_label_colors():
+    overlay = SegmentationOverlay.from_encoded({'a': encode_mask(FIRST), 'b': encode_mask(SECOND)})
+    frame = np.full((2, 3, 3), 100, np.uint8)
+    output = overlay.composite(frame)
+    expected = frame.astype(np.float64)
+    for label, color in ((1, MASK_COLORS[0]), (2, MASK_COLORS[1])):
+        expected[overlay.labels == label] = (expected[overlay.labels == label] + color) / 2
+    assert np.abs(output.astype(int) - expected).max() <= 0.5
+    assert output[1].tolist() == frame[1].tolist()  # Background untouched
+    assert frame[0, 0].tolist() == [100, 100, 100]  # The frame itself is not modified
+
+
+def test_composite_at_another_resolution():
+    overlay = SegmentationOverlay.from_encoded({'a': encode_mask(FIRST)})
+    output = overlay.composite(np.zeros((4, 6, 3), np.uint8))
+    labels = overlay.labels_at(4, 6)
+    assert labels is overlay.labels_at(4, 6)
+    assert labels[:2, :4].all() and not labels[2:].any()
+    assert output[0, 0].tolist() == [128, 0, 0] and output[3, 5].tolist() == [0, 0, 0]
+
+
+def test_decode_mask_channels():
+    assert decode_mask(encode_mask(FIRST)).tolist() == FIRST.tolist()
+    assert decode_mask(encode_mask(SECOND, 'RGBA')).tolist() == SECOND.tolist()
@@ -0,0 +1,202 @@
+"""
+H.264 video for the dashboard live view.
+Optional: needs PyAV (`pip install av`); without it video subscriptions fall
+back to JPEG frames. Each phone gets one software (libx264) encoder per
+subscribed width, muxed as fragmented MP4 with one fragment per frame for a
+MediaSource SourceBuffer in the dashboard.
+
+A segment that starts a GOP is sent with the init segment (ftyp + moov) in
+front of it, so every keyframe segment is a valid starting point for a
+dashboard that just subscribed or dropped a segment. Keyframes are forced
+every gop_s and, at most every min_keyframe_interval_s, when a dashboard is
+waiting for one.
+
+The mp4 muxer writes a fragment once it sees the next packet (it needs the
+sample duration), so segments trail the frame they are sent with by one frame.
+"""
+
+import io
+import logging
+import threading
+import time
+from fractions import Fraction
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import av
+    from av.video.frame import PictureType
+except ImportError:  # optional dependency
+    av = None
+
+logger = logging.getLogger(__name__)
+
+
+# Overridable in the `video` section of config.yaml
+VIDEO_DEFAULTS = {
+    'enabled': True,                  # Allow video subscriptions (if PyAV is installed)
+    'crf': 28,                        # x264 constant rate factor: higher is smaller and blurrier
+    'preset': 'ultrafast',
+    'gop_s': 2.0,                     # A keyframe at least this often
+    'min_keyframe_interval_s': 0.5,   # Keyframes forced for waiting dashboards at most this often
+}
+
+TIME_BASE = Fraction(1, 1000)
+MP4_OPTIONS = {'movflags': 'empty_moov+default_base_moof+frag_every_frame'}
+
+
+def load_video_settings(config: dict) -> dict:
+    """Merge the `video` section of config.yaml over VIDEO_DEFAULTS"""
+    return {**VIDEO_DEFAULTS, **(config.get('video') or {})}
+
+
+def video_size(width: int, height: int, max_width: int) -> Tuple[int, int]:
+    """Encoded size of a width x height frame for a tier width (even, as yuv420p needs)"""
+    if max_width and max_width < width:
+        height = max(2, round(height * max_width / width))
+        width = max_width
+    return width & ~1, height & ~1
+
+
+class _Sink(io.RawIOBase):
+    """File object collecting what the muxer writes"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class VideoStream:
+    """One fragmented MP4 / H.264 stream of a phone's frames at one size"""
+
+    def __init__(self, width: int, height: int, settings: dict):
+        self.width = width
+        self.height = height
+        self.settings = settings
+        self._sink = _Sink()
+        self._container = av.open(self._sink, 'w', format='mp4', options=MP4_OPTIONS)
+        self._stream = self._container.add_stream('libx264', rate=30)
+        self._stream.width = width
+        self._stream.height = height
+        self._stream.pix_fmt = 'yuv420p'
+        self._stream.codec_context.time_base = TIME_BASE
+        # Keyframes are placed by encode(), not by x264
+        self._stream.codec_context.gop_size = 1 << 16
+        self._stream.options = {'preset': settings['preset'], 'tune': 'zerolatency', 'crf': str(settings['crf'])}
+        self.init_segment: Optional[bytes] = None
+        self._start_ns: Optional[int] = None
+        self._last_pts = -1
+        self._keyframe_at: Optional[float] = None   # time.monotonic() of the last forced keyframe
+        self._muxed_keyframe = False     # Whether the fragment still in the muxer starts a GOP
+        self.lock = threading.Lock()
+
+    def encode(self, image: np.ndarray, timestamp_ns: int, keyframe: bool = False) -> bytes:
+        """
+        Encode one (H, W, 3) uint8 RGB frame.
+
+        Args:
+            keyframe: a dashboard is waiting for a keyframe
+
+        Returns:
+            The segment the muxer completed (the previous frame's), with the
+            init segment in front if it starts a GOP; b'' for the first frame
+        """
+        with self.lock:
+            if self._start_ns is None:
+                self._start_ns = timestamp_ns
+            pts = max(self._last_pts + 1, (timestamp_ns - self._start_ns) // 1_000_000)
+            self._last_pts = pts
+
+            # Keyframe spacing is about how long a viewer waits, so it follows the wall clock
+            now = time.monotonic()
+            since_keyframe_s = float('inf') if self._keyframe_at is None else now - self._keyframe_at
+            frame = av.VideoFrame.from_ndarray(np.ascontiguousarray(image), format='rgb24')
+            frame = frame.reformat(self.width, self.height, format='yuv420p')
+            frame.pts = pts
+            frame.time_base = TIME_BASE
+            if since_keyframe_s >= self.settings['gop_s'] or (
+                    keyframe and since_keyframe_s >= self.settings['min_keyframe_interval_s']):
+                frame.pict_type = PictureType.I
+                self._keyframe_at = now
+
+            segment = b''
+            for packet in self._stream.encode(frame):
+                self._container.mux(packet)
+                segment += self._take_segment()
+                self._muxed_keyframe = packet.is_keyframe
+            return segment
+
+    def _take_segment(self) -> bytes:
+        data = self._sink.take()
+        if self.init_segment is None:
+            # The header (ftyp + moov) comes out with the first packet, before any fragment
+            moof = data.find(b'moof')
+            self.init_segment = data if moof < 0 else data[:moof - 4]
+            data = b'' if moof < 0 else data[moof - 4:]
+        if data and self._muxed_keyframe:
+            return self.init_segment + data
+        return data
+
+    def close(self):
+        with self.lock:
+            try:
+                self._container.close()
+            except Exception as e:
+                logger.debug(f"Closing video stream: {e}")
+
+
+class VideoStreams:
+    """The video streams of all phones, one per (client_id, tier width)"""
+
+    def __init__(self, settings: Optional[dict] = None):
+        self.settings = {**VIDEO_DEFAULTS, **(settings or {})}
+        self.available = av is not None and bool(self.settings['enabled'])
+        self._streams: Dict[Tuple[str, int], VideoStream] = {}
+        self._lock = threading.Lock()
+        if self.settings['enabled'] and av is None:
+            logger.warning("PyAV is not installed: video subscriptions fall back to JPEG (pip install av)")
+
+    def encode(self, client_id: str, max_width: int, image: np.ndarray, timestamp_ns: int,
+               keyframe: bool = False) -> bytes:
+        """Encode a frame on a client's stream for a tier width (called on the encoder pool)"""
+        height, width = image.shape[:2]
+        size = video_size(width, height, max_width)
+        key = (client_id, max_width)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None or (stream.width, stream.height) != size:
+                if stream is not None:
+                    stream.close()
+                # A new stream starts with a keyframe, and with it the init segment
+                stream = self._streams[key] = VideoStream(*size, self.settings)
+                logger.info(f"Video stream for {client_id}: {size[0]}x{size[1]}")
+        return stream.encode(image, timestamp_ns, keyframe)
+
+    def retain(self, client_id: str, max_widths: Iterable[int]):
+        """Close a client's streams for widths no dashboard subscribes to any more"""
+        max_widths = set(max_widths)
+        with self._lock:
+            stale = [key for key in self._streams if key[0] == client_id and key[1] not in max_widths]
+            streams = [self._streams.pop(key) for key in stale]
+        for stream in streams:
+            stream.close()
+
+    def forget(self, client_id: str):
+        """Close all streams of a client"""
+        self.retain(client_id, ())
+
+    def __len__(self) -> int:
+        return len(self._streams)